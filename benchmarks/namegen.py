@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# NAMEGEN
+#
+# Synthetic NAME file generator, for benchmarks and testing. Writes NAME III
+# format files: 19 header lines ending 'Fields:', the field header block
+# from line 20 (column names, 14 field label rows and 2 spacer rows), then
+# one CSV data row per non-zero grid cell.
+#
+# Concentrations follow a plume spreading from the release location, with
+# random noise. Sparsity sets the fraction of grid cells written.
+#
+# EXAMPLES:
+#
+# python benchmarks/namegen.py -o /tmp/names
+# python benchmarks/namegen.py -o /tmp/names -x 1440 -y 720 -r 0.25 -t 8 -n 7 -s 0.1
+#
+
+import argparse
+import datetime
+import os
+
+import numpy as np
+
+# Field label rows, values None are filled per file
+LABELS = [('Species Category', 'TRACER'), ('Name', 'INERT'), ('Quantity', 'Air Concentration'),
+          ('Species', 'INERT'), ('Units', 'g s / m^3'), ('Source/Source Group', 'All sources'),
+          ('Time Av or Int', None), ('Horizontal Av or Int', 'No horizontal averaging'),
+          ('Vertical Av or Int', 'No vertical averaging'), ('Prob Perc', ''), ('Prob Perc Ens', ''),
+          ('Prob Perc Time', ''), ('T', None), ('Z', 'Z = 50.0 m agl')]
+
+# Hours between output timestamps
+STEP = 3
+
+
+def timestamps(day, count, backwards=True):
+    """
+    Return list of NAME timestamp strings, one per STEP hours
+    day -- datetime of first timestamp
+    count -- number of timestamps
+    backwards -- True for backwards run, timestamps step back in time
+    """
+    sign = -1 if backwards else 1
+    return [(day + datetime.timedelta(hours=sign * STEP * i)).strftime('%d/%m/%Y %H:%M UTC') for i in range(count)]
+
+
+def header(runname, day, lon_size, lat_size, origin, resolution, times, backwards=True, release=(-4.2, 50.3)):
+    """
+    Return list of NAME header and field header lines
+    runname -- NAME run name
+    day -- datetime of first timestamp
+    lon_size, lat_size -- number of grid cells
+    origin -- 2-tuple of grid origin (lon, lat)
+    resolution -- 2-tuple of grid spacing (dlon, dlat)
+    times -- list of timestamp strings
+    backwards -- True for backwards run
+    release -- 2-tuple of release location (lon, lat)
+    """
+    if backwards:
+        (start, end) = (day + datetime.timedelta(hours=STEP), day)
+    else:
+        (start, end) = (day, day + datetime.timedelta(hours=STEP))
+
+    duration = '{}day 0hr 0min'.format(max(1, len(times) * STEP // 24))
+    fill = {'Time Av or Int': ['{} {}hr 0min integral'.format(duration, STEP)] * len(times), 'T': times}
+
+    lines = ['NAME III (version 6.5)']
+    lines += ['{}: {}'.format(k, v) for (k, v) in [
+        ('Run name', runname),
+        ('Run time', (day + datetime.timedelta(days=30)).strftime('%d/%m/%Y %H:%M:%S.000 UTC')),
+        ('Met data', 'NWP Flow.Global'),
+        ('Start of release', start.strftime('%d/%m/%Y %H:%M UTC')),
+        ('End of release', end.strftime('%d/%m/%Y %H:%M UTC')),
+        ('Source strength', '1.0 g/s'),
+        ('Release location', '{}E {}N'.format(*release)),
+        ('Release height', '10.000m agl'),
+        ('Run duration', duration),
+        ('X grid origin', origin[0]),
+        ('Y grid origin', origin[1]),
+        ('X grid size', lon_size),
+        ('Y grid size', lat_size),
+        ('X grid resolution', resolution[0]),
+        ('Y grid resolution', resolution[1]),
+        ('Number of preset field req', 0),
+        ('Number of field requirements', len(times))]]
+    lines.append('Fields:')
+
+    # Field header block
+    lines.append(','.join(['X-Index', 'Y-Index', 'Longitude', 'Latitude'] + ['Field'] * len(times)) + ',')
+    for (label, value) in LABELS:
+        values = fill[label] if value is None else [value] * len(times)
+        lines.append(','.join(['   '] * 3 + ['  {}:'.format(label)] + values) + ',')
+    lines += [','.join(['   '] * (4 + len(times))) + ','] * 2
+
+    return lines
+
+
+def plume(lons, lats, times, release, sparsity, rnd):
+    """
+    Return (cell mask, concentration array) for synthetic plume
+    lons, lats -- 2D arrays of cell centre coordinates
+    times -- number of timestamps
+    release -- 2-tuple of release location (lon, lat)
+    sparsity -- fraction of grid cells with non-zero concentration
+    rnd -- numpy RandomState
+    """
+    dist = np.hypot(lons - release[0], lats - release[1])
+
+    # Plume covers the nearest cells, ragged edge from noise
+    score = dist * rnd.uniform(0.8, 1.2, dist.shape)
+    count = max(1, int(sparsity * dist.size))
+    mask = score <= np.partition(score.ravel(), count - 1)[count - 1]
+
+    scale = max(dist[mask].max(), 1e-6)
+    conc = np.empty((mask.sum(), times))
+    for t in range(times):
+        spread = scale * (t + 1) / float(times)
+        conc[:, t] = 1e-5 * np.exp(-(dist[mask] / spread) ** 2) * rnd.lognormal(0.0, 0.5, mask.sum())
+
+    # Tails of earlier timestamps fall to zero, as in real footprints
+    conc[conc < 1e-12] = 0.0
+
+    return (mask, conc)
+
+
+def write(filename, runname='SYNTH', day=datetime.datetime(2015, 5, 1), lon_size=100, lat_size=80,
+          origin=(-20.0, 40.0), resolution=(0.25, 0.25), times=8, sparsity=0.3, backwards=True, seed=0):
+    """
+    Write synthetic NAME file, return number of data rows written
+
+    filename -- output file path
+    runname -- NAME run name
+    day -- datetime of first timestamp
+    lon_size, lat_size -- number of grid cells
+    origin -- 2-tuple of grid origin (centre of first cell) (lon, lat)
+    resolution -- 2-tuple of grid spacing (dlon, dlat)
+    times -- number of timestamps
+    sparsity -- fraction of grid cells written, 0.0 to 1.0
+    backwards -- True for backwards run, False for forwards
+    seed -- random seed
+    """
+    rnd = np.random.RandomState(seed)
+
+    stamps = timestamps(day, times, backwards)
+
+    lons = origin[0] + resolution[0] * np.arange(lon_size)
+    lats = origin[1] + resolution[1] * np.arange(lat_size)
+    (lon2, lat2) = np.meshgrid(lons, lats)
+
+    # Release somewhere in the middle half of the grid
+    release = (round(rnd.uniform(lons[lon_size // 4], lons[3 * lon_size // 4]), 1),
+               round(rnd.uniform(lats[lat_size // 4], lats[3 * lat_size // 4]), 1))
+
+    (mask, conc) = plume(lon2, lat2, times, release, sparsity, rnd)
+
+    (y, x) = np.nonzero(mask)
+    rows = np.column_stack([x + 1, y + 1, lon2[mask], lat2[mask], conc])
+
+    with open(filename, 'w') as f:
+        f.write('\n'.join(header(runname, day, lon_size, lat_size, origin, resolution, stamps, backwards, release)) + '\n')
+        np.savetxt(f, rows, fmt='%d,%d,%.4f,%.4f,' + ','.join(['%e'] * times) + ',')
+
+    return len(rows)
+
+
+def writeRun(directory, files=1, **kwargs):
+    """
+    Write one synthetic NAME file per day, return list of file paths.
+    Files are named [runname]_group1_[YYYYMMDD].txt, as found by Fileset.
+
+    directory -- output directory, created if it does not exist
+    files -- number of daily files
+    kwargs -- write() options
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    day = kwargs.pop('day', datetime.datetime(2015, 5, 1))
+    runname = kwargs.get('runname', 'SYNTH')
+    seed = kwargs.pop('seed', 0)
+
+    paths = []
+    for i in range(files):
+        d = day + datetime.timedelta(days=i)
+        path = os.path.join(directory, '{}_group1_{}.txt'.format(runname, d.strftime('%Y%m%d')))
+        write(path, day=d, seed=seed + i, **kwargs)
+        paths.append(path)
+
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='namegen', description="Write synthetic NAME files.")
+    parser.add_argument("-o", "--outdir", required=True, help="Output directory")
+    parser.add_argument("-n", "--files", type=int, default=1, help="Number of daily files [%(default)s]")
+    parser.add_argument("-x", "--lon_size", type=int, default=100, help="Longitude grid cells [%(default)s]")
+    parser.add_argument("-y", "--lat_size", type=int, default=80, help="Latitude grid cells [%(default)s]")
+    parser.add_argument("-r", "--resolution", type=float, default=0.25, help="Grid spacing in degrees [%(default)s]")
+    parser.add_argument("--origin", type=float, nargs=2, default=(-20.0, 40.0), help="Grid origin (lon lat) [%(default)s]")
+    parser.add_argument("-t", "--times", type=int, default=8, help="Timestamps per file [%(default)s]")
+    parser.add_argument("-s", "--sparsity", type=float, default=0.3, help="Fraction of grid cells written [%(default)s]")
+    parser.add_argument("-f", "--forwards", action='store_true', default=False, help="Forwards run, default is backwards")
+    parser.add_argument("--runname", default='SYNTH', help="Run name [%(default)s]")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed [%(default)s]")
+    args = parser.parse_args()
+
+    paths = writeRun(args.outdir, args.files, runname=args.runname, lon_size=args.lon_size, lat_size=args.lat_size,
+                     origin=tuple(args.origin), resolution=(args.resolution, args.resolution), times=args.times,
+                     sparsity=args.sparsity, backwards=not args.forwards, seed=args.seed)
+
+    for p in paths:
+        print p
+
+
+if __name__ == "__main__":
+    main()
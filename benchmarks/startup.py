@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# STARTUP
+#
+# Startup time benchmark for namereader modules and CLI entry points.
+# Each module is imported in a fresh interpreter, timing the import
+# and checking that plotting and geometry libraries were not loaded.
+# NumPy and pandas are always needed and are imported first, outside
+# the timing (pandas < 0.23 itself imports matplotlib when present).
+# Exits non-zero if a heavy library is imported at module load, or an
+# import takes longer than the given limit.
+#
+# EXAMPLES:
+#
+# python benchmarks/startup.py
+# python benchmarks/startup.py -r 10 -l 1.5
+#
+
+import argparse
+import json
+import subprocess
+import sys
+
+# Libraries which must only be imported when first used
+HEAVY = ['mpl_toolkits.basemap', 'geopandas', 'matplotlib', 'shapely', 'descartes', 'PIL']
+
+# Modules which must import without any heavy library
+LIGHT = [
+    'pynameplot',
+    'pynameplot.namereader.archive',
+    'pynameplot.namereader.drawmap',
+    'pynameplot.namereader.fileset',
+    'pynameplot.namereader.inventory',
+    'pynameplot.namereader.name',
+    'pynameplot.namereader.namesum',
+    'pynameplot.namereader.raster',
+    'pynameplot.namereader.source',
+    'pynameplot.namereader.sparse',
+    'pynameplot.namereader.tiles',
+    'pynameplot.plot_footprint',
+]
+
+# Run in child interpreter, module name substituted
+CHILD = """
+import sys, time, json
+import numpy, pandas
+before = set(sys.modules)
+t = time.time()
+import {module}
+t = time.time() - t
+sys.stdout.write(json.dumps({{'seconds': t, 'loaded': [m for m in {heavy!r} if m in sys.modules and m not in before]}}))
+"""
+
+
+def measure(module, repeat=5):
+    """
+    Return (best import time in seconds, list of heavy libraries loaded)
+    module -- module name to import
+    repeat -- number of fresh interpreters to time
+    """
+    best = None
+    loaded = []
+
+    for i in range(repeat):
+        out = subprocess.check_output([sys.executable, '-c', CHILD.format(module=module, heavy=HEAVY)])
+        result = json.loads(out)
+
+        if best is None or result['seconds'] < best:
+            best = result['seconds']
+        loaded = result['loaded']
+
+    return (best, loaded)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='startup', description="Benchmark namereader import times.")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Imports timed per module [%(default)s]")
+    parser.add_argument("-l", "--limit", type=float, default=None, help="Maximum import time per module in seconds")
+    parser.add_argument("-m", "--modules", nargs='+', default=LIGHT, help="Modules to benchmark")
+    args = parser.parse_args()
+
+    failed = []
+
+    print '{:<40} {:>10}  {}'.format('module', 'seconds', 'heavy imports')
+
+    for module in args.modules:
+        (seconds, loaded) = measure(module, args.repeat)
+
+        print '{:<40} {:>10.3f}  {}'.format(module, seconds, ', '.join(loaded) or '-')
+
+        if loaded:
+            failed.append('{} imports {}'.format(module, ', '.join(loaded)))
+        if args.limit and seconds > args.limit:
+            failed.append('{} took {:.3f}s, limit is {:.3f}s'.format(module, seconds, args.limit))
+
+    for f in failed:
+        print 'FAIL: {}'.format(f)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# SUITE
+#
+# Processing benchmark suite. Synthetic NAME files (see namegen.py) are
+# written for small, medium and global grid sizes, then each stage is
+# timed: parsing one file, summing N files, integrating N files over
+# zones, and rendering one map. Parse, sum and zone stages are timed for
+# both grid and sparse data. Rendering is skipped if Basemap is not
+# installed.
+#
+# Results are saved as JSON, one file per commit, and can be compared
+# against an earlier results file.
+#
+# EXAMPLES:
+#
+# python benchmarks/suite.py
+# python benchmarks/suite.py -s small medium global -n 7 -r 3
+# python benchmarks/suite.py -c benchmarks/results/1a2b3c4.json
+#
+
+import argparse
+from collections import OrderedDict
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from namegen import writeRun
+
+from pynameplot.namereader import drawmap, name, namesum
+from pynameplot.namereader.sparse import integrate as cellintegrate, lonlat_cellids
+
+# Grid sizes: namegen.write() options
+SIZES = OrderedDict([
+    ('small', dict(lon_size=100, lat_size=80, origin=(-20.0, 40.0), resolution=(0.25, 0.25), times=8, sparsity=0.3)),
+    ('medium', dict(lon_size=400, lat_size=300, origin=(-40.0, 30.0), resolution=(0.1, 0.1), times=8, sparsity=0.2)),
+    ('global', dict(lon_size=1440, lat_size=720, origin=(-179.875, -89.875), resolution=(0.25, 0.25), times=8, sparsity=0.1)),
+])
+
+STAGES = ['parse', 'parse_sparse', 'sum', 'sum_sparse', 'zones', 'zones_sparse', 'render']
+
+# Number of synthetic zones, as vertical strips across the grid
+ZONES = 4
+
+RESULTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def commit():
+    """
+    Return short git commit of working tree, marked if tree has changes
+    """
+    try:
+        with open(os.devnull, 'w') as null:
+            return subprocess.check_output(['git', 'describe', '--always', '--dirty'], stderr=null,
+                                           cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def zonegrid(options):
+    """
+    Return master grid style DataFrame of zone covering factors,
+    indexed by (Longitude, Latitude), one column per zone
+    options -- namegen.write() options for grid
+    """
+    (nx, ny) = (options['lon_size'], options['lat_size'])
+
+    lons = np.linspace(options['origin'][0], options['origin'][0] + options['resolution'][0] * (nx - 1), nx)
+    lats = np.linspace(options['origin'][1], options['origin'][1] + options['resolution'][1] * (ny - 1), ny)
+    (lon2, lat2) = np.meshgrid(lons, lats)
+
+    # First column of each strip is shared half and half with the strip before
+    strip = np.arange(nx) * ZONES // nx
+    edges = np.flatnonzero(np.diff(strip)) + 1
+    cols = OrderedDict()
+    for z in range(ZONES):
+        w = (strip == z).astype(float)
+        w[edges[(strip[edges] == z) | (strip[edges] == z + 1)]] = 0.5
+        cols['zone{}'.format(z + 1)] = np.tile(w, ny)
+
+    index = pd.MultiIndex.from_arrays([lon2.ravel(), lat2.ravel()], names=['Longitude', 'Latitude'])
+    return pd.DataFrame(cols, index=index)
+
+
+def integrate(files, zones, sparse=False):
+    """
+    Return (timestamps x zones) array of zone totals over files, as zonecsv
+    files -- list of NAME file paths
+    zones -- zone covering factor DataFrame, from zonegrid()
+    sparse -- load NAME files as sparse data
+    """
+    weights = zones.values
+    cells = None
+    blocks = []
+
+    for f in files:
+        n = name.Name(f, sparse=sparse)
+
+        if cells is None:
+            cells = lonlat_cellids(zones.index.get_level_values('Longitude').values,
+                                   zones.index.get_level_values('Latitude').values,
+                                   n.grid_origin, n.grid_size, n.grid_shape)
+
+        if sparse:
+            blocks.append(np.array([n.sparse.integrate(t, cells, weights) for t in n.timestamps]))
+        else:
+            blocks.append(cellintegrate(n.data.index.values, n.data[n.timestamps].values,
+                                        cells, weights, n.grid_shape[0] * n.grid_shape[1]))
+
+    return np.vstack(blocks)
+
+
+def render(f, outdir):
+    """
+    Draw and save map of first timestamp of NAME file
+    f -- NAME file path
+    outdir -- output image directory
+    """
+    n = name.Name(f)
+    drawmap.drawMap(n, n.timestamps[0], outdir=outdir, outfile='render.png', logos=False)
+
+
+def best(func, repeat):
+    """
+    Return best wall time in seconds of repeated calls to function.
+    Library progress messages are discarded while timing.
+
+    func -- function of no arguments
+    repeat -- number of calls
+    """
+    times = []
+    stdout = sys.stdout
+
+    with open(os.devnull, 'w') as null:
+        for i in range(repeat):
+            sys.stdout = null
+            try:
+                t = time.time()
+                func()
+                times.append(time.time() - t)
+            finally:
+                sys.stdout = stdout
+
+    return min(times)
+
+
+def canrender():
+    """
+    Return True if Basemap plotting is available
+    """
+    try:
+        from mpl_toolkits.basemap import Basemap
+    except ImportError:
+        return False
+
+    return True
+
+
+def benchmark(size, workdir, files=4, repeat=3, stages=STAGES):
+    """
+    Return dict of best stage times in seconds for grid size
+    size -- grid size name, key of SIZES
+    workdir -- directory for synthetic NAME files and images
+    files -- number of NAME files summed and integrated
+    repeat -- number of times each stage is run
+    stages -- list of stage names to run
+    """
+    options = SIZES[size]
+
+    # Synthetic files are written once and reused by later runs
+    indir = os.path.join(workdir, '{}_{}'.format(size, files))
+    if not os.path.isdir(indir):
+        print 'Writing {} synthetic NAME files to {}...'.format(files, indir)
+        writeRun(indir, files, runname=size.upper(), **options)
+
+    paths = sorted(namesum.Sum(indir).fs.getAll())
+    zones = zonegrid(options)
+
+    funcs = OrderedDict([
+        ('parse', lambda: name.Name(paths[0])),
+        ('parse_sparse', lambda: name.Name(paths[0], sparse=True)),
+        ('sum', lambda: namesum.Sum(indir).sumAll()),
+        ('sum_sparse', lambda: namesum.Sum(indir, sparse=True).sumAll()),
+        ('zones', lambda: integrate(paths, zones)),
+        ('zones_sparse', lambda: integrate(paths, zones, sparse=True)),
+        ('render', lambda: render(paths[0], os.path.join(workdir, 'images'))),
+    ])
+
+    results = OrderedDict()
+
+    for stage in stages:
+        if stage == 'render' and not canrender():
+            print '{:<8} {:<14} {:>10}'.format(size, stage, 'skipped')
+            continue
+
+        results[stage] = round(best(funcs[stage], repeat), 4)
+        print '{:<8} {:<14} {:>10.3f}'.format(size, stage, results[stage])
+
+    return results
+
+
+def compare(old, new):
+    """
+    Print table of stage times from earlier and current results
+    old -- earlier results dict
+    new -- current results dict
+    """
+    print
+    print 'Compared with {} ({})'.format(old.get('commit'), old.get('date'))
+    print '{:<8} {:<14} {:>10} {:>10} {:>8}'.format('size', 'stage', 'before', 'after', 'ratio')
+
+    for size in new['results']:
+        for (stage, t) in new['results'][size].items():
+            t0 = old.get('results', {}).get(size, {}).get(stage)
+            if t0 is None:
+                print '{:<8} {:<14} {:>10} {:>10.3f} {:>8}'.format(size, stage, '-', t, '-')
+            else:
+                print '{:<8} {:<14} {:>10.3f} {:>10.3f} {:>8.2f}'.format(size, stage, t0, t, t / t0 if t0 else float('nan'))
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='suite', description="Benchmark NAME parse, sum, zone and render stages.")
+    parser.add_argument("-s", "--sizes", nargs='+', choices=SIZES.keys(), default=['small', 'medium'],
+                        help="Grid sizes to benchmark [%(default)s]")
+    parser.add_argument("--stages", nargs='+', choices=STAGES, default=STAGES, help="Stages to benchmark")
+    parser.add_argument("-n", "--files", type=int, default=4, help="NAME files per sum and zone stage [%(default)s]")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Runs per stage, best time kept [%(default)s]")
+    parser.add_argument("-w", "--workdir", help="Directory to keep synthetic NAME files between runs, default is temporary")
+    parser.add_argument("-o", "--outdir", default=RESULTS, help="Results directory [%(default)s]")
+    parser.add_argument("-c", "--compare", help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    # Read before running, as results of the same commit replace it
+    old = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            old = json.load(f)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='namebench')
+
+    data = OrderedDict([('commit', commit()),
+                        ('date', datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
+                        ('python', platform.python_version()),
+                        ('files', args.files),
+                        ('repeat', args.repeat),
+                        ('results', OrderedDict())])
+
+    print '{:<8} {:<14} {:>10}'.format('size', 'stage', 'seconds')
+
+    try:
+        for size in args.sizes:
+            data['results'][size] = benchmark(size, workdir, args.files, args.repeat, args.stages)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if not os.path.isdir(args.outdir):
+        os.makedirs(args.outdir)
+
+    outfile = os.path.join(args.outdir, '{}.json'.format(data['commit']))
+    with open(outfile, 'w') as f:
+        json.dump(data, f, indent=1)
+    print 'Written results: {}'.format(outfile)
+
+    if old:
+        compare(old, data)
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,11 @@
 #
 # makemastergrid.py --help
 # makemastergrid.py -n [NAME file] -s [list of shape files] -o [output grid file]
+# makemastergrid.py -n [NAME file] -s [list of shape files] -g [zone groups file] -o [output grid file]
+#
+# A zone groups file lists "child, parent" pairs, where the child is a zone
+# (shapefile short name) or another group. It is checked, and saved beside
+# the master grid as [output grid file].groups.json for use by zonecsv.
 #
 
 import argparse
@@ -25,6 +30,7 @@ import numpy as np
 import pandas as pd
 import geopandas as gpd
 import itertools
+import json
 
 from shapely import speedups
 from shapely.geometry import Polygon
@@ -39,6 +45,8 @@ if speedups.available:
 parser = argparse.ArgumentParser(prog='makemastergrid', description='Generate master grid file from ESRI zones.')
 parser.add_argument("-n", "--namefile", help='Input NAME file to define grid shape', required=True)
 parser.add_argument("-s", "--shapelist", help='File containing list of input shapefiles', required=True)
+parser.add_argument("-t", "--tolerance", type=float, default=0.0, help='Simplify zone shapes to this tolerance in degrees, for coarse grids [%(default)s]')
+parser.add_argument("-g", "--groups", help='File containing zone hierarchy, one "zone, group" pair per line')
 parser.add_argument("-o", "--outfile", help='Output master grid file name', required=True)
 args = parser.parse_args()
 
@@ -67,6 +75,12 @@ with open(args.shapelist, 'r') as shp:
 shortnames = [ util.shortname(f) for f in files ]
 pcnames = [ 'pc_' + s for s in shortnames ]
 
+# Read and check zone hierarchy before any covering factors are calculated
+if args.groups:
+    print "Reading zone groups %s..." % args.groups
+    groups = util.read_groups(args.groups)
+    (groupnames, groupmatrix) = util.group_matrix(shortnames, groups)
+
 # Get CRS from first shapefile
 s = gpd.read_file(files[0])
 
@@ -118,22 +132,13 @@ print "Starting covering factor calculations..."
 # Loop over input shapefiles
 for f in files:
 
-    shp = shape.Shape(f)
+    shp = shape.Shape(f, args.tolerance)
     print "Processing zone %s..." % shp.shortname
 
-    cover = gpd.sjoin(gd, shp.data, how='inner', op='intersects')
-
-    cover[shp.shortname] = [geom.coverfactor(shp.cu, s) for s in cover['grid']]
-
-    c2 = cover[shp.shortname]
+    # Covering factors indexed [lat, lon]; grid rows are in lon-major order
+    cover = geom.covergrid(shp.cu, (x0, y0), grid_size, (int(xsize), int(ysize)))
 
-    if not c2.index.is_unique:
-
-        print "Removing duplicate index for %s" % shp.shortname
-        c2 = c2[~c2.index.duplicated(keep='first')]
-
-
-    gd = gd.join(c2)
+    gd[shp.shortname] = cover.T.ravel()
 
 # Replacing NaNs
 gd = gd.fillna(0)
@@ -147,4 +152,9 @@ gd = gd.to_sparse(fill_value=0)
 print "Writing output file %s..." % args.outfile
 gd.to_pickle(args.outfile)
 
+if args.groups:
+    print "Writing zone groups file %s..." % (args.outfile + '.groups.json')
+    with open(args.outfile + '.groups.json', 'w') as f:
+        json.dump(groups, f, indent=1, sort_keys=True)
+
 print "=== Done! ==="
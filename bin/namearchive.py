@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# NAMEARCHIVE
+#
+# Convert a directory of NAME files into a columnar Parquet archive,
+# partitioned by run name and date. Archives can be read back by Sum
+# in place of the original directory. Re-running adds only new or
+# modified files.
+#
+# Requires supporting libraries in namereader/.
+#
+# EXAMPLES:
+#
+# namearchive.py --help
+# namearchive.py -d [input dir] -o [archive dir]
+#
+
+import argparse
+
+from pynameplot.namereader import archive, fileset
+
+# -------------------------------------
+
+parser = argparse.ArgumentParser(prog='namearchive', description="Archive NAME concentration files as Parquet dataset.")
+parser.add_argument("-d", "--indir", help="Input NAME file directory", required=True)
+parser.add_argument("-o", "--outdir", help="Output archive directory", required=True)
+
+args = parser.parse_args()
+
+print '+++ Starting namearchive... +++'
+
+a = archive.Archive(args.outdir)
+added = a.ingest(fileset.Fileset(args.indir).getAll())
+
+print "Archived %d new files, %d files in archive" % (len(added), len(a.files))
+
+print "Done!"
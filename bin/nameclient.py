@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# NAMECLIENT
+#
+# Send jobs to a running NAME render server (nameserver.py) over its
+# Unix socket, and print the responses. Exits non-zero if any job fails.
+#
+# Requires supporting libraries in namereader/.
+#
+# EXAMPLES:
+#
+# nameclient.py --help
+# nameclient.py -s /tmp/nameplot.sock -n [NAME file] -o [output dir]
+# nameclient.py -s /tmp/nameplot.sock -d [input dir] --day 20150501 -o [output dir]
+# nameclient.py -s /tmp/nameplot.sock -f jobs.jsonl
+#
+
+import argparse
+import json
+import os
+import sys
+
+from pynameplot.namereader import server
+
+# -------------------------------------
+
+parser = argparse.ArgumentParser(prog='nameclient', description="Send jobs to NAME render server.")
+parser.add_argument("-s", "--socket", help="Render server Unix socket path", required=True)
+group = parser.add_mutually_exclusive_group(required=True)
+group.add_argument("-n", "--namefile", nargs='+', help="NAME files to plot, one render job each")
+group.add_argument("-d", "--indir", help="NAME file directory to sum and plot")
+group.add_argument("-f", "--jobfile", help="File of JSON job lines, '-' for stdin")
+group.add_argument("--ping", action='store_true', default=False, help="Check server is running")
+parser.add_argument("-t", "--time", help="Timestamp to plot from each NAME file")
+group2 = parser.add_mutually_exclusive_group()
+group2.add_argument("--day", help="Sum NAME files for this day (YYYYMMDD)")
+group2.add_argument("--week", help="Sum NAME files for this ISO week number")
+group2.add_argument("--month", help="Sum NAME files for this month number")
+group2.add_argument("--year", help="Sum NAME files for this year")
+parser.add_argument("-o", "--outdir", default='', help="Plot output directory")
+
+args = parser.parse_args()
+
+# -------------------------------------
+
+# Server may run in another directory, so send absolute paths
+options = {}
+if args.outdir:
+    options['outdir'] = os.path.abspath(args.outdir)
+
+if args.jobfile:
+    f = sys.stdin if args.jobfile == '-' else open(args.jobfile, 'r')
+    jobs = [json.loads(line) for line in f if line.strip()]
+
+elif args.namefile:
+    jobs = []
+    for (i, namefile) in enumerate(args.namefile):
+        job = {'id': i, 'type': 'render', 'file': os.path.abspath(namefile), 'options': options}
+        if args.time:
+            job['time'] = args.time
+        jobs.append(job)
+
+elif args.indir:
+    job = {'id': 0, 'type': 'sum', 'directory': os.path.abspath(args.indir), 'by': 'all', 'options': options}
+    for by in ['day', 'week', 'month', 'year']:
+        if getattr(args, by):
+            job['by'] = by
+            job['value'] = getattr(args, by)
+    jobs = [job]
+
+else:
+    jobs = [{'id': 0, 'type': 'ping'}]
+
+failed = 0
+
+for response in server.request(args.socket, jobs):
+    if response['status'] == 'ok':
+        for output in response['outputs']:
+            print output
+    else:
+        failed += 1
+        print >> sys.stderr, 'Job {} failed: {}'.format(response['id'], response['error'])
+
+sys.exit(1 if failed else 0)
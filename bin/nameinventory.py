@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# NAMEINVENTORY
+#
+# List run name, grid, release window, direction and timestamps of every
+# NAME file in a directory, read from file headers only. Writes the
+# inventory as a CSV or JSON table, and prints the distinct grids found,
+# to check files can be summed together before reprocessing.
+#
+# Requires supporting libraries in namereader/.
+#
+# EXAMPLES:
+#
+# nameinventory.py --help
+# nameinventory.py -d [input dir] -o [output csv file]
+# nameinventory.py -d [input dir] -o [output json file] -t 16
+#
+
+import argparse
+import os
+import time
+
+from pynameplot.namereader import fileset, inventory
+
+# -------------------------------------
+
+parser = argparse.ArgumentParser(prog='nameinventory', description="List NAME file headers as inventory table.")
+parser.add_argument("-d", "--indir", help="Input NAME file directory", required=True)
+parser.add_argument("-o", "--outfile", help="Output inventory file, JSON if name ends .json, otherwise CSV", required=True)
+parser.add_argument("-t", "--threads", type=int, default=8, help="Files read at once [%(default)s]")
+
+args = parser.parse_args()
+
+print '+++ Starting nameinventory... +++'
+
+# -------------------------------------
+
+files = sorted(fileset.Fileset(args.indir).getAll())
+print "Scanning %d NAME files..." % len(files)
+
+t = time.time()
+table = inventory.inventory(files, threads=args.threads)
+print "Scanned %d files in %.1f seconds" % (len(table), time.time() - t)
+
+print "Writing output file %s..." % args.outfile
+
+if os.path.splitext(args.outfile)[1].lower() == '.json':
+    table.to_json(args.outfile, orient='records')
+else:
+    table.to_csv(args.outfile, index=False)
+
+errors = table[table['error'].notnull()]
+for (f, e) in zip(errors['file'], errors['error']):
+    print "Cannot read %s: %s" % (f, e)
+
+grids = inventory.grids(table)
+print "Found %d NAME grids:" % len(grids)
+print grids.to_string(index=False)
+
+print "Done!"
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# NAMERASTER
+#
+# Convert one or more NAME files to gridded raster output, either
+# a single NetCDF4 file with a time dimension, or one GeoTIFF file
+# per timestamp.
+#
+# Requires supporting libraries in namereader/.
+#
+# EXAMPLES:
+#
+# nameraster.py --help
+# nameraster.py -d [input dir] -o [output netcdf file]
+# nameraster.py -n [NAME file] -f geotiff -o [output directory]
+#
+
+import argparse
+
+from pynameplot.namereader import fileset, name, raster
+
+# -------------------------------------
+
+parser = argparse.ArgumentParser(prog='nameraster', description="Convert NAME concentration files to raster files.")
+group = parser.add_mutually_exclusive_group(required=True)
+group.add_argument("-d", "--indir", help="Input NAME file directory")
+group.add_argument("-n", "--namefile", help="Input NAME file to convert")
+parser.add_argument("-o", "--outfile", help="Output NetCDF file, or output directory for GeoTIFF", required=True)
+parser.add_argument("-f", "--format", choices=['netcdf', 'geotiff'], default='netcdf', help="Output raster format [%(default)s]")
+group2 = parser.add_mutually_exclusive_group()
+group2.add_argument("-w", "--week", type=int, help="Select NAME files from ISO week number")
+group2.add_argument("-m", "--month", type=int, help="Select NAME files from Month number")
+group2.add_argument("-y", "--year", help="Select NAME files from Year")
+
+args = parser.parse_args()
+
+print '+++ Starting nameraster... +++'
+
+# -------------------------------------
+
+if args.namefile:
+    files = [args.namefile]
+
+if args.indir:
+    f = fileset.Fileset(args.indir)
+    if args.week:
+        files = f.weeks[args.week]
+    elif args.month:
+        files = f.months[str(args.month)]
+    elif args.year:
+        files = f.years[args.year]
+    else:
+        files = f.getAll()
+
+if args.format == 'netcdf':
+    print "Writing output file %s..." % args.outfile
+    steps = raster.writeNetCDF(sorted(files), args.outfile)
+    print "Wrote %d time steps" % steps
+else:
+    for n in sorted(files):
+        print "Loading NAME file %s..." % n
+        raster.writeGeoTIFF(name.Name(n, sparse=True), args.outfile)
+
+print "Done!"
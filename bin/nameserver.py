@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# NAMESERVER
+#
+# Long-running NAME render server. Reads render and sum jobs as JSON
+# lines, from stdin or a Unix socket, and draws maps on a pool of worker
+# processes that stay loaded between jobs. See namereader/server.py for
+# the job format.
+#
+# Requires supporting libraries in namereader/.
+#
+# EXAMPLES:
+#
+# nameserver.py --help
+# nameserver.py -s /tmp/nameplot.sock -j 4
+# nameserver.py < jobs.jsonl > responses.jsonl
+#
+
+import argparse
+
+from pynameplot.namereader import server
+
+# -------------------------------------
+
+parser = argparse.ArgumentParser(prog='nameserver', description="Serve NAME map rendering jobs.")
+parser.add_argument("-s", "--socket", help="Unix socket path to listen on, default is to read jobs from stdin")
+parser.add_argument("-j", "--workers", type=int, default=2, help="Number of worker processes [%(default)s]")
+
+args = parser.parse_args()
+
+if args.socket:
+    server.serveSocket(args.socket, workers=args.workers)
+else:
+    server.serveStdin(workers=args.workers)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# NAMEWATCH
+#
+# Watch a directory of NAME files, keeping running day, week, month,
+# year and overall sums up to date as new files arrive. Only sums
+# containing new or changed files are redrawn, and optionally written
+# out as zone CSV files.
+#
+# Requires supporting libraries in namereader/.
+#
+# EXAMPLES:
+#
+# namewatch.py --help
+# namewatch.py -d [input dir] -s [state dir] -o [output dir]
+# namewatch.py -d [input dir] -s [state dir] -o [output dir] -g [grid file] -b month year --once
+#
+
+import argparse
+import os
+import re
+
+from pynameplot.namereader import drawmap, namesum, zonetotal
+
+# -------------------------------------
+
+parser = argparse.ArgumentParser(prog='namewatch', description="Keep running sums of NAME files up to date.")
+parser.add_argument("-d", "--indir", help="Input NAME file directory, or NAME archive", required=True)
+parser.add_argument("-s", "--statedir", help="Directory holding running sum state", required=True)
+parser.add_argument("-o", "--outdir", help="Output directory for plots and zone CSV files", required=True)
+parser.add_argument("-g", "--grid", help="Master grid file, write zone CSV file for each updated sum")
+parser.add_argument("-b", "--buckets", nargs='+', choices=['day', 'week', 'month', 'year', 'all'],
+                    default=['month', 'year'], help="Running sums to redraw [%(default)s]")
+parser.add_argument("-i", "--interval", type=int, default=300, help="Seconds between directory scans [%(default)s]")
+parser.add_argument("--once", action='store_true', default=False, help="Update once and exit")
+
+args = parser.parse_args()
+
+print '+++ Starting namewatch... +++'
+
+# -------------------------------------
+
+zones = None
+if args.grid:
+    zones = zonetotal.ZoneTotal(args.grid)
+
+s = namesum.Sum(args.indir)
+
+
+def zonecsv(s, bucket):
+    """Write zone sums of running sum to CSV file, as zonecsv"""
+    table = zones.table([zones.integrate(s, ['total'])])
+
+    filename = os.path.join(args.outdir, '{}_{}_zones.csv'.format(s.runname, bucket))
+    with open(filename, 'wb') as csvfile:
+        zones.writerows(csvfile, [bucket], table)
+
+    print 'Created zone file: {}'.format(filename)
+
+
+def redraw(buckets):
+    """Redraw plots and zone files for updated running sums"""
+    for bucket in buckets:
+        if re.match(r'[a-z]+', bucket).group(0) not in args.buckets:
+            continue
+
+        print "Updating sum %s..." % bucket
+        s.loadBucket(args.statedir, bucket)
+        drawmap.drawMap(s, 'total', outdir=args.outdir)
+
+        if zones is not None:
+            zonecsv(s, bucket)
+
+
+if args.once:
+    redraw(s.update(args.statedir))
+else:
+    s.watch(args.statedir, redraw, interval=args.interval)
+
+print "Done!"
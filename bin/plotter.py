@@ -20,6 +20,7 @@
 # 
 
 import argparse
+import atexit
 import os
 import calendar
 import textwrap
@@ -40,8 +41,41 @@ Save output to disk
 """
 
 def drawMap(n, column):
+    # Read list of shapefiles and colours, if selected
+    files = []
+    colors = []
+    if shapelist:
+        with open(shapelist, 'r') as f:
+            for line in f:
+                if "," in line:
+                    (filename, colorname) = line.split(",", 1)
+                    filename = filename.strip()
+                    colorname = colorname.strip()
+                    
+                    files.append(filename)
+                    colors.append(colorname)
+
     # Create Map object from NAME data
     m = namemap.Map(n, column=column)
+
+    # If output directory does not exist, create it
+    if outdir:
+        if not os.path.exists(outdir):
+            os.makedirs(outdir)
+        m.outdir = outdir
+
+    # Skip plot if made from the same inputs, shapefiles and configuration
+    filename = m.getPath(outfile)
+    fp = None
+    if args.force:
+        fingerprint.discard(filename)
+    else:
+        inputs = fingerprint.inputs(n) + ([shapelist] if shapelist else []) + files
+        fp = fingerprint.fingerprint(inputs, dict(config, column=column, outfile=outfile))
+        if fingerprint.uptodate(filename, fp):
+            print 'Skipping up-to-date plot file: {}'.format(filename)
+            m.free()
+            return
     
     # Set projection if defined, otherwise cylindrical
     if projection:
@@ -99,18 +133,6 @@ def drawMap(n, column):
 
     # Add shapefile overlays if selected
     if shapelist:
-        files = []
-        colors = []
-        with open(shapelist, 'r') as f:
-            for line in f:
-                if "," in line:
-                    (filename, colorname) = line.split(",", 1)
-                    filename = filename.strip()
-                    colorname = colorname.strip()
-                    
-                    files.append(filename)
-                    colors.append(colorname)
-
         # Load zones into map object
         m.zoneLoad(files)
 
@@ -126,17 +148,9 @@ def drawMap(n, column):
             print 'Plotting zone colours...'
             m.zoneColour(colors)
 
-    # If output directory does not exist, create it
-    if outdir:
-        if not os.path.exists(outdir):
-            os.makedirs(outdir)
-        m.outdir = outdir
-
-    # Save output to disk
-    if outfile:
-        m.saveFile(filename=outfile)
-    else:
-        m.saveFile()
+    # Save output to disk, recording fingerprint once written
+    m.saveFile(filename=outfile or None, done=(lambda: fingerprint.record(filename, fp)) if fp else None)
+    m.free()
 
 
 # ------------------------------------
@@ -185,9 +199,16 @@ outdir:      Output directory for plot files, create if does not exist
 
 parser = argparse.ArgumentParser(prog='plotter', formatter_class=argparse.RawDescriptionHelpFormatter, description='Plot NAME concentration files on world map', epilog=epilog)
 parser.add_argument("-c", "--config", help="Configuration file", required=True)
+parser.add_argument("--profile", help="Write stage timing and memory report to this file (.json or .csv)")
+parser.add_argument("--force", action='store_true', default=False, help="Redraw plots even if inputs and configuration are unchanged since they were made")
 
 args = parser.parse_args()
 
+# Record stage timings, report written at exit even if plotting fails
+if args.profile:
+    instrument.enable()
+    atexit.register(instrument.dump, args.profile)
+
 # ------------------------------------
 # Configuration options
 
@@ -244,24 +265,30 @@ outfile = config.get('outfile')  # Output plot file name root
 
 # ------------------------------------
 
+# Only read grid cells within map bounds for cylindrical plots
+if not projection or projection == 'cyl':
+    bbox = util.get_bbox(lon_bounds, lat_bounds)
+else:
+    bbox = None
 
 # read NAME data into object
 
 if infile:
-    n = name.Name(infile)
     if timestamp:
-        # draw map for single timestamp
+        # draw map for single timestamp, reading only that column
+        n = name.Name(infile, bbox=bbox, columns=[timestamp])
         column = timestamp
         n.column = column
         drawMap(n, column)
     else:
         # draw maps for all timestamps in file
+        n = name.Name(infile, bbox=bbox)
         for column in n.timestamps:
             n.column = column
             drawMap(n, column)
 
 elif indir:
-    s = namesum.Sum(indir)
+    s = namesum.Sum(indir, bbox=bbox)
     column = 'total'
 
     if day:
@@ -315,7 +342,7 @@ elif indir:
         allfiles = sorted(s.fs.getAll())
 
         for f in allfiles:
-            n = name.Name(f)
+            n = name.Name(f, bbox=bbox)
             for column in n.timestamps:
                 n.column = column
                 drawMap(n, column)
@@ -17,12 +17,20 @@
 # 
 # zonecsv.py --help
 # zonecsv.py -d [input dir] -g [grid file] -o [output csv file]
+# zonecsv.py -d [input dir] -g [grid file] -o [output csv file] --append
+#
+# In append mode, files already processed into the output CSV are listed
+# in a [output csv file].state sidecar file, and only rows for new files
+# are appended.
 #
 
 import argparse
+import numpy as np
 import pandas as pd
-import csv
-from pynameplot.namereader import fileset, name, util
+import json
+import os
+from StringIO import StringIO
+from pynameplot.namereader import fileset, name, source, zonetotal
 
 # -------------------------------------
 
@@ -32,10 +40,14 @@ group.add_argument("-d", "--indir", help="Input NAME file directory")
 group.add_argument("-n", "--namefile", help="Input NAME file to sum over")
 parser.add_argument("-g", "--grid", help="Input master grid file", required=True)
 parser.add_argument("-o", "--outfile", help="Output CSV results file", required=True)
+parser.add_argument("-f", "--format", choices=['csv', 'parquet', 'npz'],
+                    help="Output file format, default is from output file extension, else csv")
 group2 = parser.add_mutually_exclusive_group()
 group2.add_argument("-w", "--week", help="Select NAME files from ISO week number")
 group2.add_argument("-m", "--month", help="Select NAME files from Month number")
 group2.add_argument("-y", "--year", help="Select NAME files from Year")
+parser.add_argument("-s", "--sparse", action='store_true', help="Hold NAME data in sparse form to reduce memory use")
+parser.add_argument("-a", "--append", action='store_true', help="Append rows for new NAME files only, to existing output file")
 
 args = parser.parse_args()
 
@@ -47,11 +59,8 @@ print '+++ Starting zonecsv... +++'
 
 # -------------------------------------
 
-# Load zone gridfile
-zones = pd.read_pickle(args.grid)
-zones = zones.to_dense()
-zones = zones.fillna(0)
-print "Loaded master grid file %s..." % args.grid
+# Load zone gridfile, and zone hierarchy if any
+zones = zonetotal.ZoneTotal(args.grid)
 
 # 
 if args.namefile:
@@ -68,45 +77,90 @@ if args.indir:
     else:
         files = f.getAll()
 
-print "Writing output file %s..." % args.outfile
+# Output format from option, otherwise from output file extension
+fmt = args.format
+if not fmt:
+    fmt = {'.parquet': 'parquet', '.npz': 'npz'}.get(os.path.splitext(args.outfile)[1].lower(), 'csv')
 
-with open(args.outfile, 'w') as csvfile:
+if args.append and fmt != 'csv':
+    raise ValueError("Append mode is only supported for CSV output")
 
-    # Generate zone column names
-    shortnames = list(zones)[2::]
-    pc_cols = ['pc_' + s for s in shortnames]
-    fieldnames = ['Timestamp'] + shortnames + pc_cols
+# Sidecar state file lists NAME files already in output file
+statefile = args.outfile + '.state'
+state = {'files': {}, 'length': 0}
 
-    writer = csv.DictWriter(csvfile, fieldnames=fieldnames, quoting=csv.QUOTE_NONNUMERIC)
-    writer.writeheader()
+if args.append and os.path.isfile(args.outfile) and os.path.isfile(statefile):
+    with open(statefile, 'r') as f:
+        state = json.load(f)
 
-    if 'grid' in zones.columns:
-        zones = zones.drop('grid', 1)
+    new = []
+    for n in files:
+        key = os.path.basename(n)
+        if key not in state['files']:
+            new.append(n)
+        elif state['files'][key] != list(source.stamp(n)):
+            print "Warning: %s changed since it was processed, rerun without --append to update it" % n
 
-    if 'geometry' in zones.columns:
-        zones = zones.drop('geometry', 1)
+    print "Skipping %d files already in output file..." % (len(files) - len(new))
+    files = new
 
-    for n in sorted(files):
+if state['length'] and state['fieldnames'] != zones.fieldnames:
+    raise ValueError("Zones in %s do not match existing output file %s" % (args.grid, args.outfile))
+state['fieldnames'] = zones.fieldnames
 
-        # Instantiate NAME object from file
-        namefile = name.Name(n)
-        timestamps = namefile.timestamps
-        namedata = namefile.data
-        print "Loaded NAME file %s..." % n
+# Zone totals are collected as one (timestamps x zones) block per file
+timestamps = []
+blocks = []
 
-        foo = namedata.join(zones, how='inner')
+for n in sorted(files):
 
-        for t in timestamps:
-            print "Processing time %s..." % t
+    # Instantiate NAME object from file
+    namefile = name.Name(n, sparse=args.sparse)
+    print "Loaded NAME file %s..." % n
 
-            totals = {s: (foo[s] * foo[t]).sum() for s in shortnames}
+    timestamps.extend(namefile.timestamps)
+    blocks.append(zones.integrate(namefile))
 
-            sum_conc = sum(totals.values())
-        
-            percents = {'pc_'+s: (totals[s] / sum_conc) * 100.0 for s in shortnames}
+# Zone, group and percentage columns for all timestamps at once
+table = zones.table(blocks)
 
-            row = util.merge_dicts({"Timestamp": t}, totals, percents)
+print "Writing output file %s..." % args.outfile
 
-            writer.writerow(row)
+if fmt == 'npz':
+    k = len(zones.zones + zones.groups)
+    np.savez_compressed(args.outfile, timestamps=np.array(timestamps), zones=np.array(zones.zones + zones.groups),
+                        totals=table[:, :k], percents=table[:, k:])
+
+elif fmt == 'parquet':
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    df = pd.DataFrame(table, columns=zones.columns)
+    df.insert(0, 'Timestamp', timestamps)
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), args.outfile, compression='snappy')
+
+else:
+    # Rows are formatted in bulk, then written to output file in one go
+    buf = StringIO()
+    zones.writerows(buf, timestamps, table, header=not state['length'])
+
+    # In append mode, the output file is first cut back to its length at the
+    # last completed run, so a run interrupted part way through never leaves
+    # partial rows behind.
+    mode = 'r+b' if state['length'] else 'wb'
+    with open(args.outfile, mode) as csvfile:
+        csvfile.truncate(state['length'])
+        csvfile.seek(state['length'])
+        csvfile.write(buf.getvalue())
+        csvfile.flush()
+        os.fsync(csvfile.fileno())
+        state['length'] = csvfile.tell()
+
+    for n in files:
+        state['files'][os.path.basename(n)] = list(source.stamp(n))
+
+    with open(statefile + '.tmp', 'w') as f:
+        json.dump(state, f)
+    os.rename(statefile + '.tmp', statefile)
 
 print "Done!"
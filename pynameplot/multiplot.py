@@ -0,0 +1,324 @@
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# MULTIPLOT
+#
+# Plot multiple NAME datasets on one geographical map, each drawn as a
+# solid, contour or filled contour overlay in its own colour. Reads
+# configuration file to set input data paths, plot extent,
+# normalisation, colormap and caption. Save output to PNG file.
+#
+# Datasets are numbered in the configuration file: infile/indir and
+# color1 for the first, infileN/indirN and colorN for each further
+# dataset, and stationN for station markers. There is no limit on the
+# number of datasets.
+#
+
+import argparse
+import calendar
+import gc
+import os
+import re
+
+from configobj import ConfigObj
+
+from namereader import imagewriter
+from namereader import instrument
+from namereader import namemap
+from namereader import namesum
+from namereader import overlay
+
+
+def numbered(config, key):
+    """
+    Return dict of numbered configuration values, e.g. color1, color2...
+    config -- ConfigObj configuration
+    key -- configuration key prefix
+    """
+    values = {}
+
+    for k in config:
+        m = re.match(r'^{}(\d+)$'.format(key), k)
+        if m and config[k]:
+            values[int(m.group(1))] = config[k]
+
+    return values
+
+
+class MultiPlot(object):
+    """
+    Overlay plot of multiple NAME datasets from configuration file
+    """
+
+    def __init__(self, config, style='solid', writer=None):
+        """
+        Initialise MultiPlot object
+
+        config -- ConfigObj configuration
+        style -- overlay style, one of overlay.STYLES
+        writer -- imagewriter.ImageWriter to write images in the background, or None
+        """
+
+        if style not in overlay.STYLES:
+            raise ValueError('Unknown overlay style: {}'.format(style))
+
+        self.config = config
+        self.style = style
+        self.writer = writer
+
+        # Supplemental datasets 2, 3, ... and colours for all datasets
+        self.add_file = dict((i, v) for (i, v) in numbered(config, 'infile').items() if i > 1)
+        self.add_dir = dict((i, v) for (i, v) in numbered(config, 'indir').items() if i > 1)
+        self.add_color = numbered(config, 'color')
+        self.stations = numbered(config, 'station')
+
+        self.caption = config.get('caption')
+        self.runname = config.get('runname')
+        self.outfile = config.get('outfile')
+
+        # Load-once store of datasets, shared by all frames
+        self.store = overlay.DataStore()
+
+    def drawMap(self, n, column, runname=''):
+        """
+        Create Map object and draw base map for dataset
+        n -- Name or Sum object setting map extent and caption
+        column -- name of data column
+        runname -- replace runname part of caption only
+        """
+        config = self.config
+
+        m = namemap.Map(n, column=column, runname=runname)
+
+        # Set projection if defined, otherwise cylindrical
+        if config.get('projection'):
+            m.setProjection(config.get('projection'))
+
+        # Set map bounds from config file, otherwise scale by grid file
+        if config.get('lon_bounds') and config.get('lat_bounds'):
+            m.setBounds(config.get('lon_bounds'), config.get('lat_bounds'))
+        else:
+            m.setBounds(n.lon_bounds, n.lat_bounds)
+
+        # Set map axes from config file, else scale by grid file
+        if config.get('lon_axis') and config.get('lat_axis'):
+            lon = [float(i) for i in config.get('lon_axis')]
+            lat = [float(i) for i in config.get('lat_axis')]
+            m.setAxes(lon, lat)
+        else:
+            m.setAxes(n.lon_grid, n.lat_grid)
+
+        # Set scale if defined, otherwise standard scale
+        if config.get('scale'):
+            (scale_min, scale_max) = config.get('scale')
+            m.setFixedScale(scale_min, scale_max)
+        elif config.get('autoscale'):
+            m.setAutoScale(column)
+
+        if self.caption:
+            m.drawBase(self.caption, fontsize=8)
+        else:
+            m.drawBase(m.caption, fontsize=8)
+
+        # Add station markers
+        for i in sorted(self.stations):
+            (station_lon, station_lat) = self.stations[i]
+            x,y = m.m(float(station_lon), float(station_lat))
+            m.m.plot(x, y, 'kx', markersize=4, color='black', zorder=25)
+
+        return m
+
+    def drawFrame(self, n, column, datasets, runname=''):
+        """
+        Draw base map and all dataset overlays for one frame, save to disk
+        n -- base Name or Sum object, dataset 1
+        column -- name of data column
+        datasets -- dict of further Name or Sum objects by dataset number
+        runname -- replace runname part of caption only
+        """
+        m = self.drawMap(n, column, runname)
+
+        layers = [(1, n)] + [(i, datasets[i]) for i in sorted(datasets)]
+
+        # Only datasets with data for this frame are drawn or listed
+        layers = [(i, d) for (i, d) in layers if column == 'total' or column in d.timestamps]
+
+        overlay.drawOverlays(m, [(d, self.add_color.get(i)) for (i, d) in layers], column,
+                             style=self.style, store=self.store,
+                             zorder=20 if self.style != 'solid' else 10)
+
+        self.saveMap(m, [d.runname for (i, d) in layers], [self.add_color.get(i) for (i, d) in layers])
+
+    def saveMap(self, m, labels, colors):
+        """
+        Add legend and save map plot to disk
+        m -- Map object
+        labels -- legend label per dataset
+        colors -- HTML colour per dataset
+        """
+        import matplotlib.pyplot as plt
+
+        # Add legend
+        proxy = [plt.Rectangle((0,0),1,1,fc=color) for color in colors]
+        plt.legend(proxy, labels, loc='upper right', fontsize='small').set_zorder(102)
+
+        # If output directory does not exist, create it
+        outdir = self.config.get('outdir')
+        if outdir:
+            if not os.path.exists(outdir):
+                os.makedirs(outdir)
+            m.outdir = outdir
+
+        # Save output to disk
+        if self.outfile:
+            m.saveFile(filename=self.outfile, writer=self.writer)
+        else:
+            m.saveFile(writer=self.writer)
+
+        m.free()
+
+    def plotFile(self, infile):
+        """
+        Plot single NAME file, with supplemental files overlaid
+        infile -- path to NAME file
+        """
+        n = self.store.loadFile(infile)
+
+        datasets = dict((i, self.store.loadFile(f)) for (i, f) in self.add_file.items())
+
+        timestamp = self.config.get('timestamp')
+        columns = [timestamp] if timestamp else n.timestamps
+
+        # draw maps for given timestamp, or all timestamps in file
+        for column in columns:
+            n.column = column
+            self.drawFrame(n, column, datasets, self.runname)
+
+    def plotSum(self, indir, by, value):
+        """
+        Plot sum of NAME files in directory, with supplemental directories overlaid
+        indir -- input directory path
+        by -- sum period, one of 'day', 'week', 'month' or 'year'
+        value -- day, week, month or year to sum over
+        """
+        runname = self.runname
+
+        s = self.store.loadSum(indir, by, value)
+
+        if by == 'day':
+            caption = "{} {} {} {}: {}{}{} day sum".format(runname or s.runname, s.averaging, s.altitude, s.direction, s.year, calendar.month_name[int(s.month)], s.day)
+            outfile = "{}_{}{}{}_daily.png".format(runname or s.runname, s.year, s.month, s.day)
+        elif by == 'week':
+            caption = "{} {} {} {}: {} week {} sum".format(runname or s.runname, s.averaging, s.altitude, s.direction, s.year, value)
+            outfile = "{}_{}{}_weekly.png".format(runname or s.runname, s.year, value.zfill(2))
+        elif by == 'month':
+            caption = "{} {} {} {}: {} {} sum".format(runname or s.runname, s.averaging, s.altitude, s.direction, s.year, calendar.month_name[int(value)])
+            outfile = "{}_{}{}_monthly.png".format(runname or s.runname, s.year, value.zfill(2))
+        else:
+            caption = "{} {} {} {}: {} year sum".format(runname or s.runname, s.averaging, s.altitude, s.direction, value)
+            outfile = "{}_{}_yearly.png".format(runname or s.runname, value)
+
+        self.caption = self.caption or caption
+        self.outfile = self.outfile or outfile
+
+        datasets = dict((i, self.store.loadSum(d, by, value)) for (i, d) in self.add_dir.items())
+
+        self.drawFrame(s, 'total', datasets)
+
+    def plotDirectory(self, indir):
+        """
+        Plot all timestamps of all NAME files in directory, with files
+        for the same date in supplemental directories overlaid
+        indir -- input directory path
+        """
+
+        # date-sorted lists of files in each input directory
+        allfiles = dict((i, sorted(namesum.Sum(d).fs.getAll())) for (i, d) in self.add_dir.items())
+
+        # iterate over files in base directory
+        for f in sorted(namesum.Sum(indir).fs.getAll()):
+
+            # Base file and matching files in other directories are parsed once per base file
+            self.store = overlay.DataStore()
+            n = self.store.loadFile(f)
+
+            # Extract date from base filename
+            mapdate = re.findall('\d{8}', f)[0]
+
+            datasets = {}
+            for i in allfiles:
+                match_date = [m for m in allfiles[i] if mapdate in m]
+                if match_date:
+                    datasets[i] = self.store.loadFile(match_date[0])
+
+            # Iterate over timestamps in base file
+            for column in n.timestamps:
+                n.column = column
+                self.drawFrame(n, column, datasets, self.runname)
+
+            # Force manual garbage collection
+            gc.collect()
+
+    def run(self):
+        """
+        Draw all plots set by configuration file
+        """
+        config = self.config
+
+        if config.get('infile'):
+            self.plotFile(config.get('infile'))
+
+        elif config.get('indir'):
+            for by in ['day', 'week', 'month', 'year']:
+                if config.get(by):
+                    self.plotSum(config.get('indir'), by, config.get(by))
+                    break
+            else:
+                self.plotDirectory(config.get('indir'))
+
+        else:
+            raise ValueError('No input file or directory defined')
+
+
+def main(style=None):
+    parser = argparse.ArgumentParser(prog='multiplot', description='Plot multiple NAME datasets on world map')
+    parser.add_argument("-c", "--config", help="Configuration file", required=True)
+    parser.add_argument("-s", "--style", choices=overlay.STYLES, default=style or 'solid',
+                        help="Overlay style [%(default)s]")
+    parser.add_argument("--profile", help="Write stage timing and memory report to this file (.json or .csv)")
+    parser.add_argument("--threads", type=int, default=2,
+                        help="Background image writer threads, 0 to save each image with matplotlib before drawing the next [%(default)s]")
+
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.config):
+        exit('*** ERROR: Configuration file {} not found!'.format(args.config))
+
+    config = ConfigObj(args.config, raise_errors=True, list_values=True)
+
+    writer = None
+    if args.threads > 0:
+        writer = imagewriter.ImageWriter(threads=args.threads)
+
+    if args.profile:
+        instrument.enable()
+
+    try:
+        with instrument.span('run'):
+            try:
+                MultiPlot(config, args.style, writer).run()
+            finally:
+                # Wait for queued images to be written
+                if writer:
+                    writer.close()
+    finally:
+        if args.profile:
+            instrument.dump(args.profile)
+
+    print '*** Done!'
+
+
+if __name__ == "__main__":
+    main()
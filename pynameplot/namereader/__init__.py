@@ -9,4 +9,4 @@
 # 
 # Available routines in library package listed below.
 
-__all__ = ['drawmap', 'fileset', 'geom', 'header', 'namemap', 'name', 'shape', 'namesum', 'util']
+__all__ = ['archive', 'drawmap', 'fileset', 'fingerprint', 'geom', 'header', 'imagewriter', 'instrument', 'inventory', 'namemap', 'name', 'shape', 'namesum', 'overlay', 'raster', 'server', 'source', 'sparse', 'tiles', 'util', 'zonetotal']
@@ -0,0 +1,352 @@
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# ARCHIVE
+#
+# Support libraries. Columnar (Parquet) archive of a directory of NAME
+# files, partitioned by run name and date, for fast repeated queries.
+#
+
+import numpy as np
+import pandas as pd
+
+from collections import defaultdict
+import json
+import os
+
+from .fileset import Fileset
+from .geom import gridwindow
+from .name import Name
+from .source import stamp
+from .sparse import SparseGrid
+from .util import shortname, parse_timestamps
+
+# Archive index filename, stored at top of archive directory
+INDEX = '_archive.json'
+
+
+def isarchive(path):
+    """
+    Return True if path is a NAME archive directory
+    path -- directory path
+    """
+    return os.path.isfile(os.path.join(path, INDEX))
+
+
+class Archive(Fileset):
+    """
+    Columnar archive of NAME files. Each NAME file is stored as one Parquet
+    file of non-zero (timestamp, x_index, y_index, value) rows, under
+    run=[run name]/date=[YYYYMMDD]/ partition directories.
+
+    Extends Fileset, so archived files can be selected and summed by Sum
+    """
+
+    def __init__(self, path):
+        """
+        Initialise Archive object. Archive is created on first ingest.
+
+        path -- archive directory path
+        """
+        self.directory = path
+        self.index = {}
+
+        self.refresh()
+
+    def refresh(self):
+        """
+        Reload archive index, and rebuild file groupings from it
+        """
+        if isarchive(self.directory):
+            with open(os.path.join(self.directory, INDEX), 'r') as f:
+                self.index = json.load(f)
+
+        self.dates = {}
+        self.files = sorted(self.index.keys())
+        self.weeks = defaultdict(list)
+        self.months = defaultdict(list)
+        self.years = defaultdict(list)
+        self.groupFiles()
+
+    def save(self):
+        """
+        Write archive index to disk
+        """
+        filename = os.path.join(self.directory, INDEX)
+
+        with open(filename + '.tmp', 'w') as f:
+            json.dump(self.index, f)
+        os.rename(filename + '.tmp', filename)
+
+    def ingest(self, files):
+        """
+        Add NAME files to archive. Files already archived are skipped
+        unless modified since.
+
+        files -- list of NAME file paths
+        returns list of archived file keys
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        added = []
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        try:
+            for f in sorted(files):
+
+                key = shortname(f)
+                (mtime, size) = stamp(f)
+
+                entry = self.index.get(key)
+                if entry and entry['mtime'] == mtime and entry['size'] == size:
+                    continue
+
+                print 'Archiving: ', f
+                n = Name(f, sparse=True)
+
+                date = n.year + n.month + n.day
+                path = os.path.join('run={}'.format(n.runname), 'date={}'.format(date), key + '.parquet')
+                filename = os.path.join(self.directory, path)
+
+                if not os.path.isdir(os.path.dirname(filename)):
+                    os.makedirs(os.path.dirname(filename))
+
+                table = pa.Table.from_pandas(self.__rows(n), preserve_index=False)
+                pq.write_table(table, filename + '.tmp', compression='snappy', row_group_size=65536)
+                os.rename(filename + '.tmp', filename)
+
+                self.index[key] = {
+                    'filename': os.path.basename(f),
+                    'run': n.runname,
+                    'date': date,
+                    'path': path,
+                    'mtime': mtime,
+                    'size': size,
+                    'header': n.header,
+                    'ave': n.ave,
+                    'alt': n.alt,
+                    'timestamps': n.timestamps,
+                }
+                added.append(key)
+        finally:
+            self.save()
+            self.refresh()
+
+        return added
+
+    def __rows(self, n):
+        """
+        Return sparse long-format DataFrame of non-zero values in Name object
+        Tagged as private method
+
+        n -- Name object, loaded sparse
+        """
+        fields = [n.sparse.fields[t] for t in n.timestamps]
+        cells = np.concatenate([c for (c, v) in fields])
+        stamps = np.repeat(np.array(n.timestamps, dtype=object), [len(c) for (c, v) in fields])
+
+        # Sort spatially so row group statistics can skip regions outside a
+        # bounding box; cell id order is (Y-Index, X-Index) order
+        order = np.argsort(cells, kind='mergesort')
+        cells = cells[order]
+
+        return pd.DataFrame({
+            'timestamp': stamps[order],
+            'x_index': (cells % n.grid_shape[0] + 1).astype('int32'),
+            'y_index': (cells // n.grid_shape[0] + 1).astype('int32'),
+            'value': np.concatenate([v for (c, v) in fields])[order],
+        }, columns=['timestamp', 'x_index', 'y_index', 'value'])
+
+    def select(self, start=None, stop=None, run=None):
+        """
+        Return archived file keys matching date range and run name
+
+        start -- start date (YYYYMMDD format), inclusive
+        stop -- stop date (YYYYMMDD format), inclusive
+        run -- NAME run name
+        """
+        keys = []
+        for key in self.files:
+            entry = self.index[key]
+            if start and entry['date'] < start:
+                continue
+            if stop and entry['date'] > stop:
+                continue
+            if run and entry['run'] != run:
+                continue
+            keys.append(key)
+        return keys
+
+    def read(self, keys, bbox=None):
+        """
+        Read archived values as long-format DataFrame with
+        file, timestamp, x_index, y_index, value columns.
+        Only Parquet files for the given keys are opened.
+
+        keys -- list of archived file keys
+        bbox -- optional (lon_min, lat_min, lon_max, lat_max) tuple to restrict rows to
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        frames = []
+
+        for key in keys:
+            entry = self.index[key]
+            filename = os.path.join(self.directory, entry['path'])
+
+            pf = pq.ParquetFile(filename)
+            groups = range(pf.num_row_groups)
+
+            if bbox:
+                origin = (float(entry['header']['X grid origin']), float(entry['header']['Y grid origin']))
+                resolution = (float(entry['header']['X grid resolution']), float(entry['header']['Y grid resolution']))
+                window = gridwindow(bbox, origin, resolution)
+
+                # Skip row groups whose index statistics fall outside bounding box
+                groups = [i for i in groups if self.__overlaps(pf.metadata.row_group(i), window)]
+
+            if groups:
+                df = pa.concat_tables([pf.read_row_group(i) for i in groups]).to_pandas()
+            else:
+                df = pd.DataFrame(columns=['timestamp', 'x_index', 'y_index', 'value'])
+
+            if bbox:
+                ((x_min, x_max), (y_min, y_max)) = window
+                df = df[(df.x_index >= x_min) & (df.x_index <= x_max) & (df.y_index >= y_min) & (df.y_index <= y_max)]
+
+            df.insert(0, 'file', key)
+            frames.append(df)
+
+        if not frames:
+            return pd.DataFrame(columns=['file', 'timestamp', 'x_index', 'y_index', 'value'])
+
+        return pd.concat(frames, ignore_index=True)
+
+    def __overlaps(self, rowgroup, window):
+        """
+        Return True if Parquet row group statistics overlap grid index window
+        Tagged as private method
+
+        rowgroup -- Parquet row group metadata
+        window -- ((x_min, x_max), (y_min, y_max)) grid index ranges
+        """
+        ranges = dict(zip(['x_index', 'y_index'], window))
+
+        for i in range(rowgroup.num_columns):
+            column = rowgroup.column(i)
+            if column.path_in_schema in ranges and column.is_stats_set:
+                (lo, hi) = ranges[column.path_in_schema]
+                if column.statistics.max < lo or column.statistics.min > hi:
+                    return False
+
+        return True
+
+    def query(self, start=None, stop=None, bbox=None, run=None):
+        """
+        Read archived values for date range, bounding box and run name
+        as long-format DataFrame. See select() and read().
+        """
+        return self.read(self.select(start, stop, run), bbox=bbox)
+
+    def load(self, key, bbox=None, sparse=False):
+        """
+        Return Name object for archived file
+
+        key -- archived file key (NAME filename without extension)
+        bbox -- optional (lon_min, lat_min, lon_max, lat_max) tuple to clip data to
+        sparse -- load concentrations in sparse form
+        """
+        return ArchiveName(self, key, bbox=bbox, sparse=sparse)
+
+
+class ArchiveName(Name):
+    """
+    NAME data storage object loaded from archive instead of NAME file
+    Extends existing Name class
+    """
+
+    def __init__(self, archive, key, bbox=None, crs=None, sparse=False):
+        """
+        Initialise NAME object from archive
+
+        archive -- Archive object
+        key -- archived file key
+        bbox -- optional (lon_min, lat_min, lon_max, lat_max) tuple to clip data to
+        crs -- coordinate reference system (defaults to EPSG:4326)
+        sparse -- hold concentrations as sparse (cell, value) arrays in self.sparse
+        """
+
+        entry = archive.index[key]
+
+        self.archive = archive
+        self.key = key
+        self.filename = entry['filename']
+        self.header = entry['header']
+
+        if crs is None:
+            crs = {'init': 'EPSG:4326'}
+        self.crs = crs
+
+        self._set_header()
+        self._set_bbox(bbox)
+        self._set_fields(entry['ave'], entry['alt'])
+
+        # Archived timestamps have already been adjusted for run direction
+        self.timestamps = entry['timestamps']
+        self.times = parse_timestamps(self.timestamps)
+
+        rows = archive.read([key], bbox=bbox)
+
+        # Archived rows are already sparse, so fields are filled directly
+        if sparse:
+            self.sparse = SparseGrid(self.grid_origin, self.grid_size, self.grid_shape)
+            cells = self.sparse.cellids(rows['x_index'].values, rows['y_index'].values)
+            stamps = rows['timestamp'].values
+
+            for t in self.timestamps:
+                match = stamps == t
+                self.sparse.set(t, cells[match], rows['value'].values[match])
+
+            self.data = None
+            return
+
+        # Pivot sparse rows back to one column per timestamp
+        if len(rows) > 0:
+            wide = rows.pivot_table(index=['x_index', 'y_index'], columns='timestamp', values='value', aggfunc='sum')
+            wide = wide.reindex(columns=self.timestamps).fillna(0).reset_index()
+        else:
+            wide = pd.DataFrame(columns=['x_index', 'y_index'] + self.timestamps)
+
+        (lon_0, lat_0) = self.grid_origin
+        (delta_lon, delta_lat) = self.grid_size
+
+        df = pd.DataFrame({
+            'X-Index': wide['x_index'].values.astype(int),
+            'Y-Index': wide['y_index'].values.astype(int),
+        }, columns=['X-Index', 'Y-Index'])
+        df['Longitude'] = lon_0 + delta_lon * (df['X-Index'] - 1)
+        df['Latitude'] = lat_0 + delta_lat * (df['Y-Index'] - 1)
+
+        for t in self.timestamps:
+            df[t] = wide[t].values
+
+        self._set_data(df)
+
+
+def ingest(directory, path):
+    """
+    Archive all NAME files found in directory
+    Returns Archive object
+
+    directory -- input directory of NAME files
+    path -- archive directory path
+    """
+    a = Archive(path)
+    a.ingest(Fileset(directory).getAll())
+    return a
@@ -1,12 +1,14 @@
 import os
-import namemap
+import fingerprint
+from instrument import timed
 import util
 
 
+@timed('drawMap')
 def drawMap(n, column, projection=False, lon_bounds=(), lat_bounds=(), lon_axis=[], lat_axis=[],
             scale=(), autoscale=True, caption=None, solid=False, color1="", colormap="", station=(),
             outdir="", outfile="", logos=True, boarder_col="black", sea_col="white", land_col="#D1D1D1",
-            grid_col="black"):
+            grid_col="black", fmt="", writer=None, force=True):
     """
     Function will draw a footprint map, most values will not need to be set as defaults are okay.
     :param n: Name obj
@@ -30,11 +32,46 @@ def drawMap(n, column, projection=False, lon_bounds=(), lat_bounds=(), lon_axis=
     :param sea_col: string
     :param land_col: string
     :param grid_col: string
-    :return:
+    :param fmt: string, output image format (png, jpg or webp), default png or outfile extension
+    :param writer: imagewriter.ImageWriter, write image on background thread
+    :param force: bool, draw map even if existing plot file has the same inputs and options
+    :return: string, path of plot file written
     """
+    # Fingerprint of input files and every plot option, saved beside plot file.
+    # Forced plots are always drawn, so inputs are not hashed.
+    fp = None
+    if not force:
+        options = dict(locals())
+        for k in ['n', 'writer', 'force', 'fp']:
+            del options[k]
+        options['bounds'] = (n.lon_bounds, n.lat_bounds)
+        fp = fingerprint.fingerprint(fingerprint.inputs(n), options)
+
+    # Plotting libraries are only imported once a map is drawn
+    import namemap
+
     # Create Map object from NAME data
     m = namemap.Map(n, column=column)
 
+    # Set output image format
+    if fmt:
+        m.setFormat(fmt)
+
+    # If output directory does not exist, create it
+    if len(outdir) > 0:
+        if not os.path.exists(outdir):
+            os.makedirs(outdir)
+        m.outdir = outdir
+
+    # Skip plot if made from the same inputs and options
+    filename = m.getPath(outfile or None)
+    if fp is None:
+        fingerprint.discard(filename)
+    elif fingerprint.uptodate(filename, fp):
+        print 'Skipping up-to-date plot file: {}'.format(filename)
+        m.free()
+        return filename
+
     # Set projection if defined, otherwise cylindrical
     if projection:
         m.setProjection(projection)
@@ -106,20 +143,17 @@ def drawMap(n, column, projection=False, lon_bounds=(), lat_bounds=(), lon_axis=
         #m.addlogo(os.path.join(os.path.dirname(os.path.dirname(__file__)), "logos/NCAS_med.png"), 905)
         m.addlogo(os.path.join(os.path.dirname(os.path.dirname(__file__)), "logos/UoL.png"), 1150)
 
-    # If output directory does not exist, create it
-    if len(outdir) > 0:
-        if not os.path.exists(outdir):
-            os.makedirs(outdir)
-        m.outdir = outdir
-
-    # Save output to disk
+    # Save output to disk, recording fingerprint once written
+    done = None
+    if fp is not None:
+        done = lambda: fingerprint.record(filename, fp)
     if outfile:
-        m.saveFile(filename=outfile)
+        filename = m.saveFile(filename=outfile, writer=writer, done=done)
     else:
-        m.saveFile()
+        filename = m.saveFile(writer=writer, done=done)
 
     m.free()
-    return
+    return filename
 
 
 def draw_shape_map(n, column, shapelist, shapelines=True, shapecolors=True):
@@ -6,15 +6,15 @@
 # FILESET
 #
 # Support libraries. Build set of NAME geochemical data files from
-# input directory covering specific timespan.
+# input directory covering specific timespan. Compressed NAME files and
+# members of tar and zip files in the directory are included.
 
-import arrow
-import glob
 import os
 from collections import defaultdict
 
 from .name import Name
-from .util import shortname
+from .source import listfiles
+from .util import shortname, filedate
 
 
 class Fileset:
@@ -29,22 +29,34 @@ class Fileset:
             directory -- input directory path
             """
             self.directory = directory
+
+            if not os.path.isdir(directory):
+                  raise ValueError("Input argument is not a directory")
+
+            self.refresh()
+
+      def refresh(self):
+            """
+            Rescan directory for NAME files, and regroup them
+            """
             self.dates = {}
             self.weeks = defaultdict(list)
             self.months = defaultdict(list)
             self.years = defaultdict(list)
 
-            if not os.path.isdir(directory):
-                  raise ValueError("Input argument is not a directory")
+            self.files = listfiles(self.directory)
 
-            self.files = glob.glob(directory + '/*_group*.txt')
+            self.groupFiles()
 
-            # group input filenames by week, month, year
-            # generate dict of lists
+      def groupFiles(self):
+            """
+            Group input filenames by week, month, year
+            Generates dict of lists
+            """
             for f in self.files:
                   
                   g = shortname(f)
-                  d = arrow.get(g, 'YYYYMMDD')
+                  d = filedate(g)
                   
                   self.dates[g] = d
 
@@ -52,6 +64,16 @@ class Fileset:
                   self.months[self.getMonth(d)].append(f)
                   self.years[self.getYear(d)].append(f)
 
+      def load(self, f, bbox=None, sparse=False):
+            """
+            Return loaded Name object for file in set
+
+            f -- NAME file path
+            bbox -- optional (lon_min, lat_min, lon_max, lat_max) tuple to clip data to
+            sparse -- load concentrations in sparse form
+            """
+            return Name(f, sparse=sparse, bbox=bbox)
+
       def getAll(self):
             """
             Return all NAME files found in directory
@@ -65,12 +87,11 @@ class Fileset:
             start -- start date, YYYYMMDD format
             stop -- stop date, YYYYMMDD format
             """
-            a = arrow.get(start, 'YYYYMMDD')
-            b = arrow.get(stop, 'YYYYMMDD')
+            a = filedate(start)
+            b = filedate(stop)
             result = []
             for f in self.files:
-                  g = shortname(f)
-                  d = arrow.get(g, 'YYYYMMDD')
+                  d = self.dates[shortname(f)]
                   if (d >= a) and (d <= b):
                         result.append(f)
             return result
@@ -81,32 +102,31 @@ class Fileset:
 
             day --- date, YYYYMMDD format
             """
-            a = arrow.get(day, 'YYYYMMDD')
+            a = filedate(day)
             result = []
             for f in self.files:
-                  g = shortname(f)
-                  d = arrow.get(g, 'YYYYMMDD')
+                  d = self.dates[shortname(f)]
                   if (d == a):
                         result.append(f)
             return result
 
       def getWeek(self, a):
             """
-            Return week number for given Arrow object
-            a -- Arrow timestamp object
+            Return week number for given date
+            a -- datetime.date object
             """
             return a.isocalendar()[1]
 
       def getMonth(self, a):
             """
-            Return month number for given Arrow object
-            a -- Arrow timestamp object
+            Return month number for given date
+            a -- datetime.date object
             """
-            return a.format('M')
+            return str(a.month)
 
       def getYear(self, a):
             """
-            Return year for given Arrow object
-            a -- Arrow timestamp object
+            Return year for given date
+            a -- datetime.date object
             """
-            return a.format('YYYY')
+            return '{:04d}'.format(a.year)
@@ -0,0 +1,129 @@
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# FINGERPRINT
+#
+# Support libraries. Fingerprints of plot inputs and options, stored in
+# a sidecar file beside each plot output, so reruns can skip plots whose
+# input files and options have not changed.
+#
+
+import hashlib
+import json
+import os
+import tempfile
+
+from .source import openfile, splitmember, stamp
+
+# Sidecar file suffix, appended to plot output filename
+SUFFIX = '.fingerprint'
+
+# File content hashes by (path, size, modification time)
+HASHES = {}
+
+
+def filehash(filename):
+    """
+    Return hex digest of file content, reusing earlier hash of unchanged file.
+    Tar and zip members are hashed by their own content.
+    filename -- path to file
+    """
+    (mtime, size) = stamp(filename)
+    key = (os.path.abspath(filename), size, mtime)
+
+    if key not in HASHES:
+        h = hashlib.sha1()
+        with (openfile(filename) if splitmember(filename)[1] else open(filename, 'rb')) as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        HASHES[key] = h.hexdigest()
+
+    return HASHES[key]
+
+
+def inputs(n):
+    """
+    Return list of input NAME files for Name or Sum object. Files read
+    from a NAME archive are given as their archive index entries.
+    n -- Name or Sum object
+    """
+    from .archive import Archive
+
+    archive = getattr(n, 'archive', None)
+    if isinstance(getattr(n, 'fs', None), Archive):
+        archive = n.fs
+
+    if archive is None:
+        return list(getattr(n, 'files', [])) or [n.filename]
+
+    keys = list(getattr(n, 'files', [])) or [n.key]
+    return [archive.index[k] for k in keys]
+
+
+def content(f):
+    """
+    Return (name, content key) of input file. Archived NAME files are
+    keyed by the size and modification time of the original file, as
+    recorded when archived, other files by content hash.
+    f -- input file path, or archive index entry dict
+    """
+    if isinstance(f, dict):
+        return (f['filename'], '{}:{}'.format(f['size'], f['mtime']))
+
+    return (os.path.basename(f), filehash(f))
+
+
+def fingerprint(files, options):
+    """
+    Return fingerprint of input files and plot options. Files are named
+    by basename and content, so copies of the same files match.
+
+    files -- list of input file paths or archive index entries, see inputs()
+    options -- dict of plot options
+    """
+    keys = [content(f) for f in files]
+
+    text = json.dumps([keys, sorted(options.items())], default=repr)
+
+    return hashlib.sha1(text).hexdigest()
+
+
+def uptodate(output, fp):
+    """
+    Return True if output file exists and was made with given fingerprint
+    output -- path to plot output file
+    fp -- fingerprint string
+    """
+    if not os.path.isfile(output) or not os.path.isfile(output + SUFFIX):
+        return False
+
+    with open(output + SUFFIX, 'r') as f:
+        return f.read().strip() == fp
+
+
+def record(output, fp):
+    """
+    Write fingerprint sidecar for output file. Written to a temporary file
+    and renamed, so an interrupted run never leaves a partial fingerprint.
+
+    output -- path to plot output file
+    fp -- fingerprint string
+    """
+    (fd, tmp) = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output)), suffix='.tmp')
+
+    with os.fdopen(fd, 'w') as f:
+        f.write(fp + '\n')
+
+    os.rename(tmp, output + SUFFIX)
+
+
+def discard(output):
+    """
+    Remove fingerprint sidecar for output file, if any, so an output
+    redrawn without a fingerprint is never taken as up to date
+    output -- path to plot output file
+    """
+    if os.path.isfile(output + SUFFIX):
+        os.remove(output + SUFFIX)
@@ -9,10 +9,12 @@
 # grid cells.
 #
 
+import math
 import os
 
-from shapely.ops import transform, cascaded_union
-from shapely.geometry import Point, Polygon
+import numpy as np
+
+from .instrument import timed
 
 # --------------------------------------
 def coverfactor(geom, square):
@@ -37,6 +39,58 @@ def coverfactor(geom, square):
     return cf
 
 
+# --------------------------------------
+@timed('geom.covergrid')
+def covergrid(geom, origin, resolution, shape):
+    """
+    Calculate covering factors of ESRI shape over every square of a
+    regular grid. Only squares inside the shape bounding box are tested;
+    squares wholly inside or outside the shape are found by a prepared
+    geometry test, exact intersections are calculated for boundary
+    squares only.
+
+    geom -- Shapely geometry
+    origin -- 2-tuple of grid origin (centre of first cell) (lon, lat)
+    resolution -- 2-tuple of grid spacing (dlon, dlat)
+    shape -- 2-tuple of grid size (number of lon cells, number of lat cells)
+
+    returns array of covering factors, indexed [Y-Index - 1, X-Index - 1]
+    """
+    from shapely.geometry import Polygon
+    from shapely.prepared import prep
+
+    (lon_0, lat_0) = origin
+    (lon_size, lat_size) = shape
+
+    cover = np.zeros((lat_size, lon_size))
+
+    if geom.is_empty:
+        return cover
+
+    # Grid squares overlapping shape bounding box, clipped to grid
+    ((x_min, x_max), (y_min, y_max)) = gridwindow(geom.bounds, origin, resolution)
+    x_min = max(x_min, 1)
+    y_min = max(y_min, 1)
+    x_max = min(x_max, lon_size)
+    y_max = min(y_max, lat_size)
+
+    pg = prep(geom)
+
+    for y in range(y_min, y_max + 1):
+        lat = lat_0 + (y - 1) * resolution[1]
+
+        for x in range(x_min, x_max + 1):
+            lon = lon_0 + (x - 1) * resolution[0]
+            square = Polygon(gridsquare((lon, lat) + tuple(resolution)))
+
+            if pg.contains(square):
+                cover[y - 1, x - 1] = 1.0
+            elif pg.intersects(square):
+                cover[y - 1, x - 1] = coverfactor(geom, square)
+
+    return cover
+
+
 # --------------------------------------
 def gridsquare(coords):
     """
@@ -49,3 +103,40 @@ def gridsquare(coords):
     (lon, lat, dlon, dlat) = coords
     gs = [(lon - dlon/2., lat - dlat/2.), (lon - dlon/2., lat + dlat/2.), (lon + dlon/2., lat + dlat/2.), (lon + dlon/2., lat - dlat/2.)]
     return gs
+
+
+# --------------------------------------
+def speedups():
+    """
+    Enable Shapely native C++ acceleration, if available.
+    Shapely is imported here on first use, not at module load.
+    """
+    from shapely import speedups
+
+    if speedups.available:
+        speedups.enable()
+
+
+# --------------------------------------
+def gridwindow(bbox, origin, resolution):
+    """
+    Find grid index ranges of cells overlapping bounding box.
+    Indices are 1-based, matching NAME X-Index/Y-Index columns.
+
+    bbox -- 4-tuple of (lon_min, lat_min, lon_max, lat_max)
+    origin -- 2-tuple of grid origin (centre of first cell) (lon, lat)
+    resolution -- 2-tuple of grid spacing (dlon, dlat)
+
+    returns ((x_min, x_max), (y_min, y_max)) inclusive index ranges
+    """
+
+    (lon_min, lat_min, lon_max, lat_max) = bbox
+    (lon_0, lat_0) = origin
+    (dlon, dlat) = resolution
+
+    x_min = int(math.ceil((lon_min - lon_0) / dlon - 0.5)) + 1
+    x_max = int(math.floor((lon_max - lon_0) / dlon + 0.5)) + 1
+    y_min = int(math.ceil((lat_min - lat_0) / dlat - 0.5)) + 1
+    y_max = int(math.floor((lat_max - lat_0) / dlat + 0.5)) + 1
+
+    return ((x_min, x_max), (y_min, y_max))
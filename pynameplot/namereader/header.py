@@ -11,23 +11,68 @@
 # into named data structure.
 #
 
+from .source import openfile
+
+
+def parseheader(lines):
+    """
+    Parse NAME header lines into dict.
+    lines -- list of NAME file lines, first 18 are read
+    """
+    header = {}
+
+    for h in lines[0:18]:
+
+        if ":" in h:
+            (key, val) = h.split(":", 1)
+            key = key.strip()
+            val = val.strip()
+
+            header[key] = val
+
+    return header
+
+
+def readhead(f, rows=36):
+    """
+    Read and return list of lines preceding first data row from open NAME
+    file, leaving file positioned at first data row.
+    Blank lines are skipped when counting header rows, as in pandas.
+    f -- open NAME file object
+    rows -- number of non-blank header lines (19 header, 13 field, 4 label)
+    """
+    lines = []
+    count = 0
+
+    # readline, not iteration, so file position stays at end of header
+    while count < rows:
+        line = f.readline()
+        if not line:
+            raise ValueError("No data rows found in NAME file: {}".format(getattr(f, 'name', '')))
+
+        lines.append(line)
+        if line.strip():
+            count += 1
+
+    return lines
+
+
 def loadheader(filename):
     """
     Load NAME file and parse header lines into dict.
+    Compressed and tar or zip member files are decompressed up to the header only.
     filename -- input NAME file
     """
-    header = {}
-    
-    with open(filename, 'r') as f:
-        
-        for line in range(1, 19):
-            h = f.readline()
-            
-            if ":" in h:
-                (key, val) = h.split(":", 1)
-                key = key.strip()
-                val = val.strip()
-            
-                header[key] = val
+    with openfile(filename) as f:
+        return parseheader([f.readline() for line in range(1, 19)])
 
-    return header
+
+def datastart(filename, rows=36):
+    """
+    Return number of lines preceding first data row in NAME file.
+    Blank lines are skipped when counting header rows, as in pandas.
+    filename -- input NAME file
+    rows -- number of non-blank header lines (19 header, 13 field, 4 label)
+    """
+    with openfile(filename) as f:
+        return len(readhead(f, rows))
@@ -0,0 +1,134 @@
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# IMAGEWRITER
+#
+# Support libraries. Encode and write rendered map images on background
+# threads, so batch plotting can draw the next frame while the last one
+# is compressed and written to disk. The queue of pending images is
+# bounded, so a slow disk holds back drawing rather than filling memory.
+#
+
+import Queue
+import os
+import threading
+
+from .instrument import timed
+
+# Image formats by file extension, with PIL format name
+FORMATS = {'png': 'PNG', 'jpg': 'JPEG', 'jpeg': 'JPEG', 'webp': 'WEBP'}
+
+
+def imageformat(filename):
+    """
+    Return PIL format name for image filename
+    filename -- output file name including type extension
+    """
+    ext = os.path.splitext(filename)[1].lstrip('.').lower()
+
+    if ext not in FORMATS:
+        raise ValueError('Unsupported image format: {}'.format(filename))
+
+    return FORMATS[ext]
+
+
+class ImageWriter(object):
+    """
+    Pool of background threads writing RGBA image arrays to disk
+    """
+
+    def __init__(self, threads=2, queuesize=4, compress_level=6, quality=90):
+        """
+        Initialise ImageWriter object, and start writer threads
+
+        threads -- number of writer threads
+        queuesize -- maximum number of images waiting to be written
+        compress_level -- PNG zlib compression level, 0 (none) to 9 (smallest)
+        quality -- JPEG and WebP quality, 1 to 100
+        """
+
+        self.compress_level = compress_level
+        self.quality = quality
+
+        self.queue = Queue.Queue(queuesize)
+        self.errors = []
+
+        self.threads = []
+        for i in range(threads):
+            t = threading.Thread(target=self.__run)
+            t.daemon = True
+            t.start()
+            self.threads.append(t)
+
+    def submit(self, rgba, filename, dpi=300, done=None):
+        """
+        Queue image for writing, blocking while the queue is full
+        rgba -- (height, width, 4) uint8 array of image pixels
+        filename -- output file path including type extension
+        dpi -- image resolution recorded in file
+        done -- optional function called on writer thread once image is written
+        """
+        imageformat(filename)
+
+        if self.errors:
+            raise IOError(self.errors[0])
+
+        self.queue.put((rgba, filename, dpi, done))
+
+    @timed('ImageWriter.write')
+    def write(self, rgba, filename, dpi=300):
+        """
+        Encode and write image in calling thread
+        rgba -- (height, width, 4) uint8 array of image pixels
+        filename -- output file path including type extension
+        dpi -- image resolution recorded in file
+        """
+        from PIL import Image
+
+        fmt = imageformat(filename)
+        im = Image.fromarray(rgba, 'RGBA')
+
+        if fmt == 'PNG':
+            im.save(filename, fmt, compress_level=self.compress_level, dpi=(dpi, dpi))
+        elif fmt == 'JPEG':
+            # JPEG has no alpha channel
+            im.convert('RGB').save(filename, fmt, quality=self.quality, dpi=(dpi, dpi))
+        else:
+            im.save(filename, fmt, quality=self.quality)
+
+    def close(self):
+        """
+        Wait for all queued images to be written, and stop writer threads.
+        Raises IOError if any image could not be written.
+        """
+        for t in self.threads:
+            self.queue.put(None)
+
+        for t in self.threads:
+            t.join()
+
+        self.threads = []
+
+        if self.errors:
+            raise IOError('; '.join(self.errors))
+
+    def __run(self):
+        """
+        Writer thread loop, runs until sent None
+        Tagged as private method
+        """
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+
+            (rgba, filename, dpi, done) = job
+
+            try:
+                self.write(rgba, filename, dpi)
+                if done:
+                    done()
+            except Exception as e:
+                self.errors.append('Cannot write {}: {}'.format(filename, e))
@@ -0,0 +1,146 @@
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# INSTRUMENT
+#
+# Support libraries. Named timing spans around processing stages
+# (parsing, geometry, summing, drawing, saving), recording wall time,
+# CPU time and peak resident memory. Spans are aggregated by name over
+# the run, and can be written as a JSON or CSV report.
+#
+# Spans are disabled by default; a disabled span costs one flag test.
+#
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import csv
+import functools
+import json
+import os
+import resource
+import threading
+import time
+
+ENABLED = False
+
+# Aggregated spans by name: [count, wall seconds, cpu seconds, max wall seconds, peak RSS kB]
+SPANS = OrderedDict()
+
+# Report columns
+FIELDS = ['span', 'count', 'wall_s', 'mean_wall_s', 'max_wall_s', 'cpu_s', 'peak_rss_mb']
+
+_lock = threading.Lock()
+
+
+def enable(flag=True):
+    """
+    Switch span recording on or off, clearing earlier spans when switched on
+    flag -- True to record spans
+    """
+    global ENABLED
+
+    if flag:
+        SPANS.clear()
+
+    ENABLED = flag
+
+
+def _record(name, wall, cpu):
+    """
+    Add span timing to aggregate for span name
+    """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    with _lock:
+        s = SPANS.setdefault(name, [0, 0.0, 0.0, 0.0, 0])
+        s[0] += 1
+        s[1] += wall
+        s[2] += cpu
+        s[3] = max(s[3], wall)
+        s[4] = max(s[4], rss)
+
+
+def _cpu():
+    """
+    Return process user plus system CPU time in seconds
+    """
+    t = os.times()
+    return t[0] + t[1]
+
+
+@contextmanager
+def span(name):
+    """
+    Context manager timing enclosed block as named span
+    name -- span name
+    """
+    if not ENABLED:
+        yield
+        return
+
+    wall = time.time()
+    cpu = _cpu()
+
+    try:
+        yield
+    finally:
+        _record(name, time.time() - wall, _cpu() - cpu)
+
+
+def timed(name):
+    """
+    Decorator timing each call of function as named span
+    name -- span name
+    """
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return f(*args, **kwargs)
+
+            wall = time.time()
+            cpu = _cpu()
+
+            try:
+                return f(*args, **kwargs)
+            finally:
+                _record(name, time.time() - wall, _cpu() - cpu)
+
+        return wrapper
+
+    return decorator
+
+
+def report():
+    """
+    Return list of report rows, one dict per span name
+    """
+    rows = []
+
+    with _lock:
+        for (name, (count, wall, cpu, maxwall, rss)) in SPANS.items():
+            rows.append(OrderedDict(zip(FIELDS, [name, count, round(wall, 6), round(wall / count, 6),
+                                                 round(maxwall, 6), round(cpu, 6), round(rss / 1024.0, 1)])))
+
+    return rows
+
+
+def dump(filename):
+    """
+    Write span report to file, CSV if filename ends .csv, otherwise JSON
+    filename -- output report file
+    """
+    rows = report()
+
+    if filename.lower().endswith('.csv'):
+        with open(filename, 'wb') as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(filename, 'w') as f:
+            json.dump(rows, f, indent=1)
+
+    print 'Written profile report: {}'.format(filename)
@@ -0,0 +1,137 @@
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# INVENTORY
+#
+# Support libraries. Inventory of many NAME files read from their header,
+# field and label rows only: run name, grid, release window, direction and
+# timestamps. No data rows are read, and files are scanned on a pool of
+# threads, so large archives can be checked for grid compatibility and
+# sums planned before any data is loaded.
+#
+
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+import pandas as pd
+
+from .header import readhead
+from .name import Name
+from .source import openfile
+from .util import shortname
+
+# Inventory table columns, one row per NAME file
+COLUMNS = ['file', 'name', 'date', 'run', 'direction', 'release_start', 'release_end', 'averaging',
+           'altitude', 'lon_origin', 'lat_origin', 'lon_res', 'lat_res', 'lon_size', 'lat_size',
+           'count', 'first', 'last', 'timestamps', 'error']
+
+# Columns defining NAME grid; files sum together only if these all match
+GRID = ['lon_origin', 'lat_origin', 'lon_res', 'lat_res', 'lon_size', 'lat_size']
+
+
+class NameHeader(Name):
+    """
+    NAME file header, field and timestamp parameters, without data rows
+    Extends existing Name class
+    """
+
+    def __init__(self, filename):
+        """
+        Initialise NameHeader object. Only lines preceding the data rows
+        are read, or decompressed.
+
+        filename -- path to NAME file
+        """
+
+        self.filename = filename
+        self.timestamps = []
+        self.times = np.array([], dtype='datetime64[m]')
+        self.data = None
+
+        with openfile(filename) as f:
+            self._set_head(readhead(f))
+
+
+def scan(filename):
+    """
+    Return inventory row for NAME file, as dict of COLUMNS values.
+    Files which cannot be read have only file, name and error set.
+
+    filename -- path to NAME file
+    """
+    row = dict.fromkeys(COLUMNS)
+    row['file'] = filename
+    row['name'] = shortname(filename)
+
+    try:
+        h = NameHeader(filename)
+    except Exception as e:
+        row['error'] = '{}: {}'.format(type(e).__name__, e)
+        return row
+
+    row.update({
+        'date': '{}-{}-{}'.format(h.year, h.month, h.day),
+        'run': h.runname,
+        'direction': h.direction,
+        'release_start': h.release,
+        'release_end': h.endrelease,
+        'averaging': h.averaging,
+        'altitude': h.altitude,
+        'lon_origin': h.grid_origin[0],
+        'lat_origin': h.grid_origin[1],
+        'lon_res': h.grid_size[0],
+        'lat_res': h.grid_size[1],
+        'lon_size': h.grid_shape[0],
+        'lat_size': h.grid_shape[1],
+        'count': len(h.timestamps),
+        'first': h.timestamps[0] if h.timestamps else None,
+        'last': h.timestamps[-1] if h.timestamps else None,
+        'timestamps': ';'.join(h.timestamps),
+    })
+
+    return row
+
+
+def inventory(files, threads=8):
+    """
+    Return inventory DataFrame of NAME files, one row per file in given
+    order, with COLUMNS columns. Timestamps are joined with ';'.
+
+    files -- list of NAME file paths
+    threads -- number of files read at once, 1 to read in calling thread
+    """
+    if threads > 1 and len(files) > 1:
+        pool = ThreadPool(threads)
+        try:
+            rows = pool.map(scan, files, chunksize=16)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        rows = [scan(f) for f in files]
+
+    table = pd.DataFrame(rows, columns=COLUMNS)
+
+    # Counts stay integer unless missing for unreadable files
+    for c in ['lon_size', 'lat_size', 'count']:
+        if table[c].notnull().all():
+            table[c] = table[c].astype(int)
+
+    return table
+
+
+def grids(table):
+    """
+    Return DataFrame of distinct NAME grids in inventory, with the number
+    of files and runs on each grid
+
+    table -- inventory DataFrame
+    """
+    ok = table[table['error'].isnull()]
+
+    result = ok.groupby(GRID).agg(OrderedDict([('file', 'count'), ('run', 'nunique')]))
+
+    return result.rename(columns={'file': 'files', 'run': 'runs'}).reset_index()
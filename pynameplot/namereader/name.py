@@ -11,21 +11,22 @@
 
 import numpy as np
 import pandas as pd
-import geopandas as gpd
-import arrow
-
-from shapely import speedups
-from shapely.geometry import Point, Polygon
 
+from StringIO import StringIO
+import csv
 import os
 import re
 
 # local NAME libraries
-from .header import loadheader
-from .geom import coverfactor, gridsquare
-from .shape import Shape
-from util import shortname
+from .header import parseheader, readhead
+from .source import exists, openfile
+from .geom import covergrid, gridsquare, gridwindow, speedups
+from .sparse import SparseGrid, cellids
+from .instrument import timed
+from util import shortname, filedate, parse_timestamps, format_timestamps
 
+# Covering factor grids, by (shapefile, modification time, grid header)
+COVERS = {}
 
 class Name:
     """
@@ -33,32 +34,104 @@ class Name:
     """
 
     filename = ""
+    sparse = None
 
-    def __init__(self, filename, crs = None):
+    @timed('Name.read')
+    def __init__(self, filename, crs = None, sparse = False, bbox = None, columns = None):
         """
         Initialise NAME object
 
         filename -- path to NAME file
         crs -- coordinate reference system (defaults to EPSG:4326)
+        sparse -- hold concentrations as sparse (cell, value) arrays in self.sparse
+                  instead of GeoDataFrame columns in self.data
+        bbox -- (lon_min, lat_min, lon_max, lat_max) tuple, only grid cells
+                overlapping this box are read from file
+        columns -- list of timestamp column names, only these columns are
+                   read from file (default is all timestamps)
         """
 
         self.filename = filename
         self.timestamps = []
+        self.times = np.array([], dtype='datetime64[m]')
         self.header = {}
 
         if crs is None:
             crs = {'init': 'EPSG:4326'}
         self.crs = crs
 
-        if not os.path.isfile(self.filename):
+        if not exists(self.filename):
             raise Exception("Cannot find name file: {}".format(self.filename))
 
-        # Enable Shapely native C++ acceleration
-        if speedups.available:
-            speedups.enable()
+        # Header and data rows are read in one pass, decompressing as read
+        with openfile(self.filename) as f:
+            self._read(f, bbox, columns, sparse)
+
+    def _read(self, f, bbox, columns, sparse):
+        """
+        Read NAME header and data rows from open file
+
+        f -- open NAME file object, positioned at start of file
+        bbox -- (lon_min, lat_min, lon_max, lat_max) tuple, or None for whole grid
+        columns -- list of timestamp column names, or None for all timestamps
+        sparse -- hold concentrations as sparse (cell, value) arrays
+        """
+
+        # read header, field and label rows preceding CSV data portion of NAME file
+        self._set_head(readhead(f), bbox)
+
+        # Select timestamp columns to read
+        coordcols = ['X-Index', 'Y-Index', 'Longitude', 'Latitude']
+        usecols = range(len(coordcols)) + self._select_columns(columns)
+        names = coordcols + self.timestamps
+
+        # read CSV data rows into pandas DataFrame, file is positioned at first data row
+        if self.bbox:
+            # Filter rows by grid index as file is read, before any values are parsed
+            lines = self._window_lines(f, gridwindow(self.bbox, self.grid_origin, self.grid_size))
+            df = pd.read_csv(StringIO(''.join(lines)), header=None, names=names,
+                             usecols=usecols, skipinitialspace=True)
+        else:
+            df = pd.read_csv(f, header=None, names=names,
+                             usecols=usecols, skipinitialspace=True)
+    
+        # Convert strings to floats where possible
+        df = df.apply(lambda x: pd.to_numeric(x, errors='ignore'))
 
-        # read and parse NAME file header
-        self.header = loadheader(self.filename)
+        if sparse:
+            self._set_sparse(df)
+        else:
+            self._set_data(df)
+
+    def _set_head(self, head, bbox=None):
+        """
+        Set header, field and timestamp parameters from NAME header lines
+
+        head -- list of lines preceding data rows, from header.readhead
+        bbox -- (lon_min, lat_min, lon_max, lat_max) tuple, or None for whole grid
+        """
+
+        # parse NAME file header
+        self.header = parseheader(head)
+        self._set_header()
+        self._set_bbox(bbox)
+
+        # Header lines as CSV rows, blank lines skipped as in pandas
+        rows = list(csv.reader([line for line in head if line.strip()]))
+
+        # Field header rows follow the column name row at line 20
+        fields = rows[20:34]
+
+        # Store averaging time and altitude range from first field
+        self._set_fields(fields[6][4], fields[13][4])
+
+        # Get observation timestamp strings from field header T row
+        self._set_timestamps([x.strip() for x in fields[12][4:] if x.strip()])
+
+    def _set_header(self):
+        """
+        Set grid and run parameters from parsed NAME file header
+        """
 
         # get grid size from header
         delta_lon = float(self.header['X grid resolution'])
@@ -80,6 +153,43 @@ class Name:
         self.lat_bounds=(lat_0, lat_1)
 
         self.grid_size = (delta_lon, delta_lat)
+        self.grid_origin = (lon_0, lat_0)
+        self.grid_shape = (lon_size, lat_size)
+
+        self._set_gridlines(mlon, mlat)
+
+        # Store header parameters as member variables
+        self.runname = self.header['Run name']
+        self.release = self.header['Start of release']
+        self.endrelease = self.header['End of release']
+
+        # Store run duration time
+        dur = self.header['Run duration']
+        self.duration = dur.replace('day ','days ').replace(' 0hr','').replace(' 0min','')
+
+        # Store date information from input filename
+        d = filedate(self.filename)
+        self.year = '{:04d}'.format(d.year)
+        self.month = '{:02d}'.format(d.month)
+        self.day = '{:02d}'.format(d.day)
+
+        # Determine whether simulation run is forwards or backwards in time
+        (release, endrelease) = parse_timestamps([self.release, self.endrelease])
+        if endrelease > release:
+            self.direction = 'Forwards'
+        else:
+            self.direction = 'Backwards'
+
+    def _set_gridlines(self, mlon, mlat):
+        """
+        Set lat/lon gridline positions across map bounds
+
+        mlon -- longitude extent of map bounds
+        mlat -- latitude extent of map bounds
+        """
+
+        (lon_0, lon_1) = self.lon_bounds
+        (lat_0, lat_1) = self.lat_bounds
 
         # Set lat/lon gridline spacing according to grid size
         if mlon>60.0:
@@ -107,34 +217,85 @@ class Name:
         # LONGFIX: Normalise lon gridlines in range (-180, 180)
         # self.lon_grid = [np.mod((lg+180.0), 360.0) - 180.0 for lg in self.lon_grid]
 
-        # Store header parameters as member variables
-        self.runname = self.header['Run name']
-        self.release = self.header['Start of release']
-        self.endrelease = self.header['End of release']
+    def _set_bbox(self, bbox):
+        """
+        Set bounding box to read, and restrict map bounds and gridlines to it
+
+        bbox -- (lon_min, lat_min, lon_max, lat_max) tuple, or None for whole grid
+        """
+
+        self.bbox = bbox
+
+        if bbox:
+            (lon_min, lat_min, lon_max, lat_max) = bbox
+            self.lon_bounds = (max(self.lon_bounds[0], lon_min), min(self.lon_bounds[1], lon_max))
+            self.lat_bounds = (max(self.lat_bounds[0], lat_min), min(self.lat_bounds[1], lat_max))
+            self._set_gridlines(self.lon_bounds[1] - self.lon_bounds[0], self.lat_bounds[1] - self.lat_bounds[0])
+
+    def _select_columns(self, columns):
+        """
+        Restrict timestamps to selected columns, and return their
+        field positions in data rows
+
+        columns -- list of timestamp column names, or None for all timestamps
+        """
 
-        # Get field header values
-        fields = pd.read_csv(self.filename, header=19, nrows=14)
-        fields.drop(fields.columns[[0,1,2,3]], axis=1, inplace=True)
+        positions = range(4, 4 + len(self.timestamps))
+
+        if not columns:
+            return positions
+
+        stamps = [t.strip() for t in self.timestamps]
+        selected = []
+
+        for column in columns:
+            if column.strip() not in stamps:
+                raise ValueError("Timestamp {} not found in NAME file: {}".format(column, self.filename))
+            selected.append(stamps.index(column.strip()))
+
+        selected = sorted(set(selected))
+        self.timestamps = [self.timestamps[i] for i in selected]
+        self.times = self.times[selected]
+
+        return [positions[i] for i in selected]
+
+    def _window_lines(self, f, window):
+        """
+        Generate data lines from NAME file within grid index window.
+        Only the X-Index and Y-Index fields of each line are parsed.
+
+        f -- open NAME file object, positioned at first data row
+        window -- ((x_min, x_max), (y_min, y_max)) grid index ranges
+        """
+
+        ((x_min, x_max), (y_min, y_max)) = window
+
+        for line in f:
+            fields = line.split(',', 2)
+            if len(fields) < 3:
+                continue
+
+            x = int(fields[0])
+            y = int(fields[1])
+            if x_min <= x <= x_max and y_min <= y <= y_max:
+                yield line
+
+    def _set_fields(self, ave, alt):
+        """
+        Set averaging and altitude parameters from NAME field header values
+
+        ave -- time averaging field value, e.g. '5day 0hr 0min 3hr 0min integral'
+        alt -- altitude field value, e.g. 'Z = 50.0 m agl'
+        """
 
         # Store averaging time 
-        field1 = fields[fields.columns[[0]]]
-        self.ave = field1[6::1].values[0][0].strip()
+        self.ave = ave.strip()
         self.averaging = self.ave.replace(' integral','').replace('day ','days ').replace(' 0hr','').replace(' 0min','')
         self.timerun = self.averaging.split(" ")[0]
         self.releasetime = self.averaging.split(" ")[1]
 
-        # Store run duration time
-        dur = self.header['Run duration']
-        self.duration = dur.replace('day ','days ').replace(' 0hr','').replace(' 0min','')
-
-        # Store date information from input filename
-        a = arrow.get(shortname(self.filename), 'YYYYMMDD')
-        self.year = a.format('YYYY')
-        self.month = a.format('MM').zfill(2)
-        self.day = a.format('DD').zfill(2)
-
         # Get altitude range information from column header            
-        self.alt = field1[13::1].values[0][0].strip()
+        self.alt = alt.strip()
         if 'Z = 50.0' in self.alt:
             self.altitude = '(0-100m)'
         elif 'Z = 500.0' in self.alt:
@@ -150,48 +311,31 @@ class Name:
         else:
             self.altitude = ''
 
-        # read CSV portion of NAME file into pandas DataFrame
-        df = pd.read_csv(self.filename, header=31)
+    def _set_timestamps(self, stamps):
+        """
+        Set observation timestamps from NAME field header
 
-        # Clear bad (empty) data columns from DataFrame
-        df = df.dropna(axis=1, how='all')
-    
-        # Get column header timestamp names from first row
-        c = map(list, df[0:1].values)
-        collist = c[0]
-    
-        # Set leader column names
-        coordcols = ['X-Index', 'Y-Index', 'Longitude', 'Latitude']
-        collist[1:4] = coordcols
-        collist = [x.strip() for x in collist]
-    
-        # Get observation timestamp strings
-        self.timestamps = collist[5::]
+        stamps -- list of timestamp strings, DD/MM/YYYY HH:mm format
+        """
 
-        # Determine whether simulation run is forwards or backwards in time
-        if arrow.get(self.endrelease, 'DD/MM/YYYY HH:mm') > arrow.get(self.release, 'DD/MM/YYYY HH:mm'):
-            self.direction = 'Forwards'
-        else:
-            self.direction = 'Backwards'
+        self.timestamps = stamps
+        self.times = parse_timestamps(stamps)
 
         # If run is backwards, modify timestamps to match self.ENDrelease header (per MP request)
-        if self.direction == 'Backwards':
-            col0_time = arrow.get(self.timestamps[0], 'DD/MM/YYYY HH:mm')
-            start_time = arrow.get(self.endrelease, 'DD/MM/YYYY HH:mm')
-            delta_time = start_time - col0_time
-            
-            newstamps = map(lambda t: (arrow.get(t, 'DD/MM/YYYY HH:mm')+delta_time).format('DD/MM/YYYY HH:mm UTC'), self.timestamps)
-            self.timestamps = newstamps
-            collist = [''] + coordcols + newstamps
-
-        # Apply labels to DataFrame
-        df.columns = collist[1::]
-    
-        # Drop leading rows
-        df = df.drop([0, 1, 2, 3])
-    
-        # Convert strings to floats where possible
-        df = df.apply(lambda x: pd.to_numeric(x, errors='ignore'))
+        if self.direction == 'Backwards' and len(self.times):
+            delta_time = parse_timestamps([self.endrelease])[0] - self.times[0]
+
+            self.times = self.times + delta_time
+            self.timestamps = format_timestamps(self.times)
+
+    @timed('Name.geometry')
+    def _set_data(self, df):
+        """
+        Build GeoDataFrame of grid squares from parsed data, indexed by
+        integer flat cell id (see sparse.cellids)
+
+        df -- DataFrame with X-Index, Y-Index, Longitude, Latitude and timestamp columns
+        """
     
         # Set mapping coordinate for GeoDataFrame
         # crs = {'init': 'epsg:4326'}
@@ -199,14 +343,39 @@ class Name:
         # LONGFIX: Normalise longitude in range (-180, +180). 
         # df['Longitude'] = np.mod((df['Longitude']+180.0), 360) - 180.0
     
+        # Geometry libraries are only imported when grid squares are built
+        import geopandas as gpd
+        from shapely.geometry import Polygon
+
+        # Enable Shapely native C++ acceleration
+        speedups()
+
         # Generate Shapely Polygons for grid squares
         df['grid'] = [Polygon(gridsquare(xy + self.grid_size)) for xy in zip(df.Longitude, df.Latitude)]
     
         # Create GeoDataFrame with point and grid geometry columns
         self.data = gpd.GeoDataFrame(df, crs=self.crs, geometry=df['grid'])
 
-        # Set lat/lon indices on data
-        self.data.set_index(["Longitude", "Latitude"], inplace=True)
+        # Index rows by grid cell, so files and zone grids align by integer id
+        self.data['cell'] = cellids(df['X-Index'].values, df['Y-Index'].values, self.grid_shape)
+        self.data.set_index('cell', inplace=True)
+
+    @timed('Name.sparse')
+    def _set_sparse(self, df):
+        """
+        Build sparse concentration fields from parsed data.
+        No grid square geometry is generated, self.data is left empty.
+
+        df -- DataFrame with X-Index, Y-Index and timestamp columns
+        """
+
+        self.sparse = SparseGrid(self.grid_origin, self.grid_size, self.grid_shape)
+
+        cells = self.sparse.cellids(df['X-Index'].values, df['Y-Index'].values)
+        for t in self.timestamps:
+            self.sparse.set(t, cells, df[t].values)
+
+        self.data = None
 
     def add_range(self, ts):
         """
@@ -215,6 +384,11 @@ class Name:
         ts -- list of timestamp labels
         """
 
+        if self.sparse is not None:
+            (cells, values) = self.sparse.sum(ts)
+            self.sparse.set('subtotal', cells, values)
+            return
+
         self.data['subtotal'] = self.data[ts].sum(axis=1)
 
     def add_all(self):
@@ -222,7 +396,7 @@ class Name:
         Sum all timestamp columns found in file
         """
 
-        self.data['subtotal'] = self.data[self.timestamps].sum(axis=1)
+        self.add_range(self.timestamps)
 
     def get_minmax(self):
         """
@@ -243,23 +417,65 @@ class Name:
 
     def get_minmax(self, column):
         """
-        Get minimum and maximum non-zero concentration values for given column
+        Get minimum and maximum non-zero concentration values for given column,
+        or (None, None) if column has no positive values
         """
         
         print 'Checking column:', column
+
+        if self.sparse is not None:
+            (self.min_conc, self.max_conc) = self.sparse.minmax(column)
+            return (self.min_conc, self.max_conc)
         
-        # Flatten list of concentration values
-        cl = self.data[column].values.tolist()
+        values = self.data[column].values
+        positive = values[values > 0.0]
+
+        if not len(positive):
+            (self.min_conc, self.max_conc) = (None, None)
+            return (self.min_conc, self.max_conc)
 
         # Get minimum (non-zero) concentration value in column
-        self.min_conc = min([x for x in cl if x > 0.0])
+        self.min_conc = positive.min()
 
         # Get maximum concentration value in column
-        self.max_conc = self.data[column].values.max()
+        self.max_conc = values.max()
         
         return (self.min_conc, self.max_conc)
 
 
+    def get_grid(self, column):
+        """
+        Return values of given column as 2D array over the full NAME grid.
+        Rows run south to north, columns west to east. Cells missing from
+        the data are set to zero.
+
+        column -- name of data column
+        """
+
+        if self.sparse is not None:
+            return self.sparse.dense(column)
+
+        (lon_size, lat_size) = self.grid_shape
+
+        grid = np.zeros(lon_size * lat_size)
+        grid[self.data.index.values] = self.data[column].values
+
+        return grid.reshape((lat_size, lon_size))
+
+    def get_axes(self):
+        """
+        Return (longitude, latitude) arrays of grid cell centres, matching get_grid
+        """
+
+        (lon_0, lat_0) = self.grid_origin
+        (delta_lon, delta_lat) = self.grid_size
+        (lon_size, lat_size) = self.grid_shape
+
+        lons = lon_0 + delta_lon * np.arange(lon_size)
+        lats = lat_0 + delta_lat * np.arange(lat_size)
+
+        return (lons, lats)
+
     def trimmed(self):
         """
         Return only coordinate, subtotal columns
@@ -268,14 +484,33 @@ class Name:
         cols = ['grid', 'subtotal']
         return self.data[cols]
 
-    def get_cover(self, shapefile):
+    def get_cover(self, shapefile, tolerance=0.0):
         """
         Get covering factor value for input ESRI shapefile
 
         shapefile -- Path to ESRI shape file
+        tolerance -- simplify shape to this tolerance (degrees) before calculation, 0.0 for none
+
+        returns array of covering factors, indexed [Y-Index - 1, X-Index - 1]
         """
-        # create shape object
-        shape = Shape(shapefile)
+        if not os.path.isfile(shapefile):
+            raise ValueError('Shapefile not found: {}'.format(shapefile))
+
+        key = (os.path.abspath(shapefile), os.path.getmtime(shapefile), tolerance,
+               self.grid_origin, self.grid_size, self.grid_shape)
+
+        if key not in COVERS:
+            from .shape import Shape
+
+            # create shape object
+            shape = Shape(shapefile, tolerance)
+
+            # calculate covering factors of shape cascaded union over grid squares
+            COVERS[key] = covergrid(shape.cu, self.grid_origin, self.grid_size, self.grid_shape)
+
+        cover = COVERS[key]
+
+        if self.data is not None:
+            self.data[shortname(shapefile)] = cover.ravel()[self.data.index.values]
 
-        # calculate covering factors of shape cascaded union over grid squares
-        self.data[shape.shortname] = [coverfactor(shape.cu, s) for s in self.data['grid']]
+        return cover
@@ -10,6 +10,7 @@
 #
 
 import numpy as np
+import mpl_toolkits.basemap
 from mpl_toolkits.basemap import Basemap
 import matplotlib
 matplotlib.use('Agg')
@@ -17,19 +18,35 @@ import matplotlib.pyplot as plt
 import matplotlib.cm as cm
 from matplotlib.collections import PatchCollection
 from PIL import Image
-import arrow
 
 from shapely.ops import transform
 from shapely.geometry import Point, Polygon
 from descartes import PolygonPatch
 import geopandas as gpd
 
+import cPickle as pickle
+import copy
+import hashlib
 import os
+import tempfile
+
+from .util import parse_timestamps, shortname, CACHE
+from .instrument import timed
 
 # suppress matplotlib/basemap warnings
 import warnings
 warnings.filterwarnings("ignore")
 
+# Caches kept for the life of the process, so long-running callers
+# (e.g. render server workers) only pay setup costs once
+BASEMAPS = {}   # Basemap instances by projection parameters
+LOGOS = {}      # logo image arrays by filename
+ZONES = {}      # zone geometries by ESRI shapefile
+
+# Pickled Basemap instances kept between runs, so new processes plotting
+# the same domain skip coastline loading and clipping
+BASEMAPDIR = os.path.join(CACHE, 'basemaps')
+
 
 
 class Map(object):
@@ -58,6 +75,7 @@ class Map(object):
         self.solid = False
 
         self.outdir = ''
+        self.fmt = None
 
         # Set default plot caption
         self.getCaption()
@@ -91,10 +109,7 @@ class Map(object):
         if self.column == 'total':
             suffix = 'Sum'
         else:
-            a = arrow.get(self.column, 'DD/MM/YYYY HH:mm')
-            suffix = a.format('HHmm')
-            if self.name.direction == 'Forwards':
-                suffix = a.shift(hours=-3).format('HHmm')
+            suffix = self.__timeSuffix()
 
         self.caption = '{} {} {} {} start of {} release: {} {} (UTC)'.format(self.runname or self.name.runname,
                                                                     self.name.timerun,
@@ -104,22 +119,34 @@ class Map(object):
                                                                     release_date,
                                                                     suffix)
 
+    def __timeSuffix(self):
+        """
+        Return HHMM time suffix for plotted column, taken from Name
+        timestamp array where available
+        Tagged as private method
+        """
+        if self.column in self.name.timestamps:
+            t = self.name.times[self.name.timestamps.index(self.column)]
+        else:
+            t = parse_timestamps([self.column])[0]
+
+        if self.name.direction == 'Forwards':
+            t = t - np.timedelta64(3, 'h')
+
+        return str(t)[11:16].replace(':', '')
+
     def getFilename(self):
         """
         Set default plot filename
         """
-        # get root of input NAME filename
-        base = os.path.basename(self.name.filename)
-        base = os.path.splitext(base)[0]
+        # get root of input NAME filename, without any compression extension
+        base = shortname(self.name.filename)
 
         if self.column == 'total':
             base = self.name.runname
             suffix = 'sum_{}'.format(self.name.sumby)
         else:
-            a = arrow.get(self.column, 'DD/MM/YYYY HH:mm')
-            suffix = a.format('HHmm')
-            if self.name.direction == 'Forwards':
-                suffix = a.shift(hours=-3).format('HHmm')
+            suffix = self.__timeSuffix()
 
         self.filename = '{}_{}.png'.format(base, suffix)
 
@@ -148,6 +175,11 @@ class Map(object):
 
         self.name.get_minmax(column)
 
+        # Column without positive values cannot set a log scale, use standard scale
+        if self.name.min_conc is None:
+            self.setFixedScale()
+            return
+
         # set default normalisation from name file extrema
         self.norm = matplotlib.colors.LogNorm(vmin=self.name.min_conc, vmax=self.name.max_conc, clip=False)
 
@@ -190,6 +222,7 @@ class Map(object):
         self.projection = projection
 
     # --------------------------------------------------------
+    @timed('Map.drawBase')
     def drawBase(self, caption, fontsize=10, boarder_col="black", sea_col="white", land_col="#D1D1D1", grid_col="black"):
         """
         Set up map projection
@@ -202,18 +235,18 @@ class Map(object):
         if self.projection == 'cyl':
             a = np.linspace(self.lat_range[0], self.lat_range[1],4)
 
-            self.m = Basemap(llcrnrlon=self.lon_range[0], llcrnrlat=self.lat_range[0],
-                             urcrnrlon=self.lon_range[1], urcrnrlat=self.lat_range[1],
-                             projection=self.projection, lat_1=a[1], lat_2=a[2], lon_0=0.,
-                             resolution='l', area_thresh=1000.)
+            self.m = self.__basemap(llcrnrlon=self.lon_range[0], llcrnrlat=self.lat_range[0],
+                                    urcrnrlon=self.lon_range[1], urcrnrlat=self.lat_range[1],
+                                    projection=self.projection, lat_1=a[1], lat_2=a[2], lon_0=0.,
+                                    resolution='l', area_thresh=1000.)
 
         # North Polar Stereographic
         elif self.projection == 'npstere':
-            self.m = Basemap(projection=self.projection, boundinglat=self.lat_range[0], lon_0=self.lon_range[0], resolution='l')
+            self.m = self.__basemap(projection=self.projection, boundinglat=self.lat_range[0], lon_0=self.lon_range[0], resolution='l')
 
         # South Polar Stereographic
         elif self.projection == 'spstere':
-            self.m = Basemap(projection=self.projection, boundinglat=self.lat_range[1], lon_0=self.lon_range[0], resolution='l')
+            self.m = self.__basemap(projection=self.projection, boundinglat=self.lat_range[1], lon_0=self.lon_range[0], resolution='l')
 
         else:
             exit('Unsupported projection! Try cyl|npstere|spstere')
@@ -226,6 +259,61 @@ class Map(object):
         self.m.drawmeridians(self.lon_axis, linewidth=0.3, color=grid_col, labels=[1, 0, 0, 1], zorder=14, fontsize=5)
 
         self.ax.set_title(caption, fontsize=fontsize)
+
+    def __basemap(self, **kwargs):
+        """
+        Return Basemap for given parameters, reusing coastline data
+        from earlier maps with the same parameters.
+        Tagged as private method
+
+        kwargs -- Basemap constructor arguments
+        """
+        key = tuple(sorted(kwargs.items()))
+
+        if key not in BASEMAPS:
+            BASEMAPS[key] = self.__loadBasemap(key)
+
+        # Shallow copy shares coastline data, but keeps per-plot state separate
+        return copy.copy(BASEMAPS[key])
+
+    def __loadBasemap(self, key):
+        """
+        Return Basemap for given parameters from disk cache, constructing
+        and caching it if not found. Cache files are named by a hash of
+        the parameters and Basemap version.
+        Tagged as private method
+
+        key -- sorted tuple of Basemap constructor arguments
+        """
+        version = getattr(mpl_toolkits.basemap, '__version__', '')
+        digest = hashlib.sha1(repr((version, key))).hexdigest()
+        cachefile = os.path.join(BASEMAPDIR, digest + '.pickle')
+
+        if os.path.isfile(cachefile):
+            try:
+                with open(cachefile, 'rb') as f:
+                    return pickle.load(f)
+            except Exception as e:
+                print 'Cannot read Basemap cache {}: {}'.format(cachefile, e)
+
+        m = Basemap(**dict(key))
+
+        # Written to a temporary file and renamed, so concurrent processes
+        # never read a partial file
+        try:
+            if not os.path.isdir(BASEMAPDIR):
+                os.makedirs(BASEMAPDIR)
+
+            (fd, tmp) = tempfile.mkstemp(dir=BASEMAPDIR, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(m, f, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp, cachefile)
+
+        except (IOError, OSError, pickle.PicklingError) as e:
+            print 'Cannot write Basemap cache {}: {}'.format(cachefile, e)
+
+        return m
+
     # --------------------------------------------------------
     def zoneLoad(self, files):
         """
@@ -240,10 +328,11 @@ class Map(object):
 
         for shapefile in files:
 
-            # read ESRI shapefile into GeoPandas object
-            shape = gpd.GeoDataFrame.from_file(shapefile)
+            # read ESRI shapefile into GeoPandas object, once per process
+            if shapefile not in ZONES:
+                ZONES[shapefile] = list(gpd.GeoDataFrame.from_file(shapefile).geometry)
 
-            for poly in shape.geometry:
+            for poly in ZONES[shapefile]:
                 if poly.geom_type == 'Polygon':
                     mpoly = transform(self.m, poly)
                     self.patches.append(PolygonPatch(mpoly))
@@ -295,6 +384,7 @@ class Map(object):
         """
         self.colormap = getattr(cm, colormap)
 
+    @timed('Map.drawSolid')
     def drawSolid(self, column, color='blue', zorder=6):
         """
         Draw solid shape showing extent of conc > 0.0
@@ -302,19 +392,12 @@ class Map(object):
         """
         self.solid = True
 
-        mesh = self.name.data[column]
-        mesh1 = mesh.loc[mesh > 0.0]
-
-        mesh2 = mesh1.unstack(level=1)
-        mesh2 = mesh2.fillna(0)
-
-        lons = mesh2.index.get_level_values('Longitude')
-        lats = mesh2.columns
+        # Rasterise column onto full grid, works for dense and sparse data
+        mesh = self.name.get_grid(column)
+        (lons, lats) = self.name.get_axes()
 
-        mesh2 = mesh2.transpose()
-
-        mesh2[mesh2 > 0] = 1.0
-        mesh3 = mesh2.mask(mesh2 < 1.0) # Changed by Teri 03/05/2018
+        mesh2 = (mesh > 0.0).astype(float)
+        mesh3 = np.ma.masked_less(mesh2, 1.0) # Changed by Teri 03/05/2018
 
         x,y = self.m(lons, lats)
 
@@ -324,21 +407,15 @@ class Map(object):
         self.m.pcolormesh(x, y, mesh3, norm=norm, cmap=cmap, zorder=zorder, alpha=0.6)
 
 
+    @timed('Map.drawMesh')
     def drawMesh(self, column, zorder=6):
         """
         Draw data column values on map
         Add colourbar to plot where plot is not solid type
         """
-        mesh = self.name.data[column]
-        mesh1 = mesh.loc[mesh > 0.0]
-
-        mesh2 = mesh1.unstack(level=1)
-        mesh2 = mesh2.fillna(0)
-
-        lons = mesh2.index.get_level_values('Longitude')
-        lats = mesh2.columns
-
-        mesh2 = mesh2.transpose()
+        # Rasterise column onto full grid, works for dense and sparse data
+        mesh2 = self.name.get_grid(column)
+        (lons, lats) = self.name.get_axes()
 
         lons2, lats2 = np.meshgrid(lons, lats)
 
@@ -405,24 +482,68 @@ class Map(object):
         #logo = plt.imread(logofile)
         #self.ax.imshow(logo, aspect='auto', extent=(0.4, 0.6, .5, .7), zorder=-1)
 
-        im = Image.open(logofile)
-        height = im.size[1]
-        im = np.array(im).astype(np.float) / 255
+        if logofile not in LOGOS:
+            LOGOS[logofile] = np.array(Image.open(logofile)).astype(np.float) / 255
+
+        im = LOGOS[logofile]
         self.fig.figimage(im, self.fig.bbox.xmin + heightjump, self.fig.bbox.ymin+10)
 
-    def saveFile(self, filename=None):
+    def setFormat(self, fmt):
         """
-        Save plot output file
-        filename -- output file including type extension
+        Set output image format, replacing plot filename extension
+        fmt -- image file extension, e.g. png, jpg, webp
+        """
+        self.fmt = fmt
+        self.filename = os.path.splitext(self.filename)[0] + '.' + fmt
+
+    def getPath(self, filename=None):
+        """
+        Return path of plot output file, as written by saveFile
+        filename -- output file including type extension, default is plot filename
         """
         if filename is None:
             filename = self.filename
+        elif self.fmt:
+            filename = os.path.splitext(filename)[0] + '.' + self.fmt
 
         if self.outdir:
             filename = os.path.join(self.outdir, filename)
 
+        return filename
+
+    @timed('Map.saveFile')
+    def saveFile(self, filename=None, writer=None, dpi=300, done=None):
+        """
+        Save plot output file
+        filename -- output file including type extension
+        writer -- imagewriter.ImageWriter to encode and write image in the
+                  background, or None to write before returning
+        dpi -- output image resolution
+        done -- optional function called once file is written
+        """
+        filename = self.getPath(filename)
+
         print 'Creating plot file: {}'.format(filename)
-        self.fig.savefig(filename, dpi=300)
+
+        if writer is None:
+            self.fig.savefig(filename, dpi=dpi)
+            if done:
+                done()
+            return filename
+
+        # Render to RGBA buffer now, leave compression and disk I/O to writer
+        figdpi = self.fig.dpi
+        self.fig.set_dpi(dpi)
+        self.fig.canvas.draw()
+
+        (width, height) = self.fig.canvas.get_width_height()
+        rgba = np.frombuffer(self.fig.canvas.buffer_rgba(), np.uint8).reshape(height, width, 4).copy()
+
+        self.fig.set_dpi(figdpi)
+
+        writer.submit(rgba, filename, dpi, done)
+
+        return filename
 
     def free(self):
         """Free up memory"""
@@ -430,7 +551,9 @@ class Map(object):
         self.runname = ""
         self.fig.clf()
         plt.close('all')
-        del self.m, self.name
+        # No Basemap if map was freed before drawBase
+        self.__dict__.pop('m', None)
+        del self.name
         self.lon_range = []
         self.lat_range = []
         self.lon_axis = []
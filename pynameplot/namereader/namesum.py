@@ -8,8 +8,30 @@
 # Support libraries. Sum NAME geochemical dataframes over a given timespan.
 # 
 
+import numpy as np
+import pandas as pd
+
+import json
+import os
+import time
+
 from .name import Name
 from .fileset import Fileset
+from .archive import Archive, isarchive
+from .source import stamp
+from .sparse import SparseGrid
+from .instrument import timed
+from .util import shortname, filedate
+
+# Running sum state filename, stored at top of state directory
+STATE = '_sumstate.json'
+
+# Sum metadata copied from first Name file, tuple valued attributes marked True
+META = [('runname', False), ('release', False), ('endrelease', False), ('averaging', False),
+        ('timerun', False), ('releasetime', False), ('duration', False), ('altitude', False),
+        ('direction', False), ('lon_bounds', True), ('lat_bounds', True), ('lon_grid', False),
+        ('lat_grid', False), ('grid_size', True), ('grid_origin', True), ('grid_shape', True),
+        ('year', False), ('month', False), ('day', False)]
 
 
 class Sum(Name):
@@ -19,15 +41,24 @@ class Sum(Name):
     Extends existing Name class
     """
 
-    def __init__(self, directory):
+    def __init__(self, directory, bbox=None, sparse=False):
         """
         Initialise Sum object
-        directory -- input directory path
+        directory -- input directory path, or path to NAME archive
+        bbox -- optional (lon_min, lat_min, lon_max, lat_max) tuple to restrict sum to
+        sparse -- hold summed concentrations as sparse (cell, value) arrays in self.sparse
         """
 
         self.directory = directory
+        self.bbox = bbox
+        self.sparsemode = sparse
+        self.sparse = None
         self.files = []
-        self.fs = Fileset(directory)
+
+        if isarchive(directory):
+            self.fs = Archive(directory)
+        else:
+            self.fs = Fileset(directory)
 
     def sumAll(self):
         """
@@ -88,6 +119,7 @@ class Sum(Name):
         self.__addFiles(self.files)
         self.sumby = "year%s" % y
 
+    @timed('Sum.addFiles')
     def __addFiles(self, files):
         """
         NAME data add operation method
@@ -97,41 +129,317 @@ class Sum(Name):
 
         if len(files) > 0 :
             print 'Loading: ', files[0]
-            n = Name(files[0])
-            n.add_all()
+            n = self.fs.load(files[0], bbox=self.bbox, sparse=self.sparsemode)
 
             # Load Sum object metadata from first Name file found
-            self.runname = n.runname
-            self.release = n.release
-            self.endrelease = n.endrelease
-            self.averaging = n.averaging
-            self.timerun = n.timerun
-            self.releasetime = n.releasetime
-            self.duration = n.duration
-            self.altitude = n.altitude
-            self.direction = n.direction
-            self.lon_bounds = n.lon_bounds
-            self.lat_bounds = n.lat_bounds
-            self.lon_grid = n.lon_grid
-            self.lat_grid = n.lat_grid
-            self.year = n.year
-            self.month = n.month
-            self.day = n.day
-
-            m = n.trimmed()
-            m = m.rename(columns={'subtotal': 'total'})
+            for (attr, istuple) in META:
+                setattr(self, attr, getattr(n, attr))
+
+            if self.sparsemode:
+                self.__addSparse(n, files[1::])
+                return
+
+            # Totals and grid squares accumulated in flat arrays by cell id
+            (lon_size, lat_size) = n.grid_shape
+            total = np.zeros(lon_size * lat_size)
+            grid = np.empty(lon_size * lat_size, dtype=object)
+
+            self.__addCells(n, total, grid)
 
             for f in files[1::]:
                 print 'Loading: ', f
-                n2 = Name(f)
-                n2.add_all()
-                m2 = n2.trimmed()
+                n2 = self.fs.load(f, bbox=self.bbox)
+                self.__addCells(n2, total, grid)
+
+            cells = np.flatnonzero(grid != None)
+            self.data = pd.DataFrame({'grid': grid[cells], 'total': total[cells]},
+                                     index=pd.Index(cells, name='cell'), columns=['grid', 'total'])
+
+    def __addCells(self, n, total, grid):
+        """
+        Add summed timestamps of Name object into flat cell arrays
+        Tagged as private method
+        n -- loaded Name object
+        total -- flat array of summed concentrations, by cell id
+        grid -- flat array of grid square polygons, by cell id
+        """
+
+        self.__checkGrid(n)
+
+        n.add_all()
+        cells = n.data.index.values
+
+        total[cells] += n.data['subtotal'].values
+
+        # First file to cover a cell supplies its grid square
+        new = grid[cells] == None
+        grid[cells[new]] = n.data['grid'].values[new]
+
+    def __checkGrid(self, n):
+        """
+        Raise ValueError if Name object grid differs from summed grid,
+        as cell ids of different grids do not match
+        Tagged as private method
+        n -- loaded Name object
+        """
+
+        if (n.grid_origin, n.grid_size, n.grid_shape) != (self.grid_origin, self.grid_size, self.grid_shape):
+            raise ValueError('NAME file grid does not match first file: {}'.format(n.filename))
+
+    def __addSparse(self, n, files):
+        """
+        Sparse NAME data add operation method, accumulates 'total' field
+        in self.sparse without building any grid geometry
+        Tagged as private method
+        n -- first loaded (sparse) Name object
+        files -- list of remaining input NAME files
+        """
+
+        self.sparse = SparseGrid(n.grid_origin, n.grid_size, n.grid_shape)
+
+        (cells, values) = n.sparse.sum()
+        self.sparse.set('total', cells, values)
+
+        for f in files:
+            print 'Loading: ', f
+            n2 = self.fs.load(f, bbox=self.bbox, sparse=True)
+            self.__checkGrid(n2)
+
+            (cells, values) = n2.sparse.sum()
+            self.sparse.accumulate('total', cells, values)
+
+        self.data = None
+
+    # --------------------------------------------------------
+    def buckets(self, f):
+        """
+        Return names of running sums a NAME file belongs to, as sumby names
+        of sumDay, sumWeek, sumMonth, sumYear and sumAll, with the year added
+        to week and month names (e.g. 'week2015-20', 'month2015-05') as
+        running sums persist across years
+        f -- NAME file path or archive key
+        """
+        d = filedate(f)
+
+        return ['day{}'.format(d.strftime('%Y%m%d')),
+                'week{}-{:02d}'.format(d.isocalendar()[0], self.fs.getWeek(d)),
+                'month{}'.format(d.strftime('%Y-%m')),
+                'year{}'.format(self.fs.getYear(d)),
+                'all']
+
+    def update(self, statedir):
+        """
+        Incrementally update running sums persisted in state directory.
+        Each new file is loaded once, and its total added to the day, week,
+        month, year and 'all' sums it belongs to. Sums containing files
+        modified or removed since the last update are rebuilt from the stored
+        per-file totals, without re-reading any NAME file.
+
+        statedir -- directory holding running sum state between updates
+        returns sorted list of updated sum names, not including sums left empty
+        """
+        state = self.__loadState(statedir)
+
+        self.fs.refresh()
+        current = dict((shortname(f), f) for f in self.fs.getAll())
+
+        rebuild = set()
+        added = set()
+        removed = set()
+        totals = {}
+
+        # Drop files removed or modified since last update
+        for key in sorted(state['files'].keys()):
+            entry = state['files'][key]
+
+            if key in current and self.__stamp(current[key]) == (entry['mtime'], entry['size']):
+                continue
+
+            rebuild.update(entry['buckets'])
+            os.remove(os.path.join(statedir, entry['path']))
+            del state['files'][key]
+
+        # Move files to renamed running sums, e.g. from state written before
+        # week and month names included the year
+        for entry in state['files'].values():
+            buckets = self.buckets(entry['file'])
+            if entry['buckets'] != buckets:
+                rebuild.update(entry['buckets'] + buckets)
+                entry['buckets'] = buckets
+
+        # Load new and modified files, one at a time
+        for key in sorted(current.keys()):
+            if key in state['files']:
+                continue
+
+            f = current[key]
+            print 'Loading: ', f
+            n = self.fs.load(f, bbox=self.bbox, sparse=True)
+
+            if state['grid'] is None:
+                state['grid'] = [list(n.grid_origin), list(n.grid_size), list(n.grid_shape)]
+            elif [list(n.grid_origin), list(n.grid_size), list(n.grid_shape)] != state['grid']:
+                raise ValueError('NAME grid of {} does not match running sums'.format(f))
+
+            (mtime, size) = self.__stamp(f)
+            entry = {
+                'file': f,
+                'path': os.path.join('files', key + '.npz'),
+                'mtime': mtime,
+                'size': size,
+                'buckets': self.buckets(f),
+                'meta': dict((attr, getattr(n, attr)) for (attr, istuple) in META),
+            }
 
-                #m = m.join(m2, how='outer')
-                m = m.combine_first(m2)
-                m = m.fillna(0)
+            totals[key] = n.sparse.sum()
+            self.__saveArrays(statedir, entry['path'], totals[key])
+
+            state['files'][key] = entry
+            added.update(entry['buckets'])
+
+        if state['grid'] is not None:
+            grid = SparseGrid(*[tuple(g) for g in state['grid']])
+
+        for bucket in sorted(rebuild | added):
+            keys = [k for (k, e) in state['files'].items() if bucket in e['buckets']]
+            path = os.path.join('sums', bucket + '.npz')
+
+            if not keys:
+                if os.path.isfile(os.path.join(statedir, path)):
+                    os.remove(os.path.join(statedir, path))
+                removed.add(bucket)
+                continue
+
+            if bucket in rebuild or not os.path.isfile(os.path.join(statedir, path)):
+                # Rebuild from stored per-file totals
+                grid.fields.pop(bucket, None)
+                for k in keys:
+                    arrays = totals.get(k) or self.__readArrays(statedir, state['files'][k]['path'])
+                    grid.accumulate(bucket, *arrays)
+            else:
+                # Add only new files to existing running sum
+                grid.set(bucket, *self.__readArrays(statedir, path))
+                for k in keys:
+                    if k in totals:
+                        grid.accumulate(bucket, *totals[k])
+
+            self.__saveArrays(statedir, path, grid.fields.pop(bucket))
+
+        self.__saveState(statedir, state)
+
+        return sorted((rebuild | added) - removed)
+
+    def loadBucket(self, statedir, bucket):
+        """
+        Load running sum from state directory into 'total' field.
+        Summed data is held in sparse form, whatever the sparse setting.
+
+        statedir -- directory holding running sum state
+        bucket -- running sum name, e.g. 'month2015-05' or 'year2015'
+        """
+        state = self.__loadState(statedir)
+
+        keys = sorted(k for (k, e) in state['files'].items() if bucket in e['buckets'])
+        if not keys:
+            raise ValueError('No files in running sum {}'.format(bucket))
+
+        # Load Sum object metadata from first Name file in sum
+        meta = state['files'][keys[0]]['meta']
+        for (attr, istuple) in META:
+            setattr(self, attr, tuple(meta[attr]) if istuple else meta[attr])
+
+        self.files = [state['files'][k]['file'] for k in keys]
+
+        self.sparse = SparseGrid(self.grid_origin, self.grid_size, self.grid_shape)
+        self.sparse.set('total', *self.__readArrays(statedir, os.path.join('sums', bucket + '.npz')))
+
+        self.data = None
+        self.sumby = bucket
+
+    def watch(self, statedir, callback, interval=300):
+        """
+        Update running sums whenever new files arrive, until interrupted
+
+        statedir -- directory holding running sum state
+        callback -- function called with list of updated sum names
+        interval -- seconds between directory scans
+        """
+        while True:
+            buckets = self.update(statedir)
+            if buckets:
+                callback(buckets)
+            time.sleep(interval)
+
+    def __stamp(self, f):
+        """
+        Return (mtime, size) of NAME file, or of archived file's source
+        Tagged as private method
+        f -- NAME file path or archive key
+        """
+        if isinstance(self.fs, Archive):
+            entry = self.fs.index[f]
+            return (entry['mtime'], entry['size'])
+
+        return stamp(f)
+
+    def __loadState(self, statedir):
+        """
+        Return running sum state from state directory, or new empty state
+        Tagged as private method
+        statedir -- directory holding running sum state
+        """
+        filename = os.path.join(statedir, STATE)
+
+        if not os.path.isfile(filename):
+            return {'bbox': list(self.bbox) if self.bbox else None, 'grid': None, 'files': {}}
+
+        with open(filename, 'r') as f:
+            state = json.load(f)
+
+        if state['bbox'] != (list(self.bbox) if self.bbox else None):
+            raise ValueError('Running sums in {} use a different bounding box'.format(statedir))
+
+        return state
+
+    def __saveState(self, statedir, state):
+        """
+        Write running sum state to state directory
+        Tagged as private method
+        statedir -- directory holding running sum state
+        state -- state dict
+        """
+        filename = os.path.join(statedir, STATE)
+
+        if not os.path.isdir(statedir):
+            os.makedirs(statedir)
+
+        with open(filename + '.tmp', 'w') as f:
+            json.dump(state, f)
+        os.rename(filename + '.tmp', filename)
+
+    def __readArrays(self, statedir, path):
+        """
+        Return (cells, values) arrays stored in state directory
+        Tagged as private method
+        statedir -- directory holding running sum state
+        path -- array file path, relative to state directory
+        """
+        with np.load(os.path.join(statedir, path)) as npz:
+            return (npz['cells'], npz['values'])
+
+    def __saveArrays(self, statedir, path, arrays):
+        """
+        Write (cells, values) arrays to state directory
+        Tagged as private method
+        statedir -- directory holding running sum state
+        path -- array file path, relative to state directory
+        arrays -- (cells, values) tuple
+        """
+        filename = os.path.join(statedir, path)
 
-                m.total = m.total + m.subtotal
-                m = m.drop('subtotal', 1)
+        if not os.path.isdir(os.path.dirname(filename)):
+            os.makedirs(os.path.dirname(filename))
 
-            self.data = m
+        with open(filename + '.tmp', 'wb') as f:
+            np.savez(f, cells=arrays[0], values=arrays[1])
+        os.rename(filename + '.tmp', filename)
@@ -0,0 +1,185 @@
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# OVERLAY
+#
+# Support libraries. Shared in-memory store of NAME datasets for
+# multiple dataset overlay plots. Each NAME file or summed directory
+# is parsed once, and each data column converted to a grid once,
+# however many frames it is drawn on. Overlays are drawn from one
+# stack of all dataset grids, placed on a shared grid.
+#
+# Overlay styles:
+#
+# solid -- solid colour footprint where concentration > 0
+# contour -- outline of concentration > 1e-9
+# filled -- outline and translucent fill of concentration > 1e-9
+#
+
+import numpy as np
+
+from .name import Name
+from .namesum import Sum
+
+# Overlay drawing styles
+STYLES = ('solid', 'contour', 'filled')
+
+# Contour levels for footprint outlines
+LEVELS = (1.e-9, 1000.0)
+
+
+class DataStore(object):
+    """
+    Load-once store of NAME datasets and their gridded data columns
+    """
+
+    def __init__(self):
+        """
+        Initialise empty DataStore object
+        """
+
+        self.datasets = {}
+        self.grids = {}
+
+    def loadFile(self, filename):
+        """
+        Return Name object for NAME file, parsing file on first request only
+        filename -- path to NAME file
+        """
+
+        if filename not in self.datasets:
+            self.datasets[filename] = Name(filename, sparse=True)
+
+        return self.datasets[filename]
+
+    def loadSum(self, directory, by='all', value=None):
+        """
+        Return Sum object for directory of NAME files, summing on first request only
+        directory -- input directory path, or path to NAME archive
+        by -- sum period, one of 'day', 'week', 'month', 'year' or 'all'
+        value -- day, week, month or year to sum over
+        """
+
+        key = (directory, by, value)
+
+        if key not in self.datasets:
+            s = Sum(directory, sparse=True)
+
+            if by == 'day':
+                s.sumDay(value)
+            elif by == 'week':
+                s.sumWeek(value)
+            elif by == 'month':
+                s.sumMonth(value)
+            elif by == 'year':
+                s.sumYear(value)
+            elif by == 'all':
+                s.sumAll()
+            else:
+                raise ValueError('Unknown sum period: {}'.format(by))
+
+            self.datasets[key] = s
+
+        return self.datasets[key]
+
+    def grid(self, n, column):
+        """
+        Return (longitude, latitude, values) arrays for data column,
+        converting column to grid on first request only
+
+        n -- Name or Sum object
+        column -- name of data column
+        """
+
+        key = (id(n), column)
+
+        # Object held with its grids, so its id cannot be reused
+        if key not in self.grids:
+            (lons, lats) = n.get_axes()
+            self.grids[key] = (n, lons, lats, n.get_grid(column))
+
+        return self.grids[key][1:]
+
+    def stack(self, datasets, column):
+        """
+        Return (longitude, latitude, values) arrays for data column of
+        several datasets, placed on one shared grid covering all of them.
+        Values array is indexed [dataset, latitude, longitude].
+
+        datasets -- list of Name or Sum objects, with the same grid spacing
+        column -- name of data column
+        """
+
+        grids = [self.grid(n, column) for n in datasets]
+
+        delta = np.array(datasets[0].grid_size, dtype=float)
+        for n in datasets[1:]:
+            if not np.allclose(n.grid_size, delta):
+                raise ValueError('Overlay datasets must have the same grid spacing')
+
+        # Shared grid spans all dataset grids
+        lon_0 = min(lons[0] for (lons, lats, values) in grids)
+        lat_0 = min(lats[0] for (lons, lats, values) in grids)
+        lon_1 = max(lons[-1] for (lons, lats, values) in grids)
+        lat_1 = max(lats[-1] for (lons, lats, values) in grids)
+
+        lon_size = int(np.rint((lon_1 - lon_0) / delta[0])) + 1
+        lat_size = int(np.rint((lat_1 - lat_0) / delta[1])) + 1
+
+        values = np.zeros((len(grids), lat_size, lon_size))
+
+        for (k, (lons, lats, grid)) in enumerate(grids):
+            i = int(np.rint((lons[0] - lon_0) / delta[0]))
+            j = int(np.rint((lats[0] - lat_0) / delta[1]))
+            values[k, j:j + grid.shape[0], i:i + grid.shape[1]] = grid
+
+        lons = lon_0 + delta[0] * np.arange(lon_size)
+        lats = lat_0 + delta[1] * np.arange(lat_size)
+
+        return (lons, lats, values)
+
+
+def drawOverlays(m, layers, column, style='solid', store=None, zorder=10):
+    """
+    Draw NAME datasets as overlays on map, in order
+
+    m -- namemap.Map object, with base map drawn
+    layers -- list of (Name or Sum object, HTML colour) tuples
+    column -- name of data column to plot
+    style -- overlay style, one of STYLES
+    store -- DataStore holding gridded data, or None for a temporary store
+    zorder -- drawing order of first overlay
+    """
+    import matplotlib.colors
+
+    if style not in STYLES:
+        raise ValueError('Unknown overlay style: {}'.format(style))
+
+    if not layers:
+        return
+
+    if store is None:
+        store = DataStore()
+
+    (lons, lats, values) = store.stack([n for (n, color) in layers], column)
+
+    (lons2, lats2) = np.meshgrid(lons, lats)
+    (x, y) = m.m(lons2, lats2)
+
+    if style == 'solid':
+        # Footprint masks for all datasets at once, cells outside are masked
+        masks = np.ma.masked_less((values > 0.0).astype(float), 1.0)
+        norm = matplotlib.colors.LogNorm(vmin=0.99, vmax=1.0, clip=False)
+
+        for (k, (n, color)) in enumerate(layers):
+            cmap = matplotlib.colors.ListedColormap([matplotlib.colors.to_rgba(color, alpha=0.3)])
+            m.m.pcolormesh(x, y, masks[k], norm=norm, cmap=cmap, zorder=zorder + k)
+
+    else:
+        for (k, (n, color)) in enumerate(layers):
+            m.m.contour(x, y, values[k], LEVELS, colors=(color, 'white'), linewidths=(0.6, 0.6), zorder=zorder + k)
+
+            if style == 'filled':
+                m.m.contourf(x, y, values[k], LEVELS, colors=(color, 'white'), alpha=0.3, zorder=zorder + k)
@@ -0,0 +1,235 @@
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# RASTER
+#
+# Support libraries. Write gridded NAME concentration data to
+# compressed raster files (NetCDF4, GeoTIFF) without plotting.
+#
+
+import numpy as np
+
+import datetime
+import os
+import re
+
+from .inventory import NameHeader
+from .name import Name
+from .util import shortname
+
+# Reference epoch for NetCDF time coordinate
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def columns(n):
+    """
+    Return list of (column, datetime) pairs to write for Name or Sum object,
+    in time order
+    n -- Name or Sum object
+    """
+    if n.sparse is not None:
+        summed = 'total' in n.sparse.fields
+    else:
+        summed = 'total' in n.data.columns
+
+    if summed:
+        # Summed data is stamped with date of first file in sum
+        return [('total', datetime.datetime(int(n.year), int(n.month), int(n.day)))]
+
+    # Backwards runs list timestamps latest first
+    return sorted(zip(n.timestamps, n.times.astype(datetime.datetime)), key=lambda c: c[1])
+
+
+def timeline(sources):
+    """
+    Return {(source index, column): time step} placing every timestamp of
+    all sources in one increasing time axis. NAME files are read from
+    their headers only. Raises ValueError if a time is in more than one
+    source.
+
+    sources -- list of NAME filenames, or loaded Name/Sum objects
+    """
+    stamps = []
+
+    for (i, source) in enumerate(sources):
+        if isinstance(source, basestring):
+            h = NameHeader(source)
+            pairs = zip(h.timestamps, h.times.astype(datetime.datetime))
+        else:
+            pairs = columns(source)
+
+        stamps += [(t, i, column) for (column, t) in pairs]
+
+    stamps.sort()
+
+    for (a, b) in zip(stamps, stamps[1:]):
+        if a[0] == b[0]:
+            raise ValueError('Time {} is in more than one input'.format(a[0].strftime('%Y-%m-%d %H:%M')))
+
+    return dict(((i, column), step) for (step, (t, i, column)) in enumerate(stamps))
+
+
+def writeNetCDF(sources, outfile, complevel=4):
+    """
+    Write NAME data to CF-compliant NetCDF4 file, one time step per timestamp,
+    with time increasing. Sources are loaded and written one at a time, so
+    memory use is bounded by the largest single input. Raises ValueError if
+    a time is in more than one source.
+
+    sources -- list of NAME filenames, or loaded Name/Sum objects, sharing one grid
+    outfile -- output NetCDF filename
+    complevel -- zlib compression level (1-9)
+    """
+    import netCDF4
+
+    steps = timeline(sources)
+    ds = None
+
+    try:
+        for (i, source) in enumerate(sources):
+
+            if isinstance(source, basestring):
+                print 'Loading: ', source
+                n = Name(source, sparse=True)
+            else:
+                n = source
+
+            if ds is None:
+                grid = (n.grid_origin, n.grid_size, n.grid_shape)
+                ds = createNetCDF(n, outfile, complevel)
+            elif (n.grid_origin, n.grid_size, n.grid_shape) != grid:
+                raise ValueError('NAME grid of {} does not match first input'.format(n.filename))
+
+            for (column, t) in columns(n):
+                step = steps[(i, column)]
+                ds.variables['time'][step] = netCDF4.date2num(t, ds.variables['time'].units)
+                ds.variables['concentration'][step, :, :] = n.get_grid(column)
+
+            # Release parsed data before loading next file
+            del n
+    finally:
+        if ds is not None:
+            ds.close()
+
+    return len(steps)
+
+
+def createNetCDF(n, outfile, complevel=4):
+    """
+    Create NetCDF4 dataset with grid and metadata from first Name object
+    Returns open netCDF4 Dataset
+
+    n -- Name or Sum object
+    outfile -- output NetCDF filename
+    complevel -- zlib compression level (1-9)
+    """
+    import netCDF4
+
+    (lons, lats) = n.get_axes()
+
+    ds = netCDF4.Dataset(outfile, 'w', format='NETCDF4')
+
+    ds.createDimension('time', None)
+    ds.createDimension('latitude', len(lats))
+    ds.createDimension('longitude', len(lons))
+
+    time = ds.createVariable('time', 'f8', ('time',))
+    time.units = 'hours since {}'.format(EPOCH.strftime('%Y-%m-%d %H:%M:%S'))
+    time.calendar = 'standard'
+    time.standard_name = 'time'
+    time.axis = 'T'
+
+    lat = ds.createVariable('latitude', 'f8', ('latitude',))
+    lat.units = 'degrees_north'
+    lat.standard_name = 'latitude'
+    lat.axis = 'Y'
+    lat[:] = lats
+
+    lon = ds.createVariable('longitude', 'f8', ('longitude',))
+    lon.units = 'degrees_east'
+    lon.standard_name = 'longitude'
+    lon.axis = 'X'
+    lon[:] = lons
+
+    # One chunk per time step, so each timestamp is written in a single pass
+    conc = ds.createVariable('concentration', 'f4', ('time', 'latitude', 'longitude'),
+                             zlib=True, complevel=complevel, shuffle=True,
+                             chunksizes=(1, len(lats), len(lons)))
+    conc.units = 'g s / m3'
+    conc.long_name = 'NAME {} air concentration {}'.format(n.averaging, n.altitude).strip()
+    conc.coordinates = 'time latitude longitude'
+
+    ds.Conventions = 'CF-1.6'
+    ds.title = n.runname
+    ds.source = 'NAME dispersion model'
+    ds.history = '{} created by pyNAMEplot'.format(datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'))
+    ds.direction = n.direction
+    ds.averaging = n.averaging
+    ds.altitude = n.altitude
+
+    # Copy NAME file header into global attributes
+    for (key, val) in sorted(getattr(n, 'header', {}).items()):
+        ds.setncattr('NAME_' + re.sub(r'\W+', '_', key).strip('_'), val)
+
+    return ds
+
+
+def writeGeoTIFF(n, outdir, compress='deflate'):
+    """
+    Write NAME data to GeoTIFF files, one file per timestamp column
+    Returns list of files written
+
+    n -- Name or Sum object
+    outdir -- output directory for GeoTIFF files
+    compress -- GeoTIFF compression type
+    """
+    import rasterio
+    from rasterio.transform import from_origin
+
+    (lon_0, lat_0) = n.grid_origin
+    (delta_lon, delta_lat) = n.grid_size
+    (lon_size, lat_size) = n.grid_shape
+
+    # Raster origin is north-west corner of grid
+    transform = from_origin(lon_0 - delta_lon / 2., lat_0 + delta_lat * (lat_size - 0.5), delta_lon, delta_lat)
+
+    profile = {
+        'driver': 'GTiff',
+        'width': lon_size,
+        'height': lat_size,
+        'count': 1,
+        'dtype': 'float32',
+        'crs': 'EPSG:4326',
+        'transform': transform,
+        'compress': compress,
+        'predictor': 3,
+    }
+
+    # Internal tiling only pays off for larger grids
+    if lon_size >= 256 and lat_size >= 256:
+        profile.update(tiled=True, blockxsize=256, blockysize=256)
+
+    if outdir and not os.path.exists(outdir):
+        os.makedirs(outdir)
+
+    if n.filename:
+        base = shortname(n.filename)
+    else:
+        base = n.runname
+
+    written = []
+
+    for (column, t) in columns(n):
+        filename = os.path.join(outdir, '{}_{}.tif'.format(base, t.strftime('%Y%m%d%H%M')))
+
+        with rasterio.open(filename, 'w', **profile) as dst:
+            dst.write(np.flipud(n.get_grid(column)).astype('float32'), 1)
+            dst.update_tags(1, timestamp=column)
+            dst.update_tags(RUN_NAME=n.runname, DIRECTION=n.direction, AVERAGING=n.averaging, ALTITUDE=n.altitude)
+
+        print 'Created raster file: {}'.format(filename)
+        written.append(filename)
+
+    return written
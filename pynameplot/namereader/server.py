@@ -0,0 +1,296 @@
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# SERVER
+#
+# Support libraries. Long-running render service. Jobs are read as
+# JSON lines from stdin or a Unix socket and run on a pool of worker
+# processes, which keep plotting libraries, Basemaps, logos and zone
+# shapes loaded between jobs. One JSON response line is written per job.
+#
+# Job types:
+#
+# {"id": 1, "type": "render", "file": [NAME file], "time": [timestamp],
+#  "bbox": [lon_min, lat_min, lon_max, lat_max], "options": {drawMap options}}
+#
+# {"id": 2, "type": "sum", "directory": [NAME directory], "by": "day|week|month|year|all",
+#  "value": [day, week, month or year], "options": {drawMap options}}
+#
+# {"id": 3, "type": "ping"}
+#
+# Responses:
+#
+# {"id": 1, "status": "ok", "outputs": [plot files]}
+# {"id": 2, "status": "error", "error": [message]}
+#
+
+from multiprocessing import Pool
+import SocketServer
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+
+# Import error raised in worker initialiser, returned for every job
+WARMUP_ERROR = None
+
+
+def warmup():
+    """
+    Worker process initialiser. Import plotting libraries once per worker,
+    and send worker log output to stderr so it cannot mix with responses.
+    Import errors are kept for runJob to return, as a failing initialiser
+    makes Pool restart workers without end.
+    """
+    global WARMUP_ERROR
+
+    sys.stdout = sys.stderr
+
+    try:
+        from . import namemap
+    except Exception as e:
+        WARMUP_ERROR = '{}: {}'.format(type(e).__name__, e)
+
+
+def render(job):
+    """
+    Draw maps for NAME file, return list of plot files
+    job -- render job dict
+    """
+    from .drawmap import drawMap
+    from .name import Name
+
+    times = job.get('time')
+    if isinstance(times, basestring):
+        times = [times]
+
+    n = Name(job['file'], bbox=job.get('bbox'), columns=times)
+
+    outputs = []
+    for column in n.timestamps:
+        n.column = column
+        outputs.append(drawMap(n, column, **job.get('options', {})))
+
+    return outputs
+
+
+def summed(job):
+    """
+    Draw map for sum of NAME files, return list of plot files
+    job -- sum job dict
+    """
+    from .drawmap import drawMap
+    from .namesum import Sum
+
+    s = Sum(job['directory'], bbox=job.get('bbox'), sparse=job.get('sparse', False))
+
+    by = job.get('by', 'all')
+    value = job.get('value')
+
+    if by == 'day':
+        s.sumDay(str(value))
+    elif by == 'week':
+        s.sumWeek(int(value))
+    elif by == 'month':
+        s.sumMonth(str(int(value)))
+    elif by == 'year':
+        s.sumYear(str(value))
+    elif by == 'all':
+        s.sumAll()
+    else:
+        raise ValueError('Unknown sum period: {}'.format(by))
+
+    return [drawMap(s, 'total', **job.get('options', {}))]
+
+
+def ping(job):
+    """
+    Health check, return empty list of outputs
+    job -- ping job dict
+    """
+    return []
+
+
+# Job runners by job type
+JOBS = {'render': render, 'sum': summed, 'ping': ping}
+
+
+def runJob(job):
+    """
+    Run single job in worker process, return response dict
+    job -- job dict
+    """
+    response = {'id': job.get('id')}
+
+    try:
+        if WARMUP_ERROR is not None:
+            raise ImportError('Worker failed to load plotting libraries: {}'.format(WARMUP_ERROR))
+
+        if job.get('type') not in JOBS:
+            raise ValueError('Unknown job type: {}'.format(job.get('type')))
+
+        response['outputs'] = JOBS[job['type']](job)
+        response['status'] = 'ok'
+
+    except Exception as e:
+        response['status'] = 'error'
+        response['error'] = '{}: {}'.format(type(e).__name__, e)
+
+    finally:
+        # Release any figures left open by a failed job
+        if 'matplotlib.pyplot' in sys.modules:
+            sys.modules['matplotlib.pyplot'].close('all')
+
+    return response
+
+
+def serveLines(rfile, wfile, pool):
+    """
+    Read JSON job lines until end of input, and write JSON response lines
+    as jobs complete. Responses may be written out of order; use job ids
+    to match them to requests. Returns once all jobs have completed.
+
+    rfile -- input file object
+    wfile -- output file object
+    pool -- multiprocessing Pool of job workers
+    """
+    lock = threading.Lock()
+    pending = []
+
+    def reply(response):
+        with lock:
+            wfile.write(json.dumps(response) + '\n')
+            wfile.flush()
+
+    for line in iter(rfile.readline, ''):
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            job = json.loads(line)
+            if not isinstance(job, dict):
+                raise ValueError('job is not a JSON object')
+        except ValueError as e:
+            reply({'id': None, 'status': 'error', 'error': 'Invalid job: {}'.format(e)})
+            continue
+
+        pending.append(pool.apply_async(runJob, (job,), callback=reply))
+
+    for p in pending:
+        p.wait()
+
+
+def serveStdin(workers=2):
+    """
+    Serve jobs from stdin, writing responses to stdout, until end of input
+    workers -- number of worker processes
+    """
+    pool = Pool(workers, initializer=warmup)
+
+    try:
+        serveLines(sys.stdin, sys.stdout, pool)
+    finally:
+        pool.close()
+        pool.join()
+
+
+class JobHandler(SocketServer.StreamRequestHandler):
+    """
+    Handle Unix socket connection. Each connection sends JSON job lines
+    and receives JSON responses until it closes its write side.
+    """
+
+    def handle(self):
+        serveLines(self.rfile, self.wfile, self.server.pool)
+
+
+class RenderServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    """
+    Unix socket render server, connections share one worker pool
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path, workers=2):
+        """
+        Initialise RenderServer object
+
+        path -- Unix socket path
+        workers -- number of worker processes
+        """
+
+        # Remove stale socket left by previous server
+        if os.path.exists(path):
+            os.remove(path)
+
+        # Start workers before listening, so no connection sees a cold pool
+        self.pool = Pool(workers, initializer=warmup)
+        self.path = path
+
+        SocketServer.UnixStreamServer.__init__(self, path, JobHandler)
+
+    def server_close(self):
+        SocketServer.UnixStreamServer.server_close(self)
+
+        self.pool.close()
+        self.pool.join()
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def interrupt(signum, frame):
+    """
+    Signal handler, stop server as for Ctrl-C
+    """
+    raise KeyboardInterrupt
+
+
+def serveSocket(path, workers=2):
+    """
+    Serve jobs on Unix socket until interrupted or terminated
+    path -- Unix socket path
+    workers -- number of worker processes
+    """
+    server = RenderServer(path, workers)
+
+    signal.signal(signal.SIGTERM, interrupt)
+
+    print >> sys.stderr, 'Listening on {}'.format(path)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def request(path, jobs):
+    """
+    Send jobs to render server, return list of response dicts
+    path -- Unix socket path
+    jobs -- list of job dicts
+    """
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    s.connect(path)
+
+    try:
+        for job in jobs:
+            s.sendall(json.dumps(job) + '\n')
+
+        # Signal end of jobs, server replies then closes
+        s.shutdown(socket.SHUT_WR)
+
+        f = s.makefile('r')
+        responses = [json.loads(line) for line in iter(f.readline, '') if line.strip()]
+        f.close()
+    finally:
+        s.close()
+
+    return responses
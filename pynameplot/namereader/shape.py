@@ -7,13 +7,39 @@
 #
 # Support libraries. Generate Shapely shape data object from ESRI shapefile
 # 
+# The dissolved union of all shapefile features is cached on disk as WKB,
+# keyed by a hash of the shapefile geometry, so later runs and other
+# processes skip reading and unioning the features.
+#
 
-import geopandas as gpd
+import hashlib
 import os
+import tempfile
+
+from shapely import wkb
+from shapely.ops import unary_union
+
+from .util import shortname, CACHE
+
+# Dissolved shape cache directory
+CACHEDIR = os.path.join(CACHE, 'shapes')
+
+
+def shapehash(shapefile):
+    """
+    Return hex digest of shapefile geometry content (.shp and .shx files)
+    shapefile -- path to ESRI shapefile
+    """
+    h = hashlib.sha1()
 
-from shapely.ops import cascaded_union
+    for f in [shapefile, os.path.splitext(shapefile)[0] + '.shx']:
+        if not os.path.isfile(f):
+            continue
+        with open(f, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b''):
+                h.update(chunk)
 
-from .util import shortname
+    return h.hexdigest()
 
 
 class Shape(object):
@@ -24,10 +50,12 @@ class Shape(object):
     shapefile = ""
     shortname = ""
 
-    def __init__(self, shapefile):
+    def __init__(self, shapefile, tolerance=0.0, cachedir=CACHEDIR):
         """
         Initialise shape object from ESRI file
         filename -- path to ESRI shapefile
+        tolerance -- simplify dissolved shape to this tolerance (degrees), 0.0 for none
+        cachedir -- dissolved shape cache directory, or None to disable cache
         """
 
         self.shapefile = shapefile
@@ -36,15 +64,77 @@ class Shape(object):
             raise ValueError
 
         self.shortname = shortname(self.shapefile)
+        self.tolerance = tolerance
 
-        self.data = gpd.GeoDataFrame.from_file(self.shapefile)
+        self._data = None
+
+        cachefile = None
+        if cachedir:
+            cachefile = os.path.join(cachedir, '{}_{!r}.wkb'.format(shapehash(self.shapefile), float(tolerance)))
+
+        if cachefile and os.path.isfile(cachefile):
+            with open(cachefile, 'rb') as f:
+                self.cu = wkb.loads(f.read())
+        else:
+            self.cu = self.__dissolve()
+            if cachefile:
+                self.__save(cachefile)
 
         # Get shape latitude extent
-        self.geo = self.data.geometry
-        self.cu = cascaded_union(self.geo)
         self.bounds = self.cu.bounds
-        self.lat_min = self.geo.bounds['miny'].min()
-        self.lat_max = self.geo.bounds['maxy'].max()
+        self.lat_min = self.bounds[1]
+        self.lat_max = self.bounds[3]
+
+    @property
+    def data(self):
+        """
+        GeoDataFrame of shapefile features, read on first use
+        """
+        if self._data is None:
+            import geopandas as gpd
+            self._data = gpd.GeoDataFrame.from_file(self.shapefile)
+
+        return self._data
+
+    @property
+    def geo(self):
+        """
+        GeoSeries of shapefile feature geometries
+        """
+        return self.data.geometry
+
+    def __dissolve(self):
+        """
+        Return union of all shapefile features, simplified if tolerance set.
+        Tagged as private method
+        """
+        cu = unary_union(list(self.geo))
+
+        if self.tolerance > 0.0:
+            cu = cu.simplify(self.tolerance, preserve_topology=True)
+
+        return cu
+
+    def __save(self, cachefile):
+        """
+        Write dissolved shape to cache file. Written to a temporary file
+        and renamed, so concurrent processes never read a partial file.
+        Tagged as private method
+        """
+        cachedir = os.path.dirname(cachefile)
+
+        try:
+            if not os.path.isdir(cachedir):
+                os.makedirs(cachedir)
+
+            (fd, tmp) = tempfile.mkstemp(dir=cachedir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(wkb.dumps(self.cu))
+            os.rename(tmp, cachefile)
+
+        except (IOError, OSError) as e:
+            # Cache is an optimisation only, carry on without it
+            print 'Cannot write shape cache {}: {}'.format(cachefile, e)
 
     def is_valid(self):
         poly = self.cu
@@ -53,4 +143,3 @@ class Shape(object):
             return True
         else:
             return False
-
@@ -0,0 +1,267 @@
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# SOURCE
+#
+# Support libraries. Find and open NAME files wherever they are stored:
+# as plain text, gzip, bzip2 or xz compressed, or as members of tar and
+# zip files. Files are decompressed as they are read and never extracted
+# to disk, so reading only the header decompresses only the first few kB.
+#
+# A tar or zip member is named by its path below the tar or zip file,
+# e.g. NAME_201505.tar.gz/PML_group1_20150501.txt, so its short name and
+# date are found just as for a plain file.
+#
+
+import bz2
+import fnmatch
+import glob
+import gzip
+import os
+import tarfile
+import time
+import zipfile
+
+from .util import COMPRESSED
+
+# Tar and zip file extensions
+CONTAINERS = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz', '.zip')
+
+# Tar members by (tar path, modification time, size), as {name: TarInfo}
+MEMBERS = {}
+
+
+def _lzma():
+    """
+    Return lzma module, from the standard library or backports.lzma
+    """
+    try:
+        import lzma
+    except ImportError:
+        try:
+            from backports import lzma
+        except ImportError:
+            raise ImportError('Reading xz compressed NAME files requires the backports.lzma package')
+
+    return lzma
+
+
+def compression(path):
+    """
+    Return compression extension of file path, or None if not compressed
+    path -- file path
+    """
+    ext = os.path.splitext(path)[1].lower()
+    return ext if ext in COMPRESSED else None
+
+
+def iscontainer(path):
+    """
+    Return True if path names a tar or zip file
+    path -- file path
+    """
+    return path.lower().endswith(CONTAINERS)
+
+
+def splitmember(path):
+    """
+    Return (tar or zip file, member name) for path of tar or zip member,
+    or (path, None) for any other path
+    path -- file path
+    """
+    container = os.path.dirname(path)
+
+    while container and container != os.path.dirname(container):
+        if iscontainer(container) and os.path.isfile(container):
+            return (container, os.path.relpath(path, container).replace(os.sep, '/'))
+        container = os.path.dirname(container)
+
+    return (path, None)
+
+
+def _opentar(container):
+    """
+    Return open TarFile, and list of other file objects to close with it
+    container -- tar file path
+    """
+    if container.lower().endswith(('.tar.xz', '.txz')):
+        # tarfile in Python 2 has no xz support, so it reads a decompressed stream
+        xz = _lzma().LZMAFile(container, 'r')
+        return (tarfile.open(fileobj=xz), [xz])
+
+    return (tarfile.open(container), [])
+
+
+def _tarmembers(container):
+    """
+    Return {name: TarInfo} of regular files in tar file, reusing earlier
+    listing of unchanged tar file
+    container -- tar file path
+    """
+    st = os.stat(container)
+    key = (os.path.abspath(container), st.st_mtime, st.st_size)
+
+    if key not in MEMBERS:
+        (tar, others) = _opentar(container)
+        try:
+            MEMBERS[key] = dict((info.name, info) for info in tar if info.isfile())
+        finally:
+            for f in [tar] + others:
+                f.close()
+
+    return MEMBERS[key]
+
+
+def members(container):
+    """
+    Return sorted list of member file names in tar or zip file
+    container -- tar or zip file path
+    """
+    if container.lower().endswith('.zip'):
+        z = zipfile.ZipFile(container)
+        try:
+            return sorted(i.filename for i in z.infolist() if not i.filename.endswith('/'))
+        finally:
+            z.close()
+
+    return sorted(_tarmembers(container).keys())
+
+
+def listfiles(directory, pattern='*_group*.txt'):
+    """
+    Return sorted list of NAME files in directory matching pattern, as
+    plain files, compressed files, and members of tar and zip files
+    directory -- input directory path
+    pattern -- NAME filename pattern, without compression extension
+    """
+    files = glob.glob(os.path.join(directory, pattern))
+
+    for ext in COMPRESSED:
+        files += glob.glob(os.path.join(directory, pattern + ext))
+
+    for ext in CONTAINERS:
+        for container in glob.glob(os.path.join(directory, '*' + ext)):
+            files += [os.path.join(container, m) for m in members(container)
+                      if fnmatch.fnmatch(os.path.basename(m), pattern)]
+
+    return sorted(set(files))
+
+
+def exists(path):
+    """
+    Return True if NAME file exists, as a file or as tar or zip member
+    path -- file path
+    """
+    (container, member) = splitmember(path)
+
+    if member is None:
+        return os.path.isfile(path)
+
+    return member in members(container)
+
+
+def stamp(path):
+    """
+    Return (modification time, size) of NAME file, as stored. Tar and zip
+    members have their own time and uncompressed size.
+    path -- file path
+    """
+    (container, member) = splitmember(path)
+
+    if member is None:
+        st = os.stat(path)
+        return (st.st_mtime, st.st_size)
+
+    if container.lower().endswith('.zip'):
+        z = zipfile.ZipFile(container)
+        try:
+            info = z.getinfo(member)
+        finally:
+            z.close()
+        # Zip member times are stored as local time
+        return (time.mktime(info.date_time + (0, 0, -1)), info.file_size)
+
+    info = _tarmembers(container)[member]
+    return (float(info.mtime), info.size)
+
+
+class _Member(object):
+    """
+    File object of tar or zip member, closing the tar or zip file with it
+    """
+
+    def __init__(self, f, owners):
+        """
+        Initialise _Member object
+
+        f -- member file object
+        owners -- list of open tar, zip or decompression objects to close after f
+        """
+        self.f = f
+        self.owners = owners
+
+    def __getattr__(self, attr):
+        return getattr(self.f, attr)
+
+    def __iter__(self):
+        return iter(self.f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.f.close()
+        for o in self.owners:
+            o.close()
+
+
+def openfile(path):
+    """
+    Return file object reading NAME file as text, decompressing as it is
+    read. Can be used as a context manager.
+    path -- plain or compressed file path, or tar or zip member path
+    """
+    (container, member) = splitmember(path)
+
+    if member is None:
+        ext = compression(path)
+        if ext == '.gz':
+            return gzip.open(path, 'rb')
+        elif ext == '.bz2':
+            return bz2.BZ2File(path, 'r')
+        elif ext == '.xz':
+            return _lzma().LZMAFile(path, 'r')
+        return open(path, 'r')
+
+    if container.lower().endswith('.zip'):
+        z = zipfile.ZipFile(container)
+        try:
+            return _Member(z.open(member), [z])
+        except Exception:
+            z.close()
+            raise
+
+    (tar, others) = _opentar(container)
+    try:
+        # Listed members are read directly, otherwise tar is scanned up to member
+        st = os.stat(container)
+        known = MEMBERS.get((os.path.abspath(container), st.st_mtime, st.st_size))
+
+        if known is not None:
+            info = known.get(member)
+        else:
+            info = next((i for i in tar if i.name == member), None)
+
+        if info is None:
+            raise IOError('Member {} not found in {}'.format(member, container))
+
+        return _Member(tar.extractfile(info), [tar] + others)
+    except Exception:
+        for f in [tar] + others:
+            f.close()
+        raise
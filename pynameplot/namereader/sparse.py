@@ -0,0 +1,234 @@
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# SPARSE
+#
+# Support libraries. Sparse storage of NAME concentration fields as
+# (grid cell, value) arrays, for mostly-zero footprint grids.
+#
+# Grid cells are keyed by integer flat cell id, from the 1-based NAME
+# X-Index and Y-Index: (Y-Index - 1) * X grid size + (X-Index - 1).
+# Datasets and zone grids are aligned by indexing arrays with cell ids,
+# never by matching floating point coordinates.
+#
+
+import numpy as np
+
+from collections import OrderedDict
+
+
+def cellids(x_index, y_index, shape):
+    """
+    Return flat cell ids for NAME grid indices
+
+    x_index -- array of 1-based X-Index values
+    y_index -- array of 1-based Y-Index values
+    shape -- 2-tuple of grid size (number of lon cells, number of lat cells)
+    """
+    (lon_size, lat_size) = shape
+    return (np.asarray(y_index, dtype=np.int64) - 1) * lon_size + (np.asarray(x_index, dtype=np.int64) - 1)
+
+
+def lonlat_cellids(lons, lats, origin, size, shape):
+    """
+    Return flat cell ids for grid cell centre coordinates, -1 for
+    coordinates outside the grid. Coordinates are rounded to the
+    nearest cell centre, so small rounding differences do not matter.
+
+    lons -- array of cell centre longitudes
+    lats -- array of cell centre latitudes
+    origin -- 2-tuple of grid origin (centre of first cell) (lon, lat)
+    size -- 2-tuple of grid spacing (dlon, dlat)
+    shape -- 2-tuple of grid size (number of lon cells, number of lat cells)
+    """
+    (lon_0, lat_0) = origin
+    (delta_lon, delta_lat) = size
+    (lon_size, lat_size) = shape
+
+    x = np.rint((np.asarray(lons, dtype=np.float64) - lon_0) / delta_lon).astype(np.int64) + 1
+    y = np.rint((np.asarray(lats, dtype=np.float64) - lat_0) / delta_lat).astype(np.int64) + 1
+
+    inside = (x >= 1) & (x <= lon_size) & (y >= 1) & (y <= lat_size)
+
+    return np.where(inside, cellids(x, y, shape), -1)
+
+
+def positions(cells, count):
+    """
+    Return array mapping each flat cell id to its position in cells,
+    -1 for cell ids not in cells. Negative cell ids are ignored.
+
+    cells -- array of flat cell ids
+    count -- total number of grid cells
+    """
+    cells = np.asarray(cells, dtype=np.int64)
+    keep = cells >= 0
+
+    pos = np.empty(count, dtype=np.int64)
+    pos.fill(-1)
+    pos[cells[keep]] = np.flatnonzero(keep)
+
+    return pos
+
+
+def integrate(cells, values, zonecells, weights, count):
+    """
+    Return weighted sums of values over zones, aligned by cell id
+
+    cells -- array of flat cell ids of values
+    values -- array of values, 1D, or 2D with one row per cell
+    zonecells -- array of flat cell ids for rows of weight matrix
+    weights -- 2D array (cells x zones) of zone covering factors
+    count -- total number of grid cells
+    """
+    rows = positions(zonecells, count)[cells]
+    keep = rows >= 0
+
+    return np.dot(np.asarray(values)[keep].T, weights[rows[keep]])
+
+
+class SparseGrid(object):
+    """
+    Sparse storage of NAME concentration fields on a regular grid.
+    Each field holds sorted flat cell ids and their non-zero values.
+    Flat cell id is (Y-Index - 1) * X grid size + (X-Index - 1).
+    """
+
+    def __init__(self, origin, size, shape):
+        """
+        Initialise SparseGrid object
+
+        origin -- 2-tuple of grid origin (centre of first cell) (lon, lat)
+        size -- 2-tuple of grid spacing (dlon, dlat)
+        shape -- 2-tuple of grid size (number of lon cells, number of lat cells)
+        """
+
+        self.grid_origin = origin
+        self.grid_size = size
+        self.grid_shape = shape
+
+        self.fields = OrderedDict()
+
+    def cellids(self, x_index, y_index):
+        """
+        Return flat cell ids for NAME grid indices
+
+        x_index -- array of 1-based X-Index values
+        y_index -- array of 1-based Y-Index values
+        """
+        return cellids(x_index, y_index, self.grid_shape)
+
+    def lonlat_cellids(self, lons, lats):
+        """
+        Return flat cell ids for grid cell centre coordinates, -1 outside grid
+
+        lons -- array of cell centre longitudes
+        lats -- array of cell centre latitudes
+        """
+        return lonlat_cellids(lons, lats, self.grid_origin, self.grid_size, self.grid_shape)
+
+    def set(self, column, cells, values):
+        """
+        Store field, dropping zero values
+
+        column -- field name
+        cells -- array of flat cell ids (unique)
+        values -- array of values
+        """
+        cells = np.asarray(cells, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+
+        keep = values != 0.0
+        cells = cells[keep]
+        values = values[keep]
+
+        order = np.argsort(cells, kind='mergesort')
+        self.fields[column] = (cells[order], values[order])
+
+    def sum(self, columns=None):
+        """
+        Return (cells, values) sum over given fields
+
+        columns -- list of field names, default is all fields
+        """
+        if columns is None:
+            columns = self.fields.keys()
+
+        if not columns:
+            return (np.zeros(0, dtype=np.int64), np.zeros(0))
+
+        cells = np.concatenate([self.fields[c][0] for c in columns])
+        values = np.concatenate([self.fields[c][1] for c in columns])
+
+        (ids, inverse) = np.unique(cells, return_inverse=True)
+
+        return (ids, np.bincount(inverse, weights=values))
+
+    def accumulate(self, column, cells, values):
+        """
+        Add values into field, creating field if not present
+
+        column -- field name
+        cells -- array of flat cell ids (unique)
+        values -- array of values
+        """
+        if column in self.fields:
+            (old_cells, old_values) = self.fields[column]
+            cells = np.concatenate([old_cells, cells])
+            values = np.concatenate([old_values, values])
+
+            (cells, inverse) = np.unique(cells, return_inverse=True)
+            values = np.bincount(inverse, weights=values)
+
+        self.set(column, cells, values)
+
+    def minmax(self, column):
+        """
+        Return minimum positive and maximum values of field, or
+        (None, None) if field has no positive values
+
+        column -- field name
+        """
+        values = self.fields[column][1]
+        positive = values[values > 0.0]
+
+        if not len(positive):
+            return (None, None)
+
+        return (positive.min(), values.max())
+
+    def dense(self, column):
+        """
+        Return field as 2D array over full grid, rows south to north,
+        columns west to east
+
+        column -- field name
+        """
+        (lon_size, lat_size) = self.grid_shape
+        (cells, values) = self.fields[column]
+
+        grid = np.zeros(lon_size * lat_size)
+        grid[cells] = values
+
+        return grid.reshape((lat_size, lon_size))
+
+    def integrate(self, column, cells, weights):
+        """
+        Return weighted sums of field over zones
+
+        column -- field name
+        cells -- array of flat cell ids for rows of weight matrix
+        weights -- 2D array (cells x zones) of zone covering factors
+        """
+        (lon_size, lat_size) = self.grid_shape
+        (field_cells, values) = self.fields[column]
+
+        return integrate(field_cells, values, cells, weights, lon_size * lat_size)
+
+    def nbytes(self):
+        """
+        Return memory held by field arrays, in bytes
+        """
+        return sum(c.nbytes + v.nbytes for (c, v) in self.fields.values())
@@ -0,0 +1,333 @@
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# TILES
+#
+# Support libraries. Render NAME concentration grids to a pyramid of
+# XYZ web map tiles (256x256 PNG, Web Mercator projection).
+#
+
+import numpy as np
+
+from multiprocessing.pool import ThreadPool
+import hashlib
+import json
+import math
+import os
+import re
+
+from .util import shortname
+
+# Tile edge length in pixels
+TILE_SIZE = 256
+
+# Latitude limit of the Web Mercator projection
+MAX_LAT = 85.0511287798
+
+# Tile manifest filename, stored at top of tile pyramid
+MANIFEST = 'tiles.json'
+
+
+def tile_x(lon, zoom):
+    """
+    Return XYZ tile column containing given longitude
+    lon -- longitude in degrees
+    zoom -- tile zoom level
+    """
+    n = 2 ** zoom
+    lon = np.mod(lon + 180.0, 360.0) - 180.0
+    return min(int((lon + 180.0) / 360.0 * n), n - 1)
+
+
+def tile_y(lat, zoom):
+    """
+    Return XYZ tile row containing given latitude
+    lat -- latitude in degrees
+    zoom -- tile zoom level
+    """
+    n = 2 ** zoom
+    lat = math.radians(max(min(lat, MAX_LAT), -MAX_LAT))
+    y = (1.0 - math.log(math.tan(lat) + 1.0 / math.cos(lat)) / math.pi) / 2.0 * n
+    return max(min(int(y), n - 1), 0)
+
+
+def pixel_lonlat(zoom, x, y):
+    """
+    Return longitudes and latitudes of pixel centres for given tile.
+    Web Mercator is separable, so one array of each is sufficient.
+
+    zoom -- tile zoom level
+    x -- tile column
+    y -- tile row
+    """
+    n = 2 ** zoom
+    p = np.arange(TILE_SIZE) + 0.5
+
+    lons = (x + p / TILE_SIZE) / n * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * (y + p / TILE_SIZE) / n))))
+
+    return (lons, lats)
+
+
+class Tiles(object):
+    """
+    Render column of NAME concentration data to XYZ map tiles
+    """
+
+    def __init__(self, name, column='total'):
+        """
+        Initialise Tiles object.
+
+        name   -- a loaded Name object containing parsed data
+        column -- column name to render. Default is 'total' column from summed file.
+        """
+
+        self.name = name
+        self.column = column
+        self.outdir = ''
+
+        # Rasterise data column once onto full NAME grid
+        self.grid = name.get_grid(column)
+
+        (delta_lon, delta_lat) = name.grid_size
+        (lon_0, lat_0) = name.grid_origin
+
+        # Grid outer edges (origin is centre of first cell)
+        self.west = lon_0 - delta_lon / 2.
+        self.south = lat_0 - delta_lat / 2.
+
+        self.setFixedScale()
+        self.setColormap()
+
+    def setFixedScale(self, conc=(5.e-9, 1.e-5)):
+        """
+        Set fixed scale normalisation manually.
+
+        conc -- 2-tuple containing (min, max) values of concentration scale
+        """
+
+        if not (len(conc) == 2):
+            raise ValueError('Invalid concentration range array')
+
+        from matplotlib.colors import LogNorm
+        self.norm = LogNorm(vmin=conc[0], vmax=conc[1], clip=False)
+
+    def setAutoScale(self):
+        """
+        Set autoscale normalisation from extremal values of data column
+        """
+
+        from matplotlib.colors import LogNorm
+
+        self.name.get_minmax(self.column)
+
+        # Column without positive values cannot set a log scale, use standard scale
+        if self.name.min_conc is None:
+            self.setFixedScale()
+            return
+
+        self.norm = LogNorm(vmin=self.name.min_conc, vmax=self.name.max_conc, clip=False)
+
+    def setColormap(self, colormap='coolwarm'):
+        """
+        Set colourmap with existing normalisation
+        colormap -- Matplotlib colourmap name
+        """
+        import matplotlib.cm as cm
+        self.colormap = getattr(cm, colormap)
+
+    def tileList(self, zoom):
+        """
+        Return list of (zoom, x, y) tiles overlapping NAME grid at given zoom level
+        zoom -- tile zoom level
+        """
+
+        n = 2 ** zoom
+        (delta_lon, delta_lat) = self.name.grid_size
+        (lon_size, lat_size) = self.grid.shape[1], self.grid.shape[0]
+
+        east = self.west + delta_lon * lon_size
+        north = self.south + delta_lat * lat_size
+
+        # Tile columns, allowing for grids crossing the antimeridian
+        if east - self.west >= 360.0:
+            xs = range(n)
+        else:
+            x0 = tile_x(self.west, zoom)
+            x1 = tile_x(east, zoom)
+            if x0 <= x1:
+                xs = range(x0, x1 + 1)
+            else:
+                xs = range(x0, n) + range(0, x1 + 1)
+
+        ys = range(tile_y(north, zoom), tile_y(self.south, zoom) + 1)
+
+        return [(zoom, x, y) for x in xs for y in ys]
+
+    def renderTile(self, zoom, x, y):
+        """
+        Render single tile as RGBA array. Return None if tile contains no data.
+
+        zoom -- tile zoom level
+        x -- tile column
+        y -- tile row
+        """
+
+        (delta_lon, delta_lat) = self.name.grid_size
+        (lat_size, lon_size) = self.grid.shape
+
+        (lons, lats) = pixel_lonlat(zoom, x, y)
+
+        # NAME grid cell index for each pixel column and row
+        i = np.floor(np.mod(lons - self.west, 360.0) / delta_lon).astype(int)
+        j = np.floor((lats - self.south) / delta_lat).astype(int)
+
+        ivalid = i < lon_size
+        jvalid = (j >= 0) & (j < lat_size)
+
+        if not (ivalid.any() and jvalid.any()):
+            return None
+
+        conc = np.zeros((TILE_SIZE, TILE_SIZE))
+        conc[np.ix_(jvalid, ivalid)] = self.grid[np.ix_(j[jvalid], i[ivalid])]
+
+        if not (conc > 0.0).any():
+            return None
+
+        # Zero values are masked, and drawn transparent
+        conc = np.ma.masked_less_equal(conc, 0.0)
+
+        return self.colormap(self.norm(conc), bytes=True)
+
+    def __saveTile(self, tile):
+        """
+        Render and write single tile, skipping tiles unchanged since last run.
+        Tagged as private method
+
+        tile -- (zoom, x, y, previous digest) tuple
+        """
+
+        (zoom, x, y, digest) = tile
+
+        key = '{}/{}/{}'.format(zoom, x, y)
+        filename = os.path.join(self.outdir, str(zoom), str(x), '{}.png'.format(y))
+
+        rgba = self.renderTile(zoom, x, y)
+
+        if rgba is None:
+            if os.path.isfile(filename):
+                os.remove(filename)
+                return (key, None, 'removed')
+            return (key, None, 'empty')
+
+        newdigest = hashlib.md5(rgba.tobytes()).hexdigest()
+
+        if newdigest == digest and os.path.isfile(filename):
+            return (key, newdigest, 'unchanged')
+
+        tiledir = os.path.dirname(filename)
+        if not os.path.isdir(tiledir):
+            try:
+                os.makedirs(tiledir)
+            except OSError:
+                # created by another worker
+                pass
+
+        from PIL import Image
+
+        # Write to temporary file first, so readers never see partial tiles
+        Image.fromarray(rgba, 'RGBA').save(filename + '.tmp', format='PNG', optimize=False)
+        os.rename(filename + '.tmp', filename)
+
+        return (key, newdigest, 'written')
+
+    def saveTiles(self, zooms, workers=4):
+        """
+        Write tile pyramid for given zoom levels to output directory.
+        Tiles without data are skipped, and tiles whose content matches the
+        previous run (per tile manifest) are not rewritten.
+
+        zooms -- list of tile zoom levels
+        workers -- number of parallel tile rendering threads
+
+        returns dict of tile counts by status
+        """
+
+        manifest_file = os.path.join(self.outdir, MANIFEST)
+
+        manifest = {}
+        if os.path.isfile(manifest_file):
+            with open(manifest_file, 'r') as f:
+                manifest = json.load(f)
+
+        tiles = []
+        for zoom in zooms:
+            tiles.extend([(z, x, y, manifest.get('{}/{}/{}'.format(z, x, y))) for (z, x, y) in self.tileList(zoom)])
+
+        counts = {'written': 0, 'unchanged': 0, 'removed': 0, 'empty': 0}
+
+        pool = ThreadPool(workers)
+        try:
+            for (key, digest, status) in pool.imap_unordered(self.__saveTile, tiles, chunksize=16):
+                counts[status] += 1
+                if digest:
+                    manifest[key] = digest
+                else:
+                    manifest.pop(key, None)
+        finally:
+            pool.close()
+            pool.join()
+
+        if not os.path.isdir(self.outdir or '.'):
+            os.makedirs(self.outdir)
+
+        with open(manifest_file + '.tmp', 'w') as f:
+            json.dump(manifest, f, sort_keys=True)
+        os.rename(manifest_file + '.tmp', manifest_file)
+
+        return counts
+
+
+def drawTiles(n, column, zooms, scale=(), autoscale=True, colormap="", outdir="", outfile="", workers=4):
+    """
+    Function will write an XYZ tile pyramid for a footprint, as an alternative to drawMap.
+    Tiles are written to [outdir]/[pyramid name]/[zoom]/[x]/[y].png
+    :param n: Name obj
+    :param column: Column obj
+    :param zooms: list of int zoom levels
+    :param scale: tuple
+    :param autoscale: bool
+    :param colormap: string
+    :param outdir: string
+    :param outfile: string, pyramid name taken from this if set
+    :param workers: int, number of tile rendering threads
+    :return: dict of tile counts
+    """
+    t = Tiles(n, column=column)
+
+    # Set scale if defined, otherwise standard scale
+    if scale:
+        t.setFixedScale(conc=scale)
+    elif autoscale:
+        t.setAutoScale()
+
+    if colormap:
+        t.setColormap(colormap)
+
+    # Name pyramid after output file if defined, otherwise data source
+    if outfile:
+        pyramid = os.path.splitext(outfile)[0]
+    elif column == 'total':
+        pyramid = '{}_sum_{}'.format(n.runname, getattr(n, 'sumby', 'all'))
+    else:
+        pyramid = '{}_{}'.format(shortname(n.filename), re.sub(r'\D', '', column))
+
+    t.outdir = os.path.join(outdir, pyramid)
+
+    print 'Creating tiles: {}'.format(t.outdir)
+    counts = t.saveTiles(zooms, workers=workers)
+    print '{written} written, {unchanged} unchanged, {removed} removed'.format(**counts)
+
+    return counts
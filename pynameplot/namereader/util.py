@@ -5,18 +5,65 @@
 #
 # UTIL
 #
-# Support libraries. File and dict handling.
+# Support libraries. File, dict and timestamp handling.
 # 
 
+import numpy as np
+
+import datetime
 import os
+import re
+
+# Root directory for persistent caches shared between runs
+CACHE = os.environ.get('PYNAMEPLOT_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'pynameplot'))
+
+
+# Compressed NAME file extensions
+COMPRESSED = ('.gz', '.bz2', '.xz')
 
 
 def shortname(filepath):
     """
-    Return short name for input file (basename minus extension)
+    Return short name for input file (basename minus extension, and minus
+    any compression extension)
+    filepath -- full path to input file
+    """
+    name = os.path.basename(filepath)
+
+    if os.path.splitext(name)[1].lower() in COMPRESSED:
+        name = os.path.splitext(name)[0]
+
+    return os.path.splitext(name)[0]
+
+
+def filedate(filepath):
+    """
+    Return date for input file from first YYYYMMDD string in its short name
     filepath -- full path to input file
     """
-    return os.path.splitext(os.path.basename(filepath))[0]
+    m = re.search(r'(\d{4})(\d{2})(\d{2})', shortname(filepath))
+    if not m:
+        raise ValueError("Cannot find YYYYMMDD date in filename: {}".format(filepath))
+
+    return datetime.date(*[int(i) for i in m.groups()])
+
+
+def parse_timestamps(stamps):
+    """
+    Return numpy datetime64 array for NAME timestamp strings
+    stamps -- list of timestamp strings, DD/MM/YYYY HH:MM format
+    """
+    stamps = [s.strip() for s in stamps]
+    return np.array(['{}-{}-{}T{}'.format(s[6:10], s[3:5], s[0:2], s[11:16]) for s in stamps], dtype='datetime64[m]')
+
+
+def format_timestamps(times):
+    """
+    Return NAME timestamp strings for numpy datetime64 array
+    times -- datetime64 array
+    """
+    iso = np.datetime_as_string(np.asarray(times, dtype='datetime64[m]'), unit='m')
+    return ['{}/{}/{} {} UTC'.format(s[8:10], s[5:7], s[0:4], s[11:16]) for s in iso]
 
 
 def merge_dicts(*dict_args):
@@ -42,8 +89,89 @@ def get_axisticks(bounds):
     else:
         sep = 2
 
-    start = bounds[0]
+    # Bounds may be floats, ticks fall on whole degrees within them
+    start = int(np.ceil(bounds[0]))
     while start%sep != 0:
         start += 1
 
-    return [float(i) for i in range(start, bounds[1], sep)]
\ No newline at end of file
+    return [float(i) for i in range(start, int(np.ceil(bounds[1])), sep)]
+
+
+def get_bbox(lon_bounds, lat_bounds):
+    """
+    Given map boundary tuples, return (lon_min, lat_min, lon_max, lat_max) bounding box.
+    A missing boundary leaves that axis unrestricted.
+    :param lon_bounds: tuple
+    :param lat_bounds: tuple
+    :return: tuple, or None if neither boundary is set
+    """
+    if not (lon_bounds or lat_bounds):
+        return None
+
+    if lon_bounds:
+        (lon_min, lon_max) = [float(b) for b in lon_bounds]
+    else:
+        (lon_min, lon_max) = (-360.0, 720.0)
+
+    if lat_bounds:
+        (lat_min, lat_max) = [float(b) for b in lat_bounds]
+    else:
+        (lat_min, lat_max) = (-90.0, 90.0)
+
+    return (lon_min, lat_min, lon_max, lat_max)
+
+
+def read_groups(filename):
+    """
+    Read zone hierarchy mapping file, one "child, parent" pair per line.
+    Children are zone short names or group names, so groups can be nested.
+    :param filename: string
+    :return: dict of parent name by child name
+    """
+    groups = {}
+
+    with open(filename, 'r') as f:
+        for line in f:
+            if "," in line:
+                (child, parent) = [s.strip() for s in line.split(",", 1)]
+                if child in groups and groups[child] != parent:
+                    raise ValueError("Zone {} has more than one parent group".format(child))
+                groups[child] = parent
+
+    return groups
+
+
+def group_matrix(zones, groups):
+    """
+    Given leaf zone names and zone hierarchy mapping, return group names and
+    (zones x groups) aggregation matrix, 1 where a zone lies within a group
+    at any level. Group totals are then zone totals dot matrix.
+    :param zones: list of leaf zone names
+    :param groups: dict of parent name by child name
+    :return: (list of group names, 2D array)
+    """
+    names = []
+    for parent in groups.values():
+        if parent in zones:
+            raise ValueError("Zone group {} has the same name as a zone".format(parent))
+        if parent not in names:
+            names.append(parent)
+
+    for child in groups:
+        if child not in zones and child not in names:
+            raise ValueError("Unknown zone or group {} in zone hierarchy".format(child))
+
+    matrix = np.zeros((len(zones), len(names)))
+
+    for (i, zone) in enumerate(zones):
+        seen = set()
+        parent = groups.get(zone)
+        while parent is not None:
+            if parent in seen:
+                raise ValueError("Zone group {} contains itself".format(parent))
+            seen.add(parent)
+            matrix[i, names.index(parent)] = 1.0
+            parent = groups.get(parent)
+
+    return (names, matrix)
+
@@ -0,0 +1,128 @@
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# ZONETOTAL
+#
+# Support libraries. Concentration totals of NAME data over the zones
+# of a master grid file (see makemastergrid), with zone group totals
+# and percentages, as written by zonecsv and namewatch.
+#
+
+import numpy as np
+import pandas as pd
+
+import csv
+import json
+import os
+
+from . import sparse
+from .util import group_matrix
+
+
+class ZoneTotal(object):
+    """
+    Zone covering factors of master grid, summing NAME data over zones.
+    Totals are collected as (rows x zones) blocks, one per Name object.
+    """
+
+    def __init__(self, gridfile):
+        """
+        Initialise ZoneTotal object. The zone hierarchy saved beside the
+        master grid by makemastergrid is loaded if present.
+
+        gridfile -- master grid file path
+        """
+
+        zones = pd.read_pickle(gridfile)
+        zones = zones.to_dense()
+        zones = zones.fillna(0)
+        print "Loaded master grid file %s..." % gridfile
+
+        groups = {}
+        if os.path.isfile(gridfile + '.groups.json'):
+            with open(gridfile + '.groups.json', 'r') as f:
+                groups = json.load(f)
+            print "Loaded zone groups file %s..." % (gridfile + '.groups.json')
+
+        # Zone columns follow grid and geometry columns
+        self.zones = list(zones)[2::]
+        (self.groups, self.groupmatrix) = group_matrix(self.zones, groups)
+
+        pc_cols = ['pc_' + z for z in self.zones + self.groups]
+        self.columns = self.zones + self.groups + pc_cols
+        self.fieldnames = ['Timestamp'] + self.columns
+
+        # Zone covering factors as weight matrix, one row per master grid cell
+        self.weights = zones[self.zones].values
+        self.lons = zones.index.get_level_values('Longitude').values
+        self.lats = zones.index.get_level_values('Latitude').values
+
+        self.cells = None
+        self.grid = None
+
+    def integrate(self, n, columns=None):
+        """
+        Return (columns x zones) array of zone totals for Name or Sum object.
+        Raises ValueError if NAME grid differs from first integrated object,
+        as master grid cells are matched to the first grid only.
+
+        n -- Name or Sum object, dense or sparse
+        columns -- list of data columns, default all timestamps
+        """
+        if columns is None:
+            columns = n.timestamps
+
+        # Master grid cells as flat cell ids of NAME grid, so data and zones
+        # align by integer index rather than by floating point coordinates
+        if self.cells is None:
+            self.grid = (n.grid_origin, n.grid_size, n.grid_shape)
+            self.cells = sparse.lonlat_cellids(self.lons, self.lats, n.grid_origin, n.grid_size, n.grid_shape)
+        elif (n.grid_origin, n.grid_size, n.grid_shape) != self.grid:
+            raise ValueError('NAME grid of {} does not match first input'.format(n.filename))
+
+        if n.sparse is not None:
+            block = np.array([n.sparse.integrate(c, self.cells, self.weights) for c in columns])
+        else:
+            block = sparse.integrate(n.data.index.values, n.data[columns].values, self.cells, self.weights,
+                                     n.grid_shape[0] * n.grid_shape[1])
+
+        return block.reshape((len(columns), len(self.zones)))
+
+    def table(self, blocks):
+        """
+        Return (rows x columns) array of zone and group totals followed by
+        their percentages of total concentration, from integrate() blocks.
+        Only leaf zones count towards the total, as groups overlap them.
+
+        blocks -- list of integrate() arrays
+        """
+        if blocks:
+            totals = np.vstack(blocks)
+        else:
+            totals = np.zeros((0, len(self.zones)))
+
+        sum_conc = totals.sum(axis=1)[:, np.newaxis]
+
+        # Group totals aggregated from leaf zone totals, no further geometry needed
+        totals = np.hstack([totals, totals.dot(self.groupmatrix)])
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percents = totals / sum_conc * 100.0
+
+        return np.hstack([totals, percents])
+
+    def writerows(self, f, labels, table, header=True):
+        """
+        Write zone table as CSV rows
+
+        f -- output file object
+        labels -- list of Timestamp column values, one per table row
+        table -- table() array
+        header -- write fieldnames row first
+        """
+        writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC)
+        if header:
+            writer.writerow(self.fieldnames)
+        writer.writerows([t] + row for (t, row) in zip(labels, table.tolist()))
@@ -4,8 +4,12 @@ import shutil
 import calendar
 
 from namereader import drawmap
+from namereader import imagewriter
+from namereader import instrument
 from namereader import name
 from namereader import namesum
+from namereader import tiles
+from namereader import util
 
 
 class TemporaryDirectory(object):
@@ -18,6 +22,15 @@ class TemporaryDirectory(object):
         shutil.rmtree(self.name)
 
 
+def render(n, column, args, plotoptions):
+    """Draw map for column, or write map tiles if zoom levels requested"""
+    if args.zoom:
+        tiles.drawTiles(n, column, args.zoom, colormap=plotoptions.get('colormap', ''),
+                        outdir=plotoptions['outdir'], outfile=plotoptions.get('outfile', ''))
+    else:
+        drawmap.drawMap(n, column, **plotoptions)
+
+
 def main():
     parser = argparse.ArgumentParser(prog='plot_footprint', description='Plot NAME concentration files on world map')
     parser.add_argument('-i', '--infiles', nargs='+', required=True, help="NAME output files to plot")
@@ -34,31 +47,80 @@ def main():
                         help="Longitude and latitude of the release station")
     parser.add_argument('-p', '--projection', nargs='?', choices=['cyl', 'npstere', 'spstere'], default='cyl',
                         help="Map projection")
+    parser.add_argument('--lon_bounds', nargs=2, type=float, required=False,
+                        help="Longitude bounds of plot (min max), only data within bounds is read")
+    parser.add_argument('--lat_bounds', nargs=2, type=float, required=False,
+                        help="Latitude bounds of plot (min max), only data within bounds is read")
     parser.add_argument('-c', '--colormap', nargs='?', default='rainbow', help="matplotlib colour map [%(default)s]")
+    parser.add_argument('-z', '--zoom', nargs='+', type=int, required=False,
+                        help="Write XYZ web map tiles at these zoom levels instead of map plots")
+    parser.add_argument('-f', '--format', choices=['png', 'jpg', 'webp'], default='png',
+                        help="Output image format [%(default)s]")
+    parser.add_argument('--compress', type=int, default=6, choices=range(10),
+                        help="PNG compression level, 0 (fastest) to 9 (smallest) [%(default)s]")
+    parser.add_argument('--quality', type=int, default=90, help="JPEG and WebP quality, 1 to 100 [%(default)s]")
+    parser.add_argument('--force', action='store_true', default=False,
+                        help="Redraw plots even if inputs and options are unchanged since they were made")
+    parser.add_argument('--profile', nargs='?', help="Write stage timing and memory report to this file (.json or .csv)")
+    parser.add_argument('--threads', type=int, default=2,
+                        help="Background image writer threads, 0 to save each image with matplotlib before drawing the next [%(default)s]")
 
     args = parser.parse_args()
 
-    plotoptions = {'outdir': args.outputdir}
+    plotoptions = {'outdir': args.outputdir, 'fmt': args.format, 'force': args.force}
     if args.station:
         plotoptions['station'] = (args.station[0], args.station[1])
     if args.projection:
         plotoptions['projection'] = args.projection
     if args.colormap:
         plotoptions['colormap'] = args.colormap
-
+    if args.lon_bounds:
+        plotoptions['lon_bounds'] = tuple(args.lon_bounds)
+    if args.lat_bounds:
+        plotoptions['lat_bounds'] = tuple(args.lat_bounds)
+
+    # Only read grid cells within map bounds for cylindrical plots
+    bbox = None
+    if args.projection == 'cyl':
+        bbox = util.get_bbox(args.lon_bounds, args.lat_bounds)
+
+    writer = None
+    if args.threads > 0 and not args.zoom:
+        writer = imagewriter.ImageWriter(threads=args.threads, compress_level=args.compress, quality=args.quality)
+        plotoptions['writer'] = writer
+
+    if args.profile:
+        instrument.enable()
+
+    try:
+        with instrument.span('run'):
+            try:
+                plot(args, plotoptions, bbox)
+            finally:
+                # Wait for queued images to be written
+                if writer:
+                    writer.close()
+    finally:
+        if args.profile:
+            instrument.dump(args.profile)
+
+
+def plot(args, plotoptions, bbox):
+    """Draw all maps selected by command line arguments"""
     if len(args.infiles) == 1:
-        n = name.Name(args.infiles[0])
         if args.time:
-            # draw map for single timestamp
+            # draw map for single timestamp, reading only that column
+            n = name.Name(args.infiles[0], bbox=bbox, columns=[args.time])
             column = args.time
             n.column = column
-            drawmap.drawMap(n, column, **plotoptions)
+            render(n, column, args, plotoptions)
         else:
             # draw maps for all timestamps in file
+            n = name.Name(args.infiles[0], bbox=bbox)
             for column in n.timestamps:
                 print n.timestamps
                 n.column = column
-                drawmap.drawMap(n, column, **plotoptions)
+                render(n, column, args, plotoptions)
 
     else:
         # Copy files to a temporary directory
@@ -66,7 +128,7 @@ def main():
             for f in args.infiles:
                 shutil.copy(f, tmpdir)
 
-            s = namesum.Sum(tmpdir)
+            s = namesum.Sum(tmpdir, bbox=bbox)
             column = 'total'
 
             if args.day:
@@ -77,7 +139,7 @@ def main():
                                                                               s.direction, s.year, s.month, s.day)
                 plotoptions['outfile'] = "{}_{}{}{}_daily.png".format(s.runname, s.year, s.month, s.day)
 
-                drawmap.drawMap(s, column, **plotoptions)
+                render(s, column, args, plotoptions)
 
             elif args.week:
                 # draw summed map for week
@@ -87,7 +149,7 @@ def main():
                                                                               s.direction, s.year, args.week)
                 plotoptions['outfile'] = "{}_{}{}_weekly.png".format(s.runname, s.year, args.week.zfill(2))
 
-                drawmap.drawMap(s, column, **plotoptions)
+                render(s, column, args, plotoptions)
 
             elif args.month:
                 # draw summed map for month
@@ -97,7 +159,7 @@ def main():
                                                                          s.direction, s.year,
                                                                          calendar.month_name[int(args.month)])
                 plotoptions['outfile'] = "{}_{}{}_monthly.png".format(s.runname, s.year, args.month.zfill(2))
-                drawmap.drawMap(s, column, **plotoptions)
+                render(s, column, args, plotoptions)
 
             elif args.year:
                 # draw summed map for year
@@ -107,7 +169,7 @@ def main():
                                                                            s.direction, args.year)
                 plotoptions['outfile'] = "{}_{}_yearly.png".format(s.runname, args.year)
 
-                drawmap.drawMap(s, column, **plotoptions)
+                render(s, column, args, plotoptions)
 
             elif args.all:
                 # draw summed map for entire directory
@@ -116,17 +178,17 @@ def main():
                 plotoptions['caption'] = "{} {} {} {}: Summed (UTC)".format(s.runname, s.averaging, s.altitude,
                                                                             s.direction)
                 plotoptions['outfile'] = "{}_summed_all.png".format(s.runname)
-                drawmap.drawMap(s, column, **plotoptions)
+                render(s, column, args, plotoptions)
 
             else:
                 # draw maps for all timestamps and files in directory
                 allfiles = sorted(s.fs.getAll())
 
                 for f in allfiles:
-                    n = name.Name(f)
+                    n = name.Name(f, bbox=bbox)
                     for column in n.timestamps:
                         n.column = column
-                        drawmap.drawMap(n, column, **plotoptions)
+                        render(n, column, args, plotoptions)
 
         # End with so tempdir is deleted
 
@@ -17,13 +17,20 @@ setup(name='pyNAMEplot',
             'bin/makemastergrid.py',
             'bin/reproject.py',
             'bin/zonecsv.py',
+            'bin/nameraster.py',
+            'bin/namearchive.py',
+            'bin/nameinventory.py',
+            'bin/nameserver.py',
+            'bin/nameclient.py',
+            'bin/namewatch.py',
             'bin/plotter.py',
             'bin/multiplotter_solid.py',
             'bin/multiplotter_fillcontour.py'
       ],
       entry_points={
             'console_scripts': [
-                  'plot_footprints = pynameplot.plot_footprint:main'
+                  'plot_footprints = pynameplot.plot_footprint:main',
+                  'plot_overlays = pynameplot.multiplot:main'
             ]
       }
       )
@@ -0,0 +1,40 @@
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# CONFTEST
+#
+# Shared test fixtures. NAME files are written by the synthetic
+# generator in benchmarks/namegen.py, on a small grid.
+#
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from namegen import writeRun
+
+# Small grid namegen.write() options, 3 days of 4 timestamps
+OPTIONS = dict(lon_size=24, lat_size=16, origin=(-10.0, 45.0), resolution=(0.5, 0.5), times=4, sparsity=0.3)
+
+
+@pytest.fixture
+def namedir(tmpdir):
+    """
+    Directory of 3 daily synthetic NAME files, 1 to 3 May 2015
+    """
+    path = str(tmpdir.join('names'))
+    writeRun(path, 3, runname='TEST', **OPTIONS)
+    return path
+
+
+@pytest.fixture
+def namefile(namedir):
+    """
+    Path of first synthetic NAME file
+    """
+    return os.path.join(namedir, 'TEST_group1_20150501.txt')
@@ -0,0 +1,97 @@
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# TEST_ARCHIVE
+#
+# Tests of the Parquet archive of NAME files.
+#
+
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from pynameplot.namereader import archive
+from pynameplot.namereader.name import Name
+from pynameplot.namereader.namesum import Sum
+
+KEYS = ['TEST_group1_20150501', 'TEST_group1_20150502', 'TEST_group1_20150503']
+BBOX = (-8.0, 47.0, -3.0, 50.0)
+
+
+@pytest.fixture
+def archivedir(namedir, tmpdir):
+    """
+    Path of archive of synthetic NAME files
+    """
+    path = str(tmpdir.join('archive'))
+    archive.ingest(namedir, path)
+    return path
+
+
+def test_ingest(archivedir):
+    a = archive.Archive(archivedir)
+
+    assert archive.isarchive(archivedir)
+    assert a.files == KEYS
+    assert a.select(start='20150502') == KEYS[1:]
+    assert sorted(a.months.keys()) == ['5']
+
+    for key in KEYS:
+        assert os.path.isfile(os.path.join(archivedir, a.index[key]['path']))
+
+
+def test_ingest_skips_unchanged(archivedir, namedir):
+    a = archive.Archive(archivedir)
+    files = [os.path.join(namedir, key + '.txt') for key in KEYS]
+
+    assert a.ingest(files) == []
+
+    mtime = os.path.getmtime(files[1])
+    os.utime(files[1], (mtime + 10, mtime + 10))
+
+    assert a.ingest(files) == [KEYS[1]]
+
+
+def test_read_bbox(archivedir):
+    a = archive.Archive(archivedir)
+
+    rows = a.read(KEYS)
+    clipped = a.read(KEYS, bbox=BBOX)
+
+    # Bounding box covers cell centres -8.0 to -3.0, 47.0 to 50.0
+    inside = (rows.x_index >= 5) & (rows.x_index <= 15) & (rows.y_index >= 5) & (rows.y_index <= 11)
+
+    assert 0 < len(clipped) < len(rows)
+    assert len(clipped) == inside.sum()
+    assert sorted(clipped['file'].unique()) == KEYS
+
+
+@pytest.mark.parametrize('sparse', [False, True])
+@pytest.mark.parametrize('bbox', [None, BBOX])
+def test_archive_name_matches_name(archivedir, namefile, sparse, bbox):
+    a = archive.Archive(archivedir)
+
+    n = Name(namefile, sparse=sparse, bbox=bbox)
+    n2 = a.load(KEYS[0], sparse=sparse, bbox=bbox)
+
+    assert n2.timestamps == n.timestamps
+    assert (n2.grid_origin, n2.grid_size, n2.grid_shape) == (n.grid_origin, n.grid_size, n.grid_shape)
+
+    for t in n.timestamps:
+        np.testing.assert_array_equal(n2.get_grid(t), n.get_grid(t))
+
+
+def test_sum_archive_matches_directory(archivedir, namedir):
+    s = Sum(namedir, sparse=True)
+    s.sumAll()
+
+    s2 = Sum(archivedir, sparse=True)
+    s2.sumAll()
+
+    for (a, b) in zip(s.sparse.fields['total'], s2.sparse.fields['total']):
+        np.testing.assert_allclose(a, b)
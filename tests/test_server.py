@@ -0,0 +1,94 @@
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# TEST_SERVER
+#
+# Tests of the render server, over a Unix socket and stdin.
+#
+
+import json
+import os
+import threading
+from multiprocessing import Pool
+from StringIO import StringIO
+
+import pytest
+
+from pynameplot.namereader import server
+
+
+@pytest.fixture
+def socketpath(tmpdir):
+    """
+    Unix socket path of running render server with one worker
+    """
+    path = str(tmpdir.join('render.sock'))
+    s = server.RenderServer(path, workers=1)
+
+    thread = threading.Thread(target=s.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    yield path
+
+    s.shutdown()
+    s.server_close()
+    thread.join()
+
+
+def test_ping(socketpath):
+    responses = server.request(socketpath, [{'id': 1, 'type': 'ping'}])
+
+    assert responses == [{'id': 1, 'status': 'ok', 'outputs': []}]
+
+
+def test_unknown_job(socketpath):
+    responses = server.request(socketpath, [{'id': 'x', 'type': 'bake'}])
+
+    assert responses[0]['status'] == 'error'
+    assert 'Unknown job type' in responses[0]['error']
+
+
+def test_render(socketpath, namefile, tmpdir):
+    pytest.importorskip('mpl_toolkits.basemap')
+
+    outdir = str(tmpdir.join('plots'))
+    job = {'id': 2, 'type': 'render', 'file': namefile, 'time': '01/05/2015 00:00 UTC',
+           'options': {'outdir': outdir, 'logos': False}}
+
+    responses = server.request(socketpath, [job, {'id': 3, 'type': 'ping'}])
+
+    by_id = dict((r['id'], r) for r in responses)
+    assert by_id[2]['status'] == 'ok', by_id[2].get('error')
+    assert by_id[3]['status'] == 'ok'
+    assert [os.path.basename(f) for f in by_id[2]['outputs']] == ['TEST_group1_20150501_0000.png']
+    assert os.path.isfile(by_id[2]['outputs'][0])
+
+
+def test_serve_lines():
+    pool = Pool(1)
+
+    rfile = StringIO('{"id": 1, "type": "ping"}\n\nnot json\n')
+    wfile = StringIO()
+
+    try:
+        server.serveLines(rfile, wfile, pool)
+    finally:
+        pool.close()
+        pool.join()
+
+    responses = [json.loads(line) for line in wfile.getvalue().splitlines()]
+
+    assert {'id': 1, 'status': 'ok', 'outputs': []} in responses
+    assert any(r['id'] is None and r['status'] == 'error' for r in responses)
+
+
+def test_warmup_error(monkeypatch):
+    monkeypatch.setattr(server, 'WARMUP_ERROR', 'ImportError: No module named descartes')
+
+    response = server.runJob({'id': 1, 'type': 'ping'})
+
+    assert response['status'] == 'error'
+    assert 'descartes' in response['error']
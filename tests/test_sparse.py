@@ -0,0 +1,115 @@
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# TEST_SPARSE
+#
+# Tests of sparse cell storage and flat cell ids.
+#
+
+import numpy as np
+
+from pynameplot.namereader.name import Name
+from pynameplot.namereader.namesum import Sum
+from pynameplot.namereader.sparse import SparseGrid, cellids, integrate, lonlat_cellids, positions
+
+
+def grid():
+    return SparseGrid((-10.0, 40.0), (0.5, 0.5), (4, 3))
+
+
+def test_minmax():
+    g = grid()
+    g.set('a', [0, 5, 7], [2.0, 0.5, 4.0])
+
+    assert g.minmax('a') == (0.5, 4.0)
+
+
+def test_minmax_ignores_negative():
+    g = grid()
+    g.set('a', [0, 5, 7], [-1.0, 0.5, 4.0])
+
+    assert g.minmax('a') == (0.5, 4.0)
+
+
+def test_minmax_without_positive_values():
+    g = grid()
+    g.set('negative', [1, 2], [-1.0, -2.0])
+    g.set('zero', [1, 2], [0.0, 0.0])
+    g.set('empty', np.array([], dtype=int), np.array([]))
+
+    assert g.minmax('negative') == (None, None)
+    assert g.minmax('zero') == (None, None)
+    assert g.minmax('empty') == (None, None)
+
+
+def test_name_sparse_matches_dense(namefile):
+    dense = Name(namefile)
+    sparse = Name(namefile, sparse=True)
+
+    assert sparse.data is None
+    assert sparse.timestamps == dense.timestamps
+
+    for t in dense.timestamps:
+        np.testing.assert_array_equal(sparse.get_grid(t), dense.get_grid(t))
+        assert sparse.get_minmax(t) == dense.get_minmax(t)
+
+
+def test_sum_sparse_matches_dense(namedir):
+    dense = Sum(namedir)
+    dense.sumAll()
+
+    sparse = Sum(namedir, sparse=True)
+    sparse.sumAll()
+
+    (cells, values) = sparse.sparse.fields['total']
+    total = dense.data['total']
+    total = total[total != 0.0]
+
+    np.testing.assert_array_equal(cells, total.index.values)
+    np.testing.assert_allclose(values, total.values)
+
+
+def test_cellids():
+    cells = cellids([1, 4, 1, 4], [1, 1, 3, 3], (4, 3))
+
+    np.testing.assert_array_equal(cells, [0, 3, 8, 11])
+
+
+def test_lonlat_cellids():
+    g = grid()
+
+    # Cell centres, off-centre by rounding error, and outside the grid
+    lons = [-10.0, -8.5, -9.5000001, -10.5, -8.0, -10.0]
+    lats = [40.0, 41.0, 40.4999999, 40.0, 40.0, 41.5]
+
+    np.testing.assert_array_equal(g.lonlat_cellids(lons, lats), [0, 11, 5, -1, -1, -1])
+
+
+def test_positions():
+    pos = positions([5, -1, 2], 8)
+
+    np.testing.assert_array_equal(pos, [-1, -1, 2, -1, -1, 0, -1, -1])
+
+
+def test_integrate():
+    # Two zones over cells 1 and 3 of a 4-cell grid
+    zonecells = [3, 1]
+    weights = np.array([[0.5, 1.0], [1.0, 0.0]])
+
+    # Cell 0 is outside all zones and is ignored
+    totals = integrate([0, 1, 3], np.array([[100.0, 1.0], [2.0, 3.0], [4.0, 5.0]]), zonecells, weights, 4)
+
+    np.testing.assert_allclose(totals, [[4.0, 4.0], [5.5, 5.0]])
+
+
+def test_name_data_indexed_by_cell(namefile):
+    n = Name(namefile)
+
+    assert n.data.index.name == 'cell'
+    np.testing.assert_array_equal(n.data.index.values,
+                                  cellids(n.data['X-Index'].values, n.data['Y-Index'].values, n.grid_shape))
+    np.testing.assert_array_equal(n.data.index.values,
+                                  lonlat_cellids(n.data['Longitude'].values, n.data['Latitude'].values,
+                                                 n.grid_origin, n.grid_size, n.grid_shape))
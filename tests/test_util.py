@@ -0,0 +1,58 @@
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# TEST_UTIL
+#
+# Tests of zone hierarchy utilities.
+#
+
+import numpy as np
+import pytest
+
+from pynameplot.namereader import util
+
+ZONES = ['a', 'b', 'c']
+
+
+def test_read_groups(tmpdir):
+    path = tmpdir.join('groups.txt')
+    path.write('a, north\nb,north\n\nnorth , all\nc, all\n')
+
+    assert util.read_groups(str(path)) == {'a': 'north', 'b': 'north', 'north': 'all', 'c': 'all'}
+
+
+def test_read_groups_two_parents(tmpdir):
+    path = tmpdir.join('groups.txt')
+    path.write('a, north\na, south\n')
+
+    with pytest.raises(ValueError):
+        util.read_groups(str(path))
+
+
+def test_group_matrix():
+    (names, matrix) = util.group_matrix(ZONES, {'a': 'north', 'b': 'north', 'north': 'all', 'c': 'all'})
+
+    assert sorted(names) == ['all', 'north']
+
+    expected = {'north': [1.0, 1.0, 0.0], 'all': [1.0, 1.0, 1.0]}
+    for (i, name) in enumerate(names):
+        np.testing.assert_array_equal(matrix[:, i], expected[name])
+
+
+def test_group_matrix_without_groups():
+    (names, matrix) = util.group_matrix(ZONES, {})
+
+    assert names == []
+    assert matrix.shape == (3, 0)
+
+
+@pytest.mark.parametrize('groups', [
+    {'a': 'b'},
+    {'d': 'north'},
+    {'a': 'north', 'north': 'south', 'south': 'north'},
+])
+def test_group_matrix_invalid(groups):
+    with pytest.raises(ValueError):
+        util.group_matrix(ZONES, groups)
@@ -0,0 +1,143 @@
+# Author: Duncan Law-Green (dlg@kyubi.co.uk)
+# Copyright 2017 Kyubi Systems
+# Licensed under the Apache License, Version 2.0 (see LICENSE)
+# ------------------------------------------------------------
+#
+# TEST_ZONECSV
+#
+# Tests of zonecsv zone totals, run as a script on synthetic NAME files
+# and a small master grid.
+#
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import OPTIONS
+
+ZONECSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bin', 'zonecsv.py')
+
+
+def zonecsv(*args):
+    subprocess.check_call([sys.executable, ZONECSV] + list(args), stdout=open(os.devnull, 'w'))
+
+
+@pytest.fixture
+def gridfile(tmpdir):
+    """
+    Path of master grid file over synthetic NAME grid, with three zones
+    split by longitude. The middle zone half covers its cells.
+    """
+    (lon_0, lat_0) = OPTIONS['origin']
+    (delta_lon, delta_lat) = OPTIONS['resolution']
+
+    lons = lon_0 + delta_lon * np.arange(OPTIONS['lon_size'])
+    lats = lat_0 + delta_lat * np.arange(OPTIONS['lat_size'])
+    index = pd.MultiIndex.from_product([lons, lats], names=['Longitude', 'Latitude'])
+
+    lon = index.get_level_values('Longitude')
+    zones = pd.DataFrame({
+        'grid': None,
+        'geometry': None,
+        'west': np.where(lon < -6.0, 1.0, np.nan),
+        'middle': np.where((lon >= -6.0) & (lon < -2.0), 0.5, np.nan),
+        'east': np.where(lon >= -2.0, 1.0, np.nan),
+    }, index=index, columns=['grid', 'geometry', 'west', 'middle', 'east'])
+
+    path = str(tmpdir.join('master.pkl'))
+    zones.to_pickle(path)
+    return path
+
+
+def test_append(namedir, gridfile, tmpdir):
+    full = str(tmpdir.join('full.csv'))
+    zonecsv('-d', namedir, '-g', gridfile, '-o', full)
+
+    # Second run adds one new NAME file to directory
+    indir = tmpdir.mkdir('append')
+    for name in sorted(os.listdir(namedir))[:2]:
+        shutil.copy(os.path.join(namedir, name), str(indir))
+
+    appended = str(tmpdir.join('appended.csv'))
+    zonecsv('-d', str(indir), '-g', gridfile, '-o', appended, '--append')
+    first = open(appended).read()
+
+    shutil.copy(os.path.join(namedir, 'TEST_group1_20150503.txt'), str(indir))
+    zonecsv('-d', str(indir), '-g', gridfile, '-o', appended, '--append')
+
+    assert open(appended).read() == open(full).read()
+    assert open(appended).read().startswith(first)
+
+    # Nothing new to append leaves output unchanged
+    zonecsv('-d', str(indir), '-g', gridfile, '-o', appended, '--append')
+
+    assert open(appended).read() == open(full).read()
+
+
+def test_append_truncates_partial_rows(namedir, gridfile, tmpdir):
+    full = str(tmpdir.join('full.csv'))
+    zonecsv('-d', namedir, '-g', gridfile, '-o', full)
+
+    indir = tmpdir.mkdir('append')
+    shutil.copy(os.path.join(namedir, 'TEST_group1_20150501.txt'), str(indir))
+
+    appended = str(tmpdir.join('appended.csv'))
+    zonecsv('-d', str(indir), '-g', gridfile, '-o', appended, '--append')
+
+    # Rows left behind by an interrupted run are not recorded in state file
+    with open(appended, 'a') as f:
+        f.write('01/05/2015 00:00 UTC,1.0,2.0\n')
+
+    for name in os.listdir(namedir):
+        shutil.copy(os.path.join(namedir, name), str(indir))
+    zonecsv('-d', str(indir), '-g', gridfile, '-o', appended, '--append')
+
+    assert open(appended).read() == open(full).read()
+
+
+def test_zone_totals(namefile, gridfile, tmpdir):
+    from pynameplot.namereader.name import Name
+
+    outfile = str(tmpdir.join('zones.csv'))
+    zonecsv('-n', namefile, '-g', gridfile, '-o', outfile)
+
+    df = pd.read_csv(outfile)
+    n = Name(namefile)
+
+    assert list(df.columns) == ['Timestamp', 'west', 'middle', 'east', 'pc_west', 'pc_middle', 'pc_east']
+    assert list(df['Timestamp']) == n.timestamps
+
+    for (i, t) in enumerate(n.timestamps):
+        grid = n.get_grid(t)
+        (lons, lats) = n.get_axes()
+
+        west = grid[:, lons < -6.0].sum()
+        middle = 0.5 * grid[:, (lons >= -6.0) & (lons < -2.0)].sum()
+        east = grid[:, lons >= -2.0].sum()
+
+        np.testing.assert_allclose(df.loc[i, ['west', 'middle', 'east']].values.astype(float),
+                                   [west, middle, east], rtol=1e-6)
+        np.testing.assert_allclose(df.loc[i, ['pc_west', 'pc_middle', 'pc_east']].values.astype(float).sum(), 100.0)
+
+
+def test_zone_groups(namefile, gridfile, tmpdir):
+    with open(gridfile + '.groups.json', 'w') as f:
+        json.dump({'west': 'land', 'middle': 'land', 'land': 'all', 'east': 'all'}, f)
+
+    outfile = str(tmpdir.join('zones.csv'))
+    zonecsv('-n', namefile, '-g', gridfile, '-o', outfile)
+
+    df = pd.read_csv(outfile)
+
+    assert sorted(df.columns[4:6]) == ['all', 'land']
+    assert sorted(df.columns[9:]) == ['pc_all', 'pc_land']
+
+    np.testing.assert_allclose(df['land'], df['west'] + df['middle'], rtol=1e-6)
+    np.testing.assert_allclose(df['all'], df['west'] + df['middle'] + df['east'], rtol=1e-6)
+    np.testing.assert_allclose(df['pc_all'], 100.0)